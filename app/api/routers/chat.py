@@ -1,13 +1,23 @@
+import asyncio
+import json
 import logging
+from typing import AsyncIterator
 from uuid import uuid4
 
-from fastapi import APIRouter, Cookie, Depends, HTTPException, Response
+from fastapi import APIRouter, BackgroundTasks, Cookie, Depends, HTTPException, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import Engine
 from sqlmodel import Session
 
-from app.backend_schemas import ChatMessage, ChatRequest, LoadChatResponse
-from app.services.rag import rag_chat_service
-from app.services.transcription import extract_video_id
+from app.backend_schemas import ChatRequest, LoadChatResponse
+from app.core.components import Components, get_components
+from app.services.history import (ConversationHistory, acompact_conversation,
+                                  get_conversation_history, record_turn)
+from app.services.ingestion_queue import IngestionPendingError
+from app.services.rag import arag_chat_service, arag_chat_stream
+from app.services.transcription import TranscriptUnavailableError, extract_video_id
 from db.crud import load_history, load_summary, save_message
+from db.models import ChatMessage
 from db.session import get_session
 from shared.schemas import ChatResponse
 
@@ -23,10 +33,12 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=ChatResponse)
-def chat_endpoint(
+async def chat_endpoint(
     request: ChatRequest,
     response: Response,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_session),
+    components: Components = Depends(get_components),
     user_id: str | None = Cookie(default=None)
     ):
     # TODO: manage exceptions more robustly here
@@ -36,16 +48,7 @@ def chat_endpoint(
         if user_id is None:
             user_id = str(uuid4())
             logger.debug(f"Created a new UUID: {user_id}")
-            response.set_cookie(
-                key="user_id",
-                value=user_id,
-                httponly=True,
-                max_age=3600,
-                samesite="strict",
-                secure=False,
-                path="/"
-            )
-            logger.debug(f"Assigned and set new user_id cookie: {user_id}")
+            set_user_id_cookie(response, user_id)
         
         video_id = extract_video_id(str(request.video_url)) # convert HttpUrl to str
         
@@ -58,27 +61,43 @@ def chat_endpoint(
                 detail="Could not extract a valid video ID from the provided URL."
             )
         
-        # Load history from SQL DB 
-        chat_history_objects: list[ChatMessage] = load_history(db, user_id, video_id)   # Retrieves List[ChatMessage]
-        history: list[tuple[str, str]] = [(item.question, item.answer) for item in chat_history_objects]
+        # Load history: the latest turns plus a rolling summary of older ones (cached per user and video)
+        conversation: ConversationHistory = await asyncio.to_thread(get_conversation_history, db, user_id, video_id)
+        history: list[tuple[str, str]] = conversation.turns
 
         if not history:
-            logger.debug("DB miss. History empty")
+            logger.debug("History empty")
         else:
-            logger.debug(f"DB hit. History: {history}")
+            logger.debug(f"History: {len(history)} recent turn(s), summary of {conversation.turns_folded} earlier turn(s)")
 
         # Perform RAG QA call
         # try:
-        answer = rag_chat_service(
+        answer = await arag_chat_service(
             video_url=str(request.video_url),
             question=request.question,
             history=history,
-            db=db
+            history_summary=conversation.summary,
+            db=db,
+            vector_store=components.vector_store,
+            llm=components.llm
             )
         # except Exception as e:
         #     logger.exception("❌ rag_chat_service failed")
         #     raise HTTPException(status_code=502, detail=str(e)) from e
-    
+
+    except TranscriptUnavailableError as e:
+        logger.info(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
+
+    except IngestionPendingError as e:
+        # First question for this video: the transcript is still being indexed in the background
+        logger.info(str(e))
+        response.status_code = 202
+        return ChatResponse(
+            answer="This video is still being processed. Please ask again in a few seconds.",
+            status="ingesting"
+        )
+
     except Exception as e:
         # This will catch ANY error from anywhere in the function
         print(f"!!! A FATAL ERROR OCCURRED IN chat_endpoint: {e}", flush=True)
@@ -93,10 +112,110 @@ def chat_endpoint(
         )
 
     # # Save Q&A DB
-    save_message(db, request.question, answer, video_id, user_id)
+    message = await asyncio.to_thread(save_message, db, request.question, answer, video_id, user_id)
+    record_turn(user_id, video_id, message)
+    # Turns that dropped out of the verbatim window are summarised after the response is sent
+    background_tasks.add_task(acompact_conversation, components.engine, components.llm, user_id, video_id)
 
     return ChatResponse(answer=answer)
 
+@router.post("/stream")
+async def chat_stream_endpoint(
+    request: ChatRequest,
+    db: Session = Depends(get_session),
+    components: Components = Depends(get_components),
+    user_id: str | None = Cookie(default=None)
+    ):
+    """
+    Same as POST /chat/, but the answer is sent as Server-Sent Events while the LLM writes it:
+    `data: {"token": ...}` per piece of text, then `event: done` with the full answer (saved to the
+    history at that point), or `event: error`. An unindexed video gets the usual 202 JSON reply instead.
+    """
+    new_user = user_id is None
+    if user_id is None:
+        user_id = str(uuid4())
+
+    video_id = extract_video_id(str(request.video_url))
+    if video_id is None:
+        raise HTTPException(status_code=400, detail="Could not extract a valid video ID from the provided URL.")
+
+    conversation = await asyncio.to_thread(get_conversation_history, db, user_id, video_id)
+    try:
+        tokens = await arag_chat_stream(
+            video_url=str(request.video_url),
+            question=request.question,
+            history=conversation.turns,
+            history_summary=conversation.summary,
+            db=db,
+            vector_store=components.vector_store,
+            llm=components.llm
+        )
+    except TranscriptUnavailableError as e:
+        logger.info(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
+    except IngestionPendingError as e:
+        logger.info(str(e))
+        pending = JSONResponse(
+            status_code=202,
+            content=ChatResponse(
+                answer="This video is still being processed. Please ask again in a few seconds.",
+                status="ingesting"
+            ).model_dump()
+        )
+        if new_user:
+            set_user_id_cookie(pending, user_id)
+        return pending
+    except Exception as e:
+        logger.exception("chat_stream_endpoint failed")
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
+
+    async def events() -> AsyncIterator[str]:
+        parts: list[str] = []
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield sse_event({"token": token})
+        except Exception as e:
+            logger.exception(f"Streaming answer for video {video_id} failed")
+            yield sse_event({"detail": str(e)}, event="error")
+            return
+        answer = "".join(parts)
+        # The request's session is closed once the response starts, so save with a fresh one
+        message = await asyncio.to_thread(save_answer, components.engine, request.question, answer, video_id, user_id)
+        record_turn(user_id, video_id, message)
+        yield sse_event({"answer": answer}, event="done")
+        await acompact_conversation(components.engine, components.llm, user_id, video_id)
+
+    streaming = StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"} # Don't let proxies buffer the tokens
+    )
+    if new_user:
+        set_user_id_cookie(streaming, user_id)
+    return streaming
+
+def sse_event(data: dict, event: str | None = None) -> str:
+    lines = [f"event: {event}"] if event else []
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+def save_answer(engine: Engine, question: str, answer: str, video_id: str, user_id: str) -> ChatMessage:
+    with Session(engine) as db:
+        return save_message(db, question, answer, video_id, user_id)
+
+def set_user_id_cookie(response: Response, user_id: str) -> None:
+    response.set_cookie(
+        key="user_id",
+        value=user_id,
+        httponly=True,
+        max_age=3600,
+        samesite="strict",
+        secure=False,
+        path="/"
+    )
+    logger.debug(f"Assigned and set new user_id cookie: {user_id}")
+
 @router.get("/user/{user_id}/conversations/{video_id}/get_history", response_model=LoadChatResponse)
 def load_previous_conversation(
     user_id: str,
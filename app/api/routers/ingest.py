@@ -0,0 +1,52 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session
+
+from app.backend_schemas import (BatchIngestRequest, BatchIngestStatus, IngestJobStatus,
+                                 IngestRequest)
+from app.services.batch_ingest import get_batch, start_batch_ingest
+from app.services.ingestion_queue import submit_ingestion_job
+from db.crud import load_ingestion_job
+from db.session import engine, get_session
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/ingest",
+    tags=["ingestion"]
+)
+
+@router.post("/", response_model=IngestJobStatus, status_code=202)
+def ingest_endpoint(request: IngestRequest, db: Session = Depends(get_session)):
+    video_url: str = str(request.video_url)
+    try:
+        job = submit_ingestion_job(video_url=video_url, db=db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"Ingestion job for video {job.video_id} is {job.status}")
+    return IngestJobStatus.model_validate(job, from_attributes=True)
+
+@router.post("/batch", response_model=BatchIngestStatus, status_code=202)
+def batch_ingest_endpoint(request: BatchIngestRequest):
+    if not request.video_urls:
+        raise HTTPException(status_code=400, detail="No video URLs provided.")
+    batch = start_batch_ingest([str(url) for url in request.video_urls], engine=engine)
+    logger.info(f"Started batch ingest {batch.batch_id} for {len(batch.items)} video(s)")
+    return batch
+
+@router.get("/batch/{batch_id}", response_model=BatchIngestStatus)
+def batch_ingest_status_endpoint(batch_id: str):
+    """A batch's progress. Only the last BATCH_HISTORY_SIZE finished batches are kept, so an old batch id returns 404."""
+    batch = get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"No batch found with id {batch_id}")
+    return batch
+
+@router.get("/{video_id}", response_model=IngestJobStatus)
+def ingest_status_endpoint(video_id: str, db: Session = Depends(get_session)):
+    job = load_ingestion_job(db=db, video_id=video_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No ingestion job found for video {video_id}")
+    return IngestJobStatus.model_validate(job, from_attributes=True)
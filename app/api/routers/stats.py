@@ -0,0 +1,26 @@
+import logging
+
+from fastapi import APIRouter
+
+from app.backend_schemas import CacheStatsResponse
+from app.llm import get_llm_gateway
+from app.services.answer_cache import get_answer_cache
+from app.services.tokens import get_token_counter
+from app.vector_database import get_embedding_cache_stats
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"]
+)
+
+@router.get("/caches", response_model=CacheStatsResponse)
+def cache_stats_endpoint():
+    caches = get_embedding_cache_stats()
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        caches["answers"] = answer_cache.stats()
+    caches["token_counts"] = get_token_counter().stats()
+    caches["llm"] = get_llm_gateway().stats()
+    return CacheStatsResponse(caches=caches)
@@ -4,7 +4,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session
 
 from app.backend_schemas import IngestedSummaryData, SummaryRequest
-from app.services.summariser import summarise_ingest
+from app.services.summariser import asummarise_ingest
+from app.services.transcription import TranscriptUnavailableError
 from db.session import get_session
 from shared.schemas import SummaryResponse
 
@@ -19,7 +20,10 @@ router = APIRouter(
 async def summarise_endpoint(request: SummaryRequest, db: Session = Depends(get_session)):
     video_url: str = str(request.video_url)
     try:
-        summary : IngestedSummaryData = summarise_ingest(video_url, db)
+        summary : IngestedSummaryData = await asummarise_ingest(video_url, db)
+    except TranscriptUnavailableError as e:
+        logger.info(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.exception("Failed to summarise video {video_url}, error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail= str(e))
@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel, HttpUrl
 
 from db.models import ChatMessage, Summary
@@ -30,4 +32,34 @@ class LoadChatResponse(BaseModel):
     
 class ChatRequest(BaseModel):
     video_url: HttpUrl
-    question: str
\ No newline at end of file
+    question: str
+
+class IngestRequest(BaseModel):
+    video_url: HttpUrl
+
+class IngestJobStatus(BaseModel):
+    video_id: str
+    status: str
+    stage: str | None
+    error: str | None
+    attempts: int
+    created_at: datetime
+    updated_at: datetime
+
+class BatchIngestRequest(BaseModel):
+    video_urls: list[HttpUrl]
+
+class BatchItemStatus(BaseModel):
+    video_url: str
+    video_id: str | None = None
+    status: str = "pending"     # pending | running | done | skipped | failed
+    stage: str | None = None    # transcript | metadata | chunking | embedding | summary
+    error: str | None = None
+
+class BatchIngestStatus(BaseModel):
+    batch_id: str
+    items: list[BatchItemStatus]
+    finished: bool = False
+
+class CacheStatsResponse(BaseModel):
+    caches: dict[str, dict] # cache name -> counters (hits, misses, hit_rate, entries, ...)
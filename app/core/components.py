@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+
+from chromadb import ClientAPI
+from fastapi import HTTPException
+from langchain_chroma.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import Engine, text
+
+from app.llm import LLMGateway, get_llm_gateway
+from app.vector_database import (get_chroma_client, get_embedding_function,
+                                 get_vector_store)
+from db.session import engine
+
+logger = logging.getLogger(__name__)
+
+
+class Components:
+    """The long-lived clients every request needs, built once at startup."""
+
+    def __init__(self, llm: LLMGateway, embedding_function: Embeddings, chroma_client: ClientAPI, vector_store: Chroma, engine: Engine) -> None:
+        self.llm = llm
+        self.embedding_function = embedding_function
+        self.chroma_client = chroma_client
+        self.vector_store = vector_store
+        self.engine = engine
+        self.warm = False
+
+
+def build_components(engine: Engine) -> Components:
+    """
+    Creates (or picks up) the shared LLM, embeddings, Chroma client and vector store.
+    They are the same singletons the CLIs and background workers use.
+    """
+    embedding_function = get_embedding_function()
+    chroma_client = get_chroma_client()
+    vector_store = get_vector_store(embedding_function)
+    return Components(
+        llm=get_llm_gateway(),
+        embedding_function=embedding_function,
+        chroma_client=chroma_client,
+        vector_store=vector_store,
+        engine=engine
+    )
+
+
+def warm_up(components: Components) -> dict[str, float]:
+    """
+    Opens the connections a first request would otherwise pay for: database, Chroma, and one
+    query embedding (which also loads local embedding models). Returns seconds spent per component.
+    """
+    timings: dict[str, float] = {}
+
+    start = time.perf_counter()
+    with components.engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    timings["database"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    components.chroma_client.heartbeat()
+    components.vector_store._collection.count()
+    timings["chroma"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    components.embedding_function.embed_query("warm-up")
+    timings["embeddings"] = time.perf_counter() - start
+
+    components.warm = True
+    logger.info(f"Components warmed up: {', '.join(f'{name} {seconds * 1000:.0f}ms' for name, seconds in timings.items())}")
+    return timings
+
+
+_components: Components | None = None
+_lock = threading.Lock()
+
+def init_components() -> Components | None:
+    """Builds and warms the components at startup. Failures are logged; requests retry via `get_components`."""
+    try:
+        components = _build_once()
+    except Exception:
+        logger.exception("Failed to initialise components; will retry on first request")
+        return None
+    try:
+        warm_up(components)
+    except Exception:
+        logger.exception("Component warm-up failed")
+    return components
+
+
+def _build_once() -> Components:
+    global _components
+    with _lock:
+        if _components is None:
+            _components = build_components(engine)
+        return _components
+
+
+def get_components() -> Components:
+    """FastAPI dependency returning the shared components, building them now if startup couldn't."""
+    if _components is not None:
+        return _components
+    try:
+        return _build_once()
+    except Exception as e:
+        logger.exception("Components unavailable")
+        raise HTTPException(status_code=503, detail=f"Service not ready: {e}") from e
+
+
+def check_ready() -> tuple[bool, str | None]:
+    """Whether the components are built and warmed, retrying whatever failed at startup."""
+    try:
+        components = _build_once()
+        if not components.warm:
+            warm_up(components)
+    except Exception as e:
+        return False, str(e)
+    return True, None
@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import re
+from typing import Callable, cast
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingProvider:
+    """An embedding model plus the identity that gets recorded with every store built from it."""
+
+    def __init__(self, name: str, model_name: str, dimension: int, embeddings: Embeddings) -> None:
+        self.name = name
+        self.model_name = model_name
+        self.dimension = dimension
+        self.embeddings = embeddings
+
+    def collection_metadata(self) -> dict:
+        return {
+            "embedding_provider": self.name,
+            "embedding_model": self.model_name,
+            "embedding_dimension": self.dimension,
+        }
+
+
+_PROVIDERS: dict[str, Callable[[str | None], EmbeddingProvider]] = {}
+
+def register_embedding_provider(name: str) -> Callable:
+    """Decorator registering a factory `(model_name | None) -> EmbeddingProvider` under `name`."""
+    def decorator(factory: Callable[[str | None], EmbeddingProvider]) -> Callable[[str | None], EmbeddingProvider]:
+        _PROVIDERS[name] = factory
+        return factory
+    return decorator
+
+def available_embedding_providers() -> list[str]:
+    return sorted(_PROVIDERS)
+
+def create_embedding_provider(name: str, model_name: str | None = None) -> EmbeddingProvider:
+    factory = _PROVIDERS.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown embedding provider '{name}'. Available: {', '.join(available_embedding_providers())}")
+    provider = factory(model_name)
+    logger.info(f"Embedding provider '{name}': {provider.model_name} ({provider.dimension} dimensions)")
+    return provider
+
+
+_provider_instance: EmbeddingProvider | None = None
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """Returns the provider selected by EMBEDDING_PROVIDER / EMBEDDING_MODEL, created once."""
+    global _provider_instance
+    if _provider_instance is None:
+        _provider_instance = create_embedding_provider(settings.EMBEDDING_PROVIDER, settings.EMBEDDING_MODEL)
+    return _provider_instance
+
+
+# --- Local embedding models ---
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic feature-hashing bag-of-words embeddings: no model download and no network.
+    Meant for tests and offline load rigs, not for retrieval quality.
+    """
+
+    def __init__(self, dimension: int = 256) -> None:
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            sign = 1.0 if digest >> 63 else -1.0
+            vector[digest % self.dimension] += sign
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+class OnnxMiniLMEmbeddings(Embeddings):
+    """all-MiniLM-L6-v2 run on CPU through ONNX Runtime, using the model bundled with chromadb."""
+
+    def __init__(self) -> None:
+        from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+        self._model = ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[float(x) for x in vector] for vector in self._model(texts)]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """Any sentence-transformers model on CPU (requires the optional `sentence-transformers` package)."""
+
+    def __init__(self, model_name: str) -> None:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The 'sentence-transformers' embedding provider needs the sentence-transformers package: "
+                "pip install sentence-transformers"
+            ) from e
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dimension: int = self._model.get_sentence_embedding_dimension()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return cast(list[list[float]], self._model.encode(texts, normalize_embeddings=True).tolist())
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+# --- Registered providers ---
+
+@register_embedding_provider("gemini")
+def _gemini_provider(model_name: str | None) -> EmbeddingProvider:
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    api_key = settings.GEMINI_API_KEY
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found for embedding function. Please check your .env file.")
+    model_name = model_name or "models/text-embedding-004"
+    embeddings = GoogleGenerativeAIEmbeddings(model=model_name, google_api_key=api_key)
+    return EmbeddingProvider(name="gemini", model_name=model_name, dimension=768, embeddings=embeddings)
+
+@register_embedding_provider("onnx")
+def _onnx_provider(model_name: str | None) -> EmbeddingProvider:
+    if model_name not in (None, "all-MiniLM-L6-v2"):
+        raise ValueError("The 'onnx' embedding provider only supports all-MiniLM-L6-v2; use 'sentence-transformers' for other models.")
+    return EmbeddingProvider(name="onnx", model_name="all-MiniLM-L6-v2", dimension=384, embeddings=OnnxMiniLMEmbeddings())
+
+@register_embedding_provider("sentence-transformers")
+def _sentence_transformers_provider(model_name: str | None) -> EmbeddingProvider:
+    model_name = model_name or "sentence-transformers/all-MiniLM-L6-v2"
+    embeddings = SentenceTransformerEmbeddings(model_name)
+    return EmbeddingProvider(name="sentence-transformers", model_name=model_name, dimension=embeddings.dimension, embeddings=embeddings)
+
+@register_embedding_provider("hashing")
+def _hashing_provider(model_name: str | None) -> EmbeddingProvider:
+    dimension = int(model_name.rsplit("-", 1)[-1]) if model_name else 256
+    embeddings = HashingEmbeddings(dimension=dimension)
+    return EmbeddingProvider(name="hashing", model_name=f"hashing-{dimension}", dimension=dimension, embeddings=embeddings)
@@ -0,0 +1,67 @@
+"""
+Pre-load many videos (e.g. a course playlist) before users start chatting.
+
+Usage:
+    python -m app.ingest_cli URL [URL ...]
+    python -m app.ingest_cli --file urls.txt --embed-concurrency 4
+"""
+import argparse
+import sys
+
+from app.backend_schemas import BatchItemStatus
+from app.services.batch_ingest import (STAGES, BatchIngestor, default_stage_limits,
+                                       new_batch)
+from db.session import create_db_and_tables, engine
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Batch-ingest YouTube videos: transcript, vectors and summary.")
+    parser.add_argument("urls", nargs="*", help="YouTube video URLs")
+    parser.add_argument("--file", help="Text file with one URL per line")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Videos in the pipeline at once")
+    defaults = default_stage_limits()
+    for stage in STAGES:
+        parser.add_argument(
+            f"--{stage}-concurrency",
+            type=int,
+            default=defaults[stage],
+            help=f"Concurrent '{stage}' stage tasks (default {defaults[stage]})"
+        )
+    return parser.parse_args(argv)
+
+
+def print_progress(item: BatchItemStatus) -> None:
+    detail = item.stage or item.status
+    if item.error:
+        detail = f"{detail}: {item.error}"
+    print(f"[{item.status:>7}] {item.video_id or item.video_url} - {detail}", flush=True)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            urls.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if not urls:
+        print("No video URLs given.", file=sys.stderr)
+        return 2
+
+    create_db_and_tables(engine) # Make sure tables exist when run outside the API
+
+    stage_limits = {stage: getattr(args, f"{stage}_concurrency") for stage in STAGES}
+    ingestor = BatchIngestor(
+        engine=engine,
+        stage_limits=stage_limits,
+        max_in_flight=args.max_in_flight,
+        on_progress=print_progress
+    )
+    batch = ingestor.run(new_batch(urls))
+
+    failed = [item for item in batch.items if item.status == "failed"]
+    print(f"Done: {len(batch.items) - len(failed)} ingested or skipped, {len(failed)} failed.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,19 @@
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures import Future, wait
+from typing import AsyncIterator, cast
+
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.messages import BaseMessage, BaseMessageChunk
 from langchain_google_genai import ChatGoogleGenerativeAI
+
+from app.services.embedding_cache import content_hash
 from config import settings
 
+logger = logging.getLogger(__name__)
+
 _llm_instance = None # Private, module-level variable to hold the instance
 
 def get_llm() -> ChatGoogleGenerativeAI:
@@ -22,8 +35,231 @@ def get_llm() -> ChatGoogleGenerativeAI:
             )
         
         _llm_instance = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
+            model=settings.LLM_MODEL,
             google_api_key=api_key
         )
     
     return _llm_instance
+
+
+class _Batch:
+    """Prompts collected during one batch window, each with the future its caller waits on."""
+
+    def __init__(self) -> None:
+        self.prompts: list[str] = []
+        self.futures: list[Future[BaseMessage] | asyncio.Future[BaseMessage]] = []
+        self.sent = False
+
+    def __len__(self) -> int:
+        return len(self.prompts)
+
+
+class _LoopState:
+    """The async side's in-flight prompts and open batch; asyncio futures belong to one event loop."""
+
+    def __init__(self) -> None:
+        self.in_flight: dict[str, asyncio.Future] = {}
+        self.batch: _Batch | None = None
+        self.sending: set[asyncio.Task] = set() # Referenced until done, so they aren't garbage collected
+
+
+class LLMGateway:
+    """
+    Front door for prompt → message LLM calls (`invoke` / `ainvoke`).
+
+    - Coalescing: a prompt identical to one already in flight is not sent again;
+      its caller gets the same message when the first call returns (or the same exception).
+    - Microbatching: distinct prompts arriving within `batch_window_seconds` of the first are sent
+      together with the model's `batch` / `abatch` (at most `max_batch_size` per batch,
+      `max_concurrency` requests at once), each caller waiting on its own future.
+      A window of 0 sends every prompt on its own.
+
+    Streaming (`astream`) goes straight to the model: every caller needs their own stream.
+    """
+
+    def __init__(self, model: BaseChatModel, batch_window_seconds: float, max_batch_size: int, max_concurrency: int) -> None:
+        self.model = model
+        self.batch_window_seconds = batch_window_seconds
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_concurrency = max_concurrency
+        self.requests = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.sent = 0
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, Future[BaseMessage]] = {}
+        self._batch: _Batch | None = None
+        self._loops: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState] = weakref.WeakKeyDictionary()
+
+    # Blocking callers (worker threads):
+
+    def invoke(self, prompt: str) -> BaseMessage:
+        key = content_hash(prompt)
+        with self._lock:
+            self.requests += 1
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if future is None:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+        if is_leader:
+            future.add_done_callback(lambda _: self._forget(key))
+            self._submit(prompt, future)
+        return future.result()
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _submit(self, prompt: str, future: Future[BaseMessage]) -> None:
+        # The caller that fills a batch sends it at once; otherwise the caller that opened it
+        # waits out the window, then sends it for everyone in it
+        with self._lock:
+            batch = self._batch
+            opened = batch is None
+            if batch is None:
+                batch = _Batch()
+                if self.batch_window_seconds > 0:
+                    self._batch = batch
+            batch.prompts.append(prompt)
+            batch.futures.append(future)
+            send_now = len(batch) >= self.max_batch_size and self._claim(batch)
+        if not send_now:
+            if not opened:
+                return
+            if self.batch_window_seconds > 0:
+                wait([future], timeout=self.batch_window_seconds) # Done early if the batch fills
+            with self._lock:
+                if not self._claim(batch):
+                    return # Filled and sent during the window
+        self._send(batch)
+
+    def _claim(self, batch: _Batch) -> bool:
+        """Marks `batch` sent and closes it to later prompts; False if it already was. Call with the lock held."""
+        if batch.sent:
+            return False
+        batch.sent = True
+        if self._batch is batch:
+            self._batch = None
+        return True
+
+    def _send(self, batch: _Batch) -> None:
+        self._count_batch(batch)
+        try:
+            if len(batch) == 1:
+                results: list = [self.model.invoke(batch.prompts[0])]
+            else:
+                results = self.model.batch(cast(list[LanguageModelInput], batch.prompts), config={"max_concurrency": self.max_concurrency}, return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(batch)
+        for future, result in zip(batch.futures, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    # Coroutines:
+
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        loop = asyncio.get_running_loop()
+        state = self._loop_state(loop)
+        key = content_hash(prompt)
+        future = state.in_flight.get(key)
+        with self._lock:
+            self.requests += 1
+            if future is not None:
+                self.coalesced += 1
+        if future is None:
+            future = loop.create_future()
+            state.in_flight[key] = future
+            future.add_done_callback(lambda _: state.in_flight.pop(key, None))
+            self._aenqueue(loop, state, prompt, future)
+        # Shielded so one caller going away doesn't cancel the call for the others
+        return await asyncio.shield(future)
+
+    def _loop_state(self, loop: asyncio.AbstractEventLoop) -> _LoopState:
+        with self._lock:
+            state = self._loops.get(loop)
+            if state is None:
+                state = self._loops[loop] = _LoopState()
+            return state
+
+    def _aenqueue(self, loop: asyncio.AbstractEventLoop, state: _LoopState, prompt: str, future: asyncio.Future) -> None:
+        batch = state.batch
+        if batch is None:
+            batch = _Batch()
+            if self.batch_window_seconds > 0:
+                state.batch = batch
+                loop.call_later(self.batch_window_seconds, self._aflush, state, batch)
+        batch.prompts.append(prompt)
+        batch.futures.append(future)
+        if state.batch is not batch or len(batch) >= self.max_batch_size:
+            self._aflush(state, batch)
+
+    def _aflush(self, state: _LoopState, batch: _Batch) -> None:
+        if batch.sent:
+            return
+        batch.sent = True
+        if state.batch is batch:
+            state.batch = None
+        task = asyncio.ensure_future(self._asend(batch))
+        state.sending.add(task)
+        task.add_done_callback(state.sending.discard)
+
+    async def _asend(self, batch: _Batch) -> None:
+        self._count_batch(batch)
+        try:
+            if len(batch) == 1:
+                results: list = [await self.model.ainvoke(batch.prompts[0])]
+            else:
+                results = await self.model.abatch(cast(list[LanguageModelInput], batch.prompts), config={"max_concurrency": self.max_concurrency}, return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(batch)
+        for future, result in zip(batch.futures, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _count_batch(self, batch: _Batch) -> None:
+        with self._lock:
+            self.batches += 1
+            self.sent += len(batch)
+        if len(batch) > 1:
+            logger.debug(f"Sending {len(batch)} prompts to the LLM in one batch")
+
+    async def astream(self, prompt: str) -> AsyncIterator[BaseMessageChunk]:
+        async for chunk in self.model.astream(prompt):
+            yield chunk
+
+    def get_num_tokens(self, text: str) -> int:
+        return self.model.get_num_tokens(text)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "sent": self.sent,
+                "batches": self.batches,
+                "average_batch_size": self.sent / self.batches if self.batches else 0.0,
+            }
+
+
+_gateway: LLMGateway | None = None
+
+def get_llm_gateway() -> LLMGateway:
+    """Returns the singleton gateway in front of `get_llm()`; use it for all prompt → message calls."""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway(
+            model=get_llm(),
+            batch_window_seconds=settings.LLM_BATCH_WINDOW_MS / 1000,
+            max_batch_size=settings.LLM_MAX_BATCH_SIZE,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY
+        )
+    return _gateway
@@ -7,26 +7,49 @@ configure_logging(level = 10)
 
 logger = logging.getLogger()
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import Session, SQLModel
+from sqlmodel import Session
 
 from app.api.routers.chat import router as chat_router
+from app.api.routers.ingest import router as ingest_router
 from app.api.routers.session import router as session_router
+from app.api.routers.stats import router as stats_router
 from app.api.routers.summary import router as summary_router
 from app.backend_schemas import PreviousConversationItem, PreviousConversationsResponse
+from app.core.components import check_ready, init_components
+from app.services.eviction import start_eviction_sweeper, stop_eviction_sweeper
+from app.services.ingestion_manifest import warm_manifest_cache
+from app.services.ingestion_queue import start_ingestion_workers, stop_ingestion_workers
+from config import settings
 from db.crud import get_video_ids_and_titles_by_user_id
-from db.session import engine, get_session
+from db.session import create_db_and_tables, engine, get_session
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Before startup:
-    SQLModel.metadata.create_all(engine) # Create all tables
+    # Sized for many requests each waiting on a blocking call; LLM calls themselves don't use threads
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.BLOCKING_IO_THREADS, thread_name_prefix="blocking-io")
+    )
+    create_db_and_tables(engine) # Create all tables, and add columns newer than an existing database
+    with Session(engine) as db:
+        warm_manifest_cache(db)
+    init_components() # LLM, embeddings, Chroma client and vector store, with connections opened
+    start_ingestion_workers(engine, num_workers=settings.INGEST_WORKERS)
+    start_eviction_sweeper(
+        engine, interval=settings.EVICTION_INTERVAL_SECONDS, max_idle_seconds=settings.COLD_VIDEO_IDLE_SECONDS,
+        max_videos=settings.MAX_HOT_VIDEOS, max_chunks=settings.MAX_HOT_CHUNKS
+    )
     yield
     # After startup:
+    stop_eviction_sweeper()
+    stop_ingestion_workers()
 
 
 app = FastAPI(
@@ -51,6 +74,16 @@ app.add_middleware(
 app.include_router(summary_router, prefix="/api")
 app.include_router(chat_router, prefix="/api")
 app.include_router(session_router, prefix="/api")
+app.include_router(ingest_router, prefix="/api")
+app.include_router(stats_router, prefix="/api")
+
+@app.get("/ready")
+def ready_endpoint(response: Response):
+    ready, error = check_ready()
+    if not ready:
+        response.status_code = 503
+        return {"status": "starting", "detail": error}
+    return {"status": "ready"}
 
 @app.get("/api/users/{user_id}/conversations", response_model=PreviousConversationsResponse)
 def get_past_conversations(
@@ -0,0 +1,40 @@
+"""
+Repair the ingestion manifest against the vector store, e.g. after a crash mid-ingest
+or when upgrading a deployment whose videos were ingested before the manifest existed.
+
+Usage:
+    python -m app.reconcile_cli
+"""
+import argparse
+import sys
+
+from sqlmodel import Session
+
+from app.services.ingestion import CHUNK_OVERLAP, CHUNK_SIZE
+from app.services.ingestion_manifest import reconcile_manifest
+from app.vector_database import get_embedding_function, get_vector_store
+from db.session import create_db_and_tables, engine
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Reconcile the ingestion manifest with the Chroma collection.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parse_args(argv)
+    create_db_and_tables(engine) # Make sure tables exist when run outside the API
+
+    vector_store = get_vector_store(get_embedding_function())
+    with Session(engine) as db:
+        counts = reconcile_manifest(db, vector_store, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+    print(
+        f"Complete: {counts['complete']}, partial: {counts['partial']}, missing: {counts['missing']} "
+        f"({counts['added']} video(s) added from the vector store)."
+    )
+    return 1 if counts["partial"] or counts["missing"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.services.embedding_cache import content_hash
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def history_fingerprint(history: list[tuple[str, str]], summary: str = "") -> str:
+    """Identifies a conversation so far (its latest turns and the summary of earlier ones); empty for a first question."""
+    if not history and not summary:
+        return ""
+    return content_hash(summary + "\x1d" + "\x1e".join(f"{question}\x1f{answer}" for question, answer in history))
+
+
+class _VideoAnswers:
+    def __init__(self) -> None:
+        self.vectors: list[np.ndarray] = [] # Unit-length question embeddings
+        self.histories: list[str] = []
+        self.answers: list[str] = []
+        self.expires_at: list[float] = []
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def drop(self, i: int) -> None:
+        for column in (self.vectors, self.histories, self.answers, self.expires_at):
+            del column[i]
+
+
+class SemanticAnswerCache:
+    """
+    Answers already given about a video, found again by the question's meaning rather than its exact text:
+    a question is a hit when its embedding's cosine similarity to a cached question about the same video,
+    asked after the same history, is at least `threshold`.
+
+    Holds at most `max_entries` answers across all videos, dropping the oldest answer of the least
+    recently asked-about video first, and each expires `ttl_seconds` after it was stored.
+    In-memory and per process; `invalidate` must be called when a video's chunks change.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._videos: OrderedDict[str, _VideoAnswers] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, video_id: str, query_vector: list[float], history: str = "") -> str | None:
+        query = _unit(query_vector)
+        now = time.monotonic()
+        with self._lock:
+            answers = self._videos.get(video_id)
+            best, best_score = None, self.threshold
+            if answers is not None:
+                self._videos.move_to_end(video_id)
+                self._expire(answers, now)
+                if not answers:
+                    del self._videos[video_id]
+                for i in range(len(answers)):
+                    if answers.histories[i] != history:
+                        continue
+                    score = float(answers.vectors[i] @ query)
+                    if score >= best_score:
+                        best, best_score = answers.answers[i], score
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return best
+
+    def put(self, video_id: str, query_vector: list[float], answer: str, history: str = "") -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            answers = self._videos.setdefault(video_id, _VideoAnswers())
+            self._videos.move_to_end(video_id)
+            answers.vectors.append(_unit(query_vector))
+            answers.histories.append(history)
+            answers.answers.append(answer)
+            answers.expires_at.append(time.monotonic() + self.ttl_seconds)
+            self._size += 1
+            while self._size > self.max_entries:
+                coldest_id, coldest = next(iter(self._videos.items()))
+                if coldest:
+                    coldest.drop(0)
+                    self._size -= 1
+                    self.evictions += 1
+                if not coldest:
+                    del self._videos[coldest_id]
+
+    def invalidate(self, video_id: str) -> None:
+        """Forgets every answer about the video (its transcript chunks were re-ingested)."""
+        with self._lock:
+            answers = self._videos.pop(video_id, None)
+            if answers is not None:
+                self._size -= len(answers)
+                logger.debug(f"Answer cache: dropped {len(answers)} answer(s) for video {video_id}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._videos.clear()
+            self._size = 0
+
+    def _expire(self, answers: _VideoAnswers, now: float) -> None:
+        # Entries are appended in expiry order, so expired ones are at the front
+        while answers and answers.expires_at[0] <= now:
+            answers.drop(0)
+            self._size -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "videos": len(self._videos),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+def _unit(vector: list[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm > 0 else array
+
+
+_answer_cache: SemanticAnswerCache | None = None
+
+def get_answer_cache() -> SemanticAnswerCache | None:
+    """The shared answer cache, or None when it is disabled."""
+    global _answer_cache
+    if settings.ANSWER_CACHE_SIZE <= 0:
+        return None
+    if _answer_cache is None:
+        _answer_cache = SemanticAnswerCache(
+            max_entries=settings.ANSWER_CACHE_SIZE,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            threshold=settings.ANSWER_CACHE_SIMILARITY
+        )
+    return _answer_cache
@@ -0,0 +1,179 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator
+from uuid import uuid4
+
+from langchain.schema import Document
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from app.backend_schemas import BatchIngestStatus, BatchItemStatus
+from app.services.chunking import chunk_documents
+from app.services.ingestion import CHUNK_OVERLAP, CHUNK_SIZE, save_chunk_vectors
+from app.services.ingestion_manifest import is_ingested
+from app.services.single_flight import ingestion_flight
+from app.services.summariser import summarise_ingest
+from app.services.transcription import (TranscriptUnavailableError,
+                                        check_transcript_available, extract_video_id,
+                                        fetch_transcript_documents,
+                                        forget_transcript_failure, get_transcript,
+                                        get_video_metadata, remember_transcript_failure,
+                                        store_transcript)
+from app.vector_database import get_embedding_function, get_vector_store
+from config import settings
+from db.crud import load_summary, load_transcript
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("transcript", "metadata", "chunking", "embedding", "summary")
+
+
+def default_stage_limits() -> dict[str, int]:
+    return {
+        "transcript": settings.BATCH_TRANSCRIPT_CONCURRENCY,
+        "metadata": settings.BATCH_METADATA_CONCURRENCY,
+        "chunking": settings.BATCH_CHUNK_CONCURRENCY,
+        "embedding": settings.BATCH_EMBED_CONCURRENCY,
+        "summary": settings.BATCH_SUMMARY_CONCURRENCY,
+    }
+
+
+class BatchIngestor:
+    """
+    Ingests many videos as a pipeline: each video moves through transcript → metadata →
+    chunking → embedding → summary, and every stage has its own concurrency limit,
+    so slow YouTube downloads for one video overlap with embedding and summarising others.
+    Videos whose summary and vectors are already cached are skipped.
+    """
+
+    def __init__(
+            self,
+            engine: Engine,
+            stage_limits: dict[str, int] | None = None,
+            max_in_flight: int | None = None,
+            on_progress: Callable[[BatchItemStatus], None] | None = None
+            ) -> None:
+        limits = stage_limits or default_stage_limits()
+        self.engine = engine
+        self.max_in_flight = max_in_flight or settings.BATCH_MAX_IN_FLIGHT
+        self.on_progress = on_progress
+        self._gates = {stage: threading.BoundedSemaphore(max(1, limits[stage])) for stage in STAGES}
+        self._lock = threading.Lock()
+
+    def run(self, batch: BatchIngestStatus) -> BatchIngestStatus:
+        logger.info(f"Batch {batch.batch_id}: ingesting {len(batch.items)} video(s)")
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="batch-ingest") as pool:
+            list(pool.map(self._run_item, batch.items))
+        batch.finished = True
+        done = sum(item.status in ("done", "skipped") for item in batch.items)
+        logger.info(f"Batch {batch.batch_id}: finished, {done}/{len(batch.items)} video(s) ingested")
+        return batch
+
+    def _update(self, item: BatchItemStatus, **fields) -> None:
+        with self._lock:
+            for name, value in fields.items():
+                setattr(item, name, value)
+        if self.on_progress is not None:
+            self.on_progress(item)
+
+    @contextmanager
+    def _stage(self, item: BatchItemStatus, stage: str) -> Iterator[None]:
+        with self._gates[stage]:
+            self._update(item, status="running", stage=stage)
+            yield
+
+    def _run_item(self, item: BatchItemStatus) -> None:
+        try:
+            video_id = extract_video_id(item.video_url)
+            self._update(item, video_id=video_id)
+            with Session(self.engine) as db:
+                self._ingest_item(item, video_id, db)
+        except Exception as e:
+            logger.exception(f"Batch ingest failed for {item.video_url}")
+            self._update(item, status="failed", error=str(e))
+
+    def _ingest_item(self, item: BatchItemStatus, video_id: str, db: Session) -> None:
+        vector_store = get_vector_store(get_embedding_function())
+        has_summary = load_summary(db, video_id) is not None
+        has_vectors = is_ingested(video_id, db)
+        if has_summary and has_vectors:
+            self._update(item, status="skipped", stage=None)
+            return
+
+        documents = self._transcript(item, video_id, db)
+        if not documents:
+            raise ValueError(f"No transcript found or processed for {item.video_url}.")
+
+        if not has_vectors:
+            with self._stage(item, "chunking"):
+                chunks: list[Document] = chunk_documents(documents, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+            with self._stage(item, "embedding"):
+                ingestion_flight.do(
+                    f"vectors:{video_id}",
+                    lambda: None if is_ingested(video_id, db) else save_chunk_vectors(db, video_id, chunks, vector_store)
+                )
+
+        if not has_summary:
+            with self._stage(item, "summary"):
+                summarise_ingest(item.video_url, db) # Transcript is cached by now
+
+        self._update(item, status="done", stage=None)
+
+    def _transcript(self, item: BatchItemStatus, video_id: str, db: Session) -> list[Document]:
+        if load_transcript(db, video_id) is not None:
+            return get_transcript(item.video_url, db)
+
+        def download() -> list[Document]:
+            # Another request may have saved the transcript while we waited to lead
+            if load_transcript(db, video_id) is not None:
+                return get_transcript(item.video_url, db)
+            with self._stage(item, "transcript"):
+                try:
+                    docs = fetch_transcript_documents(video_id)
+                except TranscriptUnavailableError as e:
+                    remember_transcript_failure(db, e)
+                    raise
+            forget_transcript_failure(db, video_id)
+            with self._stage(item, "metadata"):
+                metadata = get_video_metadata(video_id, db)
+            return store_transcript(db=db, video_id=video_id, docs=docs, metadata=metadata)
+
+        # Skip videos known to have no transcript, and share the download
+        # with any chat/summary request for the same video
+        check_transcript_available(video_id, db)
+        return ingestion_flight.do(f"transcript:{video_id}", download)
+
+
+# --- In-process registry of submitted batches, for progress polling ---
+_batches: dict[str, BatchIngestStatus] = {}
+_batches_lock = threading.Lock()
+
+def new_batch(video_urls: list[str]) -> BatchIngestStatus:
+    batch = BatchIngestStatus(
+        batch_id=str(uuid4()),
+        items=[BatchItemStatus(video_url=url) for url in video_urls]
+    )
+    with _batches_lock:
+        _prune_finished_batches()
+        _batches[batch.batch_id] = batch
+    return batch
+
+def _prune_finished_batches() -> None:
+    # Batches are registered in start order, so the first finished ones are the oldest
+    finished = [batch_id for batch_id, batch in _batches.items() if batch.finished]
+    for batch_id in finished[:max(0, len(finished) - settings.BATCH_HISTORY_SIZE)]:
+        del _batches[batch_id]
+
+def start_batch_ingest(video_urls: list[str], engine: Engine) -> BatchIngestStatus:
+    """Registers a batch and runs it on a background thread; poll `get_batch` for progress."""
+    batch = new_batch(video_urls)
+    ingestor = BatchIngestor(engine=engine)
+    thread = threading.Thread(target=ingestor.run, args=(batch,), name=f"batch-{batch.batch_id}", daemon=True)
+    thread.start()
+    return batch
+
+def get_batch(batch_id: str) -> BatchIngestStatus | None:
+    with _batches_lock:
+        return _batches.get(batch_id)
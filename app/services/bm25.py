@@ -0,0 +1,69 @@
+import math
+import re
+from collections import Counter
+
+# Words too common in spoken transcripts to help ranking
+STOP_WORDS = frozenset(
+    "a an and are as at be but by do for from has have he i if in is it its of on or so that the "
+    "then there they this to was we were what when which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in re.findall(r"\w+", text.lower()) if token not in STOP_WORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over one video's chunks. Term statistics (postings, idf, lengths) are computed once
+    at build time, so a query only touches the postings of its own terms.
+    """
+
+    def __init__(self, postings: dict[str, list[list[int]]], idf: dict[str, float], doc_lens: list[int], k1: float = 1.5, b: float = 0.75) -> None:
+        self.postings = postings # term -> [[chunk position, term frequency], ...]
+        self.idf = idf
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+        self.avgdl = sum(doc_lens) / len(doc_lens) if doc_lens else 0.0
+
+    @classmethod
+    def build(cls, texts: list[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        postings: dict[str, list[list[int]]] = {}
+        doc_lens = []
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append([i, tf])
+        n = len(texts)
+        idf = {term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5)) for term, docs in postings.items()}
+        return cls(postings=postings, idf=idf, doc_lens=doc_lens, k1=k1, b=b)
+
+    def top_k(self, query: str, k: int) -> list[int]:
+        """Chunk positions of the k best matches, best first. Chunks sharing no term with the query are left out."""
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lens[i] / self.avgdl)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores, key=lambda i: (-scores[i], i))[:k]
+
+    def to_dict(self) -> dict:
+        return {"k1": self.k1, "b": self.b, "doc_lens": self.doc_lens, "idf": self.idf, "postings": self.postings}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        return cls(postings=data["postings"], idf=data["idf"], doc_lens=data["doc_lens"], k1=data["k1"], b=data["b"])
+
+
+def reciprocal_rank_fusion(rankings: list[list[int]], k: int = 60) -> list[int]:
+    """Merges ranked lists: each item scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: -scores[item])
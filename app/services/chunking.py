@@ -11,8 +11,12 @@ def chunk_documents(documents: list[Document], chunk_size: int, chunk_overlap: i
         chunk_size = chunk_size,
         chunk_overlap = chunk_overlap,
         length_function = len,
+        add_start_index = True, # character offset of the chunk in its transcript, as metadata["start_index"]
     )
     docs = text_splitter.split_documents(documents=documents)
+    # position of the chunk in the video, so stores without ordering can restore transcript order
+    for i, doc in enumerate(docs):
+        doc.metadata["chunk_index"] = i
     logger.info(f"Split document '{docs[0].metadata["title"]}' into {len(docs)} chunks")
     logger.debug(f"Chunk samples: {docs[:2]}")
     return docs
\ No newline at end of file
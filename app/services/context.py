@@ -0,0 +1,162 @@
+import logging
+import re
+
+import numpy as np
+from langchain.schema import Document
+
+from app.services.tokens import get_token_counter
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+SHINGLE_WORDS = 4 # Near-duplicate detection compares runs of this many words
+
+
+def mmr_select(query_vector: list[float] | np.ndarray, candidate_vectors: np.ndarray, k: int, lambda_mult: float = 0.5) -> list[int]:
+    """
+    Maximal marginal relevance over a candidate set, as matrix operations: one product for
+    query relevance, one for candidate-candidate similarity, then k cheap vector updates.
+    Returns row positions into `candidate_vectors`, in selection order.
+    `lambda_mult` trades relevance (1.0) against diversity (0.0).
+    """
+    n = len(candidate_vectors)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    vectors = np.asarray(candidate_vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = (vectors / np.where(norms > 0, norms, 1.0)).astype(np.float32, copy=False)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query_norm = np.linalg.norm(query)
+    if query_norm > 0:
+        query = query / query_norm
+
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    available = np.ones(n, dtype=bool)
+    available[first] = False
+    max_similarity = similarity[first].copy() # Each candidate's similarity to its closest selected chunk
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        chosen = int(np.argmax(scores))
+        selected.append(chosen)
+        available[chosen] = False
+        np.maximum(max_similarity, similarity[chosen], out=max_similarity)
+    return selected
+
+
+def expand_with_neighbours(positions: list[int], n_chunks: int, window: int) -> list[int]:
+    """The hits plus up to `window` chunks either side of each, sorted by position in the transcript."""
+    expanded = {
+        neighbour
+        for position in positions
+        for neighbour in range(position - window, position + window + 1)
+        if 0 <= neighbour < n_chunks
+    }
+    return sorted(expanded)
+
+
+def merge_contiguous(chunks: list[tuple[int, Document]]) -> list[tuple[list[int], Document]]:
+    """
+    Joins runs of consecutive chunk positions into single passages, writing the text they share
+    (the chunker's overlap) only once. Input must be sorted by position.
+    Returns (positions, passage) pairs.
+    """
+    passages: list[tuple[list[int], Document]] = []
+    for position, doc in chunks:
+        if passages and passages[-1][0][-1] == position - 1:
+            positions, passage = passages[-1]
+            positions.append(position)
+            passage.page_content = _join_overlapping(passage, doc)
+            passage.metadata["end_index"] = _end_index(doc)
+        else:
+            metadata = {**doc.metadata, "end_index": _end_index(doc)}
+            passages.append(([position], Document(page_content=doc.page_content, metadata=metadata)))
+    return passages
+
+
+def _end_index(doc: Document) -> int | None:
+    start = doc.metadata.get("start_index")
+    return start + len(doc.page_content) if start is not None else None
+
+
+def _join_overlapping(passage: Document, doc: Document, max_overlap: int = 400) -> str:
+    text, addition = passage.page_content, doc.page_content
+    end, start = passage.metadata.get("end_index"), doc.metadata.get("start_index")
+    if end is not None and start is not None:
+        # Character offsets from the splitter say exactly how much is shared
+        overlap = end - start
+        if overlap <= 0:
+            return f"{text} {addition}"
+        return text + addition[overlap:]
+    # No offsets (older chunks): look for the longest suffix of one that starts the other
+    for size in range(min(max_overlap, len(text), len(addition)), 0, -1):
+        if text.endswith(addition[:size]):
+            return text + addition[size:]
+    return f"{text} {addition}"
+
+
+def trim_to_budget(passages: list[Document], max_tokens: int) -> list[Document]:
+    """Keeps passages in order until the next would exceed `max_tokens`; the first is always kept (cut if needed)."""
+    counter = get_token_counter()
+    kept: list[Document] = []
+    used = 0
+    for passage in passages:
+        tokens = counter.count(passage.page_content)
+        if used + tokens > max_tokens:
+            if not kept:
+                kept.append(Document(page_content=counter.truncate(passage.page_content, max_tokens), metadata=passage.metadata))
+            break
+        kept.append(passage)
+        used += tokens
+    return kept
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> set[int]:
+    """Hashes of every run of `size` consecutive words (lowercased, punctuation ignored)."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {hash(tuple(words))} if words else set()
+    return {hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def is_near_duplicate(candidate: set[int], kept: set[int], threshold: float) -> bool:
+    """True if at least `threshold` of the smaller shingle set is shared, so a passage repeated inside a longer one counts too."""
+    smaller = min(len(candidate), len(kept))
+    return smaller > 0 and len(candidate & kept) / smaller >= threshold
+
+
+def drop_near_duplicates(passages: list[Document], threshold: float) -> list[Document]:
+    """Keeps passages in order, skipping any that is a near-duplicate of one already kept (repeated speech, re-ingested chunks)."""
+    kept: list[Document] = []
+    kept_shingles: list[set[int]] = []
+    for passage in passages:
+        candidate = shingles(passage.page_content)
+        if any(is_near_duplicate(candidate, other, threshold) for other in kept_shingles):
+            logger.debug(f"Dropped near-duplicate passage: {passage.page_content[:80]!r}")
+            continue
+        kept.append(passage)
+        kept_shingles.append(candidate)
+    return kept
+
+
+def assemble_context(chunks: list[tuple[int, Document]], hits: list[int], max_tokens: int, dedupe_threshold: float) -> list[Document]:
+    """
+    Builds the prompt context from retrieved chunks and their positions in the transcript: runs of
+    contiguous chunks become single passages, near-duplicate passages are dropped, and the passages
+    holding the best `hits` (positions, best first) are kept within `max_tokens`.
+    The result is in transcript order, so the model reads the passages as they were spoken.
+    """
+    rank = {position: r for r, position in enumerate(hits)}
+    passages = merge_contiguous(sorted(chunks, key=lambda chunk: chunk[0]))
+    passages.sort(key=lambda passage: min(rank.get(position, len(rank)) for position in passage[0]))
+
+    start = {id(passage): positions[0] for positions, passage in passages}
+    kept = drop_near_duplicates([passage for _, passage in passages], threshold=dedupe_threshold)
+    kept = trim_to_budget(kept, max_tokens=max_tokens)
+    kept_start = [start.get(id(passage), 0) for passage in kept] # A passage cut to fit is a copy, kept alone
+    return [passage for _, passage in sorted(zip(kept_start, kept), key=lambda pair: pair[0])]
@@ -1,6 +1,19 @@
 import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Callable, Iterator
 
-from app.vector_database import get_embedding_function, get_vector_store
+from langchain.schema import Document
+from langchain_chroma.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+
+from app.services.embedding_cache import content_hash
+from app.vector_database import (get_embedding_function, get_vector_store,
+                                 upsert_embeddings)
+from config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -11,17 +24,139 @@ logging.getLogger("chromadb.telemetry.product.posthog").setLevel(logging.WARNING
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
-def embed_and_save(documents):
-    embedding_function = get_embedding_function() # Returns nomic-embed Ollama embeddings model
-    
-    vectordb = get_vector_store(embedding_function)
-    logger.info(f"Connected to ChromaDB {vectordb._persist_directory}")
-
-    metas = [doc.metadata for doc in documents]
-    ids = [f"{doc.metadata["video_id"]}-{i}" for i, doc in enumerate(documents)]
-    
-    vectordb.add_documents(
-        documents=documents,
-        metadata = metas,
-        ids=ids)
-    logger.info(f"Added {len(documents)} documents to {vectordb._persist_directory}")
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps concurrent embedding requests, adapting to the provider's rate limit:
+    the limit halves on a 429 and grows back by one after a run of successful batches.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, increase_after: int = 4) -> None:
+        self.max_limit = max(max_limit, min_limit)
+        self.min_limit = min_limit
+        self.limit = self.max_limit
+        self.increase_after = increase_after
+        self._in_flight = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def record_success(self) -> None:
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def record_rate_limited(self) -> None:
+        with self._cond:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self._successes = 0
+        logger.warning(f"Embedding rate limited, concurrency reduced to {self.limit}")
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    text = f"{type(error).__name__} {error}".lower()
+    return "429" in text or "resourceexhausted" in text or "resource_exhausted" in text or "rate limit" in text
+
+
+def make_batches(documents: list[Document], max_chars: int, max_docs: int) -> list[list[int]]:
+    """Groups document indices into batches of at most `max_docs` documents and roughly `max_chars` characters."""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_chars = 0
+    for i, doc in enumerate(documents):
+        length = len(doc.page_content)
+        if current and (current_chars + length > max_chars or len(current) >= max_docs):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(i)
+        current_chars += length
+    if current:
+        batches.append(current)
+    return batches
+
+
+def chunk_id(doc: Document, position: int) -> str:
+    """
+    Stable id for a chunk: its video plus a hash of its position and text, so re-running the same
+    ingest upserts the same ids and any change to a chunk gives it a new one.
+    `position` is used when the chunk has no `chunk_index` metadata.
+    """
+    chunk_index = doc.metadata.get("chunk_index", position)
+    return f"{doc.metadata['video_id']}-{content_hash(f'{chunk_index}:{doc.page_content}')[:16]}"
+
+
+def embed_and_save(documents: list[Document], embedding_function: Embeddings | None = None, vector_store: Chroma | None = None, on_batch_stored: Callable[[list[str]], None] | None = None) -> None:
+    """
+    Embeds the chunks in size-bounded batches, a few at a time, and upserts each batch
+    to Chroma as soon as its embeddings arrive, so a failure only loses the batches in flight.
+    `on_batch_stored` is called with the chunk ids of each upserted batch, from the calling thread.
+    """
+    if not documents:
+        return
+    embedding_function = embedding_function or get_embedding_function()
+    vectordb = vector_store or get_vector_store(embedding_function)
+
+    ids = [chunk_id(doc, i) for i, doc in enumerate(documents)]
+    batches = make_batches(documents, max_chars=settings.EMBED_BATCH_MAX_CHARS, max_docs=settings.EMBED_BATCH_MAX_DOCS)
+    limiter = AdaptiveConcurrencyLimiter(max_limit=settings.EMBED_MAX_CONCURRENCY)
+
+    def run_batch(batch: list[int]) -> list[str]:
+        batch_ids = [ids[i] for i in batch]
+        _embed_and_upsert_batch(
+            ids=batch_ids,
+            documents=[documents[i] for i in batch],
+            embedding_function=embedding_function,
+            vectordb=vectordb,
+            limiter=limiter
+        )
+        return batch_ids
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=limiter.max_limit, thread_name_prefix="embed") as pool:
+        futures = [pool.submit(run_batch, batch) for batch in batches]
+        for future in as_completed(futures):
+            error = future.exception()
+            if error is not None:
+                errors.append(error)
+            elif on_batch_stored is not None:
+                on_batch_stored(future.result())
+
+    if errors:
+        logger.error(f"{len(errors)} of {len(batches)} embedding batches failed")
+        raise errors[0]
+    logger.info(f"Added {len(documents)} documents to the vector store in {len(batches)} batch(es)")
+
+
+def _embed_and_upsert_batch(ids: list[str], documents: list[Document], embedding_function: Embeddings, vectordb: Chroma, limiter: AdaptiveConcurrencyLimiter) -> None:
+    texts = [doc.page_content for doc in documents]
+    for attempt in range(settings.EMBED_MAX_RETRIES + 1):
+        try:
+            with limiter.slot():
+                embeddings = embedding_function.embed_documents(texts)
+            break
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == settings.EMBED_MAX_RETRIES:
+                raise
+            limiter.record_rate_limited()
+            # Exponential backoff with jitter so retries don't arrive together
+            delay = settings.EMBED_RETRY_BASE_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+            logger.info(f"Retrying embedding batch of {len(texts)} in {delay:.1f}s (attempt {attempt + 1})")
+            time.sleep(delay)
+
+    limiter.record_success()
+    upsert_embeddings(vectordb, ids=ids, embeddings=embeddings, documents=documents)
+    logger.debug(f"Upserted batch of {len(ids)} chunks ({ids[0]} … {ids[-1]})")
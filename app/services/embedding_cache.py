@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import cast
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingDiskStore:
+    """
+    Stores embedding vectors on local disk as raw little-endian float32 files,
+    one per (model name, sha256 of text): <root>/<model>/<hash[:2]>/<hash>.f32
+
+    Total size is bounded by `max_bytes`; the least recently used vectors are evicted first
+    (file mtimes record recency, so it survives restarts).
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._index: OrderedDict[Path, int] = OrderedDict() # path -> size, oldest first
+        self._total_bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _path(self, model_name: str, text_hash: str) -> Path:
+        model_dir = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        return self.root / model_dir / text_hash[:2] / f"{text_hash}.f32"
+
+    def _load_index(self) -> None:
+        # Called with the lock held
+        if self._loaded:
+            return
+        entries = []
+        if self.root.exists():
+            for path in self.root.rglob("*.f32"):
+                stat = path.stat()
+                entries.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(entries):
+            self._index[path] = size
+            self._total_bytes += size
+        self._loaded = True
+        logger.info(f"Embedding cache: {len(self._index)} vectors ({self._total_bytes} bytes) in {self.root}")
+
+    def get(self, model_name: str, text_hash: str) -> list[float] | None:
+        path = self._path(model_name, text_hash)
+        with self._lock:
+            self._load_index()
+            if path not in self._index:
+                return None
+            self._index.move_to_end(path)
+        try:
+            vector = np.fromfile(path, dtype="<f4")
+            os.utime(path) # Mark as recently used
+        except OSError:
+            with self._lock:
+                self._total_bytes -= self._index.pop(path, 0)
+            return None
+        return cast(list[float], vector.tolist())
+
+    def put(self, model_name: str, text_hash: str, vector: list[float]) -> None:
+        path = self._path(model_name, text_hash)
+        data = np.asarray(vector, dtype="<f4").tobytes()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path) # Atomic, so readers never see a partial vector
+
+        with self._lock:
+            self._load_index()
+            self._total_bytes += len(data) - self._index.pop(path, 0)
+            self._index[path] = len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        # Called with the lock held
+        while self._total_bytes > self.max_bytes and self._index:
+            path, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load_index()
+            return {"entries": len(self._index), "bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model so document texts embedded before are read from disk
+    instead of being sent to the provider again.
+    Only document embeddings are cached here; queries go straight to the model.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, store: EmbeddingDiskStore) -> None:
+        self.underlying = underlying
+        self.model_name = model_name
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        hashes = [content_hash(text) for text in texts]
+        vectors: list[list[float] | None] = [self.store.get(self.model_name, h) for h in hashes]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            new_vectors = self.underlying.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, new_vectors):
+                self.store.put(self.model_name, hashes[i], vector)
+                vectors[i] = vector
+        logger.debug(f"Embedding cache: {len(texts) - len(missing)} hit(s), {len(missing)} miss(es)")
+        return vectors  # type: ignore[return-value]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.underlying.aembed_query(text)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            counters = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+        return {"model": self.model_name, **counters, **self.store.stats()}
+
+
+def normalise_query(text: str) -> str:
+    """Case, whitespace and trailing punctuation don't change what a question asks."""
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+
+class QueryCachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model so repeated questions reuse their query embedding from an in-memory
+    LRU/TTL cache, keyed by embedding model and normalised query text. Documents pass straight through.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, cache: TTLCache) -> None:
+        self.underlying = underlying
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = (self.model_name, normalise_query(text))
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """`embed_query` with the model's async call on a miss (a thread for models that only embed synchronously)."""
+        key = (self.model_name, normalise_query(text))
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = await self.underlying.aembed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+    def stats(self) -> dict:
+        return {"model": self.model_name, **self.cache.stats()}
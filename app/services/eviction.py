@@ -0,0 +1,140 @@
+import logging
+import threading
+from datetime import datetime, timezone
+
+from langchain_chroma.vectorstores import Chroma
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from app.services.ingestion_manifest import mark_evicted
+from app.services.local_index import get_local_index
+from app.vector_database import (delete_chunk_vectors, get_embedding_function,
+                                 get_vector_store, get_video_chunk_ids)
+from db.crud import delete_stored_chunks, load_ingestion_manifests
+from db.models import IngestionManifest
+
+logger = logging.getLogger(__name__)
+
+
+def _last_used(manifest: IngestionManifest) -> datetime:
+    last_used = manifest.last_accessed_at or manifest.updated_at
+    # SQLite hands datetimes back without a timezone; they were written in UTC
+    return last_used if last_used.tzinfo is not None else last_used.replace(tzinfo=timezone.utc)
+
+
+def select_cold_videos(manifests: list[IngestionManifest], now: datetime, max_idle_seconds: float, max_videos: int, max_chunks: int, grace_seconds: float = 600) -> list[str]:
+    """
+    Picks the complete videos to drop from the vector store, least recently chatted about first:
+    every video idle for more than `max_idle_seconds` (0 = no limit), then more of the oldest until at most
+    `max_videos` videos and `max_chunks` chunks remain (0 = no cap).
+    Videos used within the last `grace_seconds` are never evicted to meet a cap.
+    """
+    hot = sorted((m for m in manifests if m.status == "complete"), key=_last_used)
+    total_chunks = sum(m.chunk_count for m in hot)
+    evict: list[str] = []
+    for i, manifest in enumerate(hot):
+        idle = (now - _last_used(manifest)).total_seconds()
+        remaining = len(hot) - i
+        over_cap = (max_videos > 0 and remaining > max_videos) or (max_chunks > 0 and total_chunks > max_chunks)
+        if (max_idle_seconds > 0 and idle > max_idle_seconds) or (over_cap and idle > grace_seconds):
+            evict.append(manifest.video_id)
+            total_chunks -= manifest.chunk_count
+        elif not over_cap:
+            break # The rest are newer still
+    return evict
+
+
+def evict_video(db: Session, video_id: str, vector_store: Chroma) -> int:
+    """
+    Drops one video's vectors from Chroma and its local index, keeping the cached transcript
+    so the next chat re-chunks it (with cached embeddings) instead of downloading it again.
+    Returns how many chunks were deleted.
+    """
+    # Flip the manifest first so no request treats the video as ingested while its vectors go
+    mark_evicted(db, video_id)
+    ids = get_video_chunk_ids(video_id, vector_store)
+    delete_chunk_vectors(vector_store, ids)
+    delete_stored_chunks(db, video_id)
+    get_local_index().remove(video_id)
+    logger.info(f"Evicted video {video_id}: {len(ids)} chunks removed from the vector store")
+    return len(ids)
+
+
+def evict_cold_videos(db: Session, vector_store: Chroma, max_idle_seconds: float, max_videos: int, max_chunks: int) -> list[str]:
+    """Evicts the videos `select_cold_videos` picks. Returns their ids."""
+    video_ids = select_cold_videos(
+        load_ingestion_manifests(db), now=datetime.now(timezone.utc),
+        max_idle_seconds=max_idle_seconds, max_videos=max_videos, max_chunks=max_chunks
+    )
+    evicted: list[str] = []
+    for video_id in video_ids:
+        try:
+            evict_video(db, video_id, vector_store)
+        except Exception:
+            logger.exception(f"Failed to evict video {video_id}")
+            db.rollback()
+            continue
+        evicted.append(video_id)
+    if evicted:
+        logger.info(f"Evicted {len(evicted)} cold video(s)")
+    return evicted
+
+
+class EvictionSweeper:
+    """Runs `evict_cold_videos` on a background thread every `interval` seconds."""
+
+    def __init__(self, engine: Engine, interval: float, max_idle_seconds: float, max_videos: int, max_chunks: int) -> None:
+        self.engine = engine
+        self.interval = interval
+        self.max_idle_seconds = max_idle_seconds
+        self.max_videos = max_videos
+        self.max_chunks = max_chunks
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="eviction-sweeper", daemon=True)
+        self._thread.start()
+        logger.info(f"Started eviction sweeper (every {self.interval:.0f}s)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        logger.info("Stopped eviction sweeper")
+
+    def sweep(self) -> list[str]:
+        with Session(self.engine) as db:
+            vector_store = get_vector_store(get_embedding_function())
+            return evict_cold_videos(
+                db, vector_store, max_idle_seconds=self.max_idle_seconds,
+                max_videos=self.max_videos, max_chunks=self.max_chunks
+            )
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Eviction sweep failed")
+
+
+_sweeper: EvictionSweeper | None = None
+
+def start_eviction_sweeper(engine: Engine, interval: float, max_idle_seconds: float, max_videos: int, max_chunks: int) -> EvictionSweeper | None:
+    global _sweeper
+    if interval <= 0 or (max_idle_seconds <= 0 and max_videos <= 0 and max_chunks <= 0):
+        logger.info("Cold video eviction disabled")
+        return None
+    if _sweeper is None:
+        _sweeper = EvictionSweeper(engine, interval, max_idle_seconds=max_idle_seconds, max_videos=max_videos, max_chunks=max_chunks)
+        _sweeper.start()
+    return _sweeper
+
+def stop_eviction_sweeper() -> None:
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.stop()
+        _sweeper = None
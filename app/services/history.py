@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import cast
+
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from app.core.cache import TTLCache
+from app.llm import LLMGateway
+from app.services.single_flight import async_ingestion_flight
+from app.services.tokens import count_tokens, get_token_counter
+from config import settings
+from db.crud import (load_conversation_summary, load_history_since,
+                     save_conversation_summary)
+from db.models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class Turn:
+    """One question and answer, copied out of its ChatMessage row so it outlives the session that loaded it."""
+
+    def __init__(self, question: str, answer: str, created_at: datetime) -> None:
+        self.question = question
+        self.answer = answer
+        self.created_at = created_at
+
+    @classmethod
+    def from_message(cls, message: ChatMessage) -> "Turn":
+        return cls(question=message.question, answer=message.answer, created_at=message.created_at)
+
+    def tokens(self) -> int:
+        return count_tokens(self.question) + count_tokens(self.answer)
+
+
+def split_recent(messages: list[Turn], token_budget: int, max_turns: int) -> tuple[list[Turn], list[Turn]]:
+    """
+    Splits a conversation (oldest first) into older turns and the latest turns that fit
+    `token_budget` and `max_turns`, which go into the prompt verbatim.
+    """
+    used = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        cost = messages[i].tokens()
+        if len(messages) - i > max_turns or used + cost > token_budget:
+            break
+        used += cost
+        start = i
+    return messages[:start], messages[start:]
+
+
+class ConversationHistory:
+    """
+    The part of a user's conversation about a video that goes into the prompt: a rolling summary
+    of older turns and the latest turns verbatim. Turns that have left the verbatim window but
+    are not folded into the summary yet are `pending`; they are left out of the prompt.
+    """
+
+    def __init__(self, summary: str, summarised_until: datetime | None, turns_folded: int, recent: list[Turn], pending: list[Turn]) -> None:
+        self.summary = summary
+        self.summarised_until = summarised_until
+        self.turns_folded = turns_folded
+        self.recent = recent
+        self.pending = pending
+
+    @property
+    def turns(self) -> list[tuple[str, str]]:
+        return [(message.question, message.answer) for message in self.recent]
+
+    def add_turn(self, turn: Turn) -> None:
+        older, self.recent = split_recent(
+            self.recent + [turn], token_budget=settings.HISTORY_TOKEN_BUDGET, max_turns=settings.HISTORY_MAX_TURNS
+        )
+        self.pending.extend(older)
+
+
+# Compacted histories of recent conversations, so a follow-up question doesn't re-read the table
+_histories = TTLCache(max_entries=settings.HISTORY_CACHE_SIZE, ttl_seconds=settings.HISTORY_CACHE_TTL_SECONDS)
+
+def get_conversation_history(db: Session, user_id: str, video_id: str) -> ConversationHistory:
+    """The conversation's compacted history, from the cache or rebuilt from the summary and the turns after it."""
+    history = cast(ConversationHistory | None, _histories.get((user_id, video_id)))
+    if history is not None:
+        return history
+
+    record = load_conversation_summary(db, user_id, video_id)
+    since = record.summarised_until if record is not None else None
+    pending, recent = split_recent(
+        [Turn.from_message(message) for message in load_history_since(db, user_id, video_id, since)],
+        token_budget=settings.HISTORY_TOKEN_BUDGET,
+        max_turns=settings.HISTORY_MAX_TURNS
+    )
+    history = ConversationHistory(
+        summary=record.summary if record is not None else "",
+        summarised_until=since,
+        turns_folded=record.turns_folded if record is not None else 0,
+        recent=recent,
+        pending=pending
+    )
+    _histories.put((user_id, video_id), history)
+    return history
+
+
+def record_turn(user_id: str, video_id: str, message: ChatMessage) -> None:
+    """Adds a just-saved turn to the cached history (if the conversation is cached)."""
+    history = _histories.get((user_id, video_id))
+    if history is not None:
+        history.add_turn(Turn.from_message(message))
+
+
+fold_prompt = (
+    "Below is a running summary of a conversation between a user and an assistant about a YouTube video, "
+    "followed by newer exchanges. Rewrite the summary so it also covers the newer exchanges. Keep the names, "
+    "facts, numbers and open questions the user may refer back to. Use at most {max_words} words.\n\n"
+    "Current summary:\n{summary}\n\nNewer exchanges:\n{turns}\n\nUpdated summary:"
+)
+
+async def acompact_conversation(engine: Engine, llm: LLMGateway, user_id: str, video_id: str) -> bool:
+    """
+    Folds the conversation's pending turns into its rolling summary (one LLM call) and saves it.
+    Meant to run after the answer is sent. Returns False if there was nothing to fold.
+    """
+    return await async_ingestion_flight.do(
+        f"history:{user_id}:{video_id}",
+        lambda: _afold_pending(engine, llm, user_id, video_id)
+    )
+
+
+async def _afold_pending(engine: Engine, llm: LLMGateway, user_id: str, video_id: str) -> bool:
+    with Session(engine) as db:
+        history = await asyncio.to_thread(get_conversation_history, db, user_id, video_id)
+        fold = list(history.pending)
+        if not fold:
+            return False
+
+        turns = "\n\n".join(f"User: {m.question}\nAssistant: {m.answer}" for m in fold)
+        prompt = fold_prompt.format(
+            max_words=settings.HISTORY_SUMMARY_MAX_TOKENS * 3 // 4,
+            summary=history.summary or "(none yet)",
+            turns=turns
+        )
+        try:
+            result = await llm.ainvoke(prompt)
+        except Exception:
+            logger.exception(f"Failed to fold {len(fold)} turn(s) into the summary of user {user_id}'s conversation about video {video_id}")
+            return False
+        # Hard cap, whatever the model wrote, so the prompt can't grow with the conversation
+        summary = get_token_counter().truncate(str(result.content).strip(), settings.HISTORY_SUMMARY_MAX_TOKENS)
+
+        record = await asyncio.to_thread(
+            save_conversation_summary, db, user_id, video_id, summary=summary,
+            summarised_until=fold[-1].created_at, turns_folded=history.turns_folded + len(fold)
+        )
+        history.summary = record.summary
+        history.summarised_until = record.summarised_until
+        history.turns_folded = record.turns_folded
+    del history.pending[:len(fold)] # Turns that left the window meanwhile stay pending
+    logger.info(f"Folded {len(fold)} turn(s) into the summary of user {user_id}'s conversation about video {video_id}")
+    return True
@@ -0,0 +1,102 @@
+import logging
+from typing import Callable
+
+from langchain.schema import Document
+from langchain_chroma.vectorstores import Chroma
+from sqlmodel import Session
+
+from app.services.answer_cache import get_answer_cache
+from app.services.chunking import chunk_documents
+from app.services.embedding import chunk_id, embed_and_save
+from app.services.ingestion_manifest import is_ingested, mark_embedding, mark_ingested
+from app.services.local_index import get_local_index
+from app.services.single_flight import ingestion_flight
+from app.services.transcription import extract_video_id, get_transcript
+from app.vector_database import delete_chunk_vectors, get_video_chunk_ids
+from config import settings
+from db.crud import delete_stored_chunks, load_stored_chunk_ids, save_stored_chunks
+
+logger = logging.getLogger(__name__)
+
+# Transcript chunking parameters used for every video in the vector store
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 50
+
+
+def ingest_video(video_url: str, db: Session, vector_store: Chroma, on_stage: Callable[[str], None] | None = None) -> None:
+    """
+    Makes sure the video's transcript chunks are embedded in the vector store.
+    Concurrent callers for the same video wait on one transcript → chunk → embed run.
+    `on_stage` is called with the name of each pipeline stage as the leader starts it.
+    """
+    video_id: str = extract_video_id(video_url)
+    if is_ingested(video_id, db):
+        return
+
+    ingestion_flight.do(
+        f"vectors:{video_id}",
+        lambda: _ingest_vectors(video_url=video_url, video_id=video_id, db=db, vector_store=vector_store, on_stage=on_stage)
+    )
+
+
+def _ingest_vectors(video_url: str, video_id: str, db: Session, vector_store: Chroma, on_stage: Callable[[str], None] | None) -> None:
+    # Another request may have finished ingesting while we waited to lead
+    if is_ingested(video_id, db):
+        return
+
+    def report(stage: str) -> None:
+        if on_stage is not None:
+            on_stage(stage)
+
+    # retrieve transcript
+    report("transcript")
+    documents: list[Document] = get_transcript(video_url=video_url, db=db)
+    if not documents:
+        raise ValueError(f"Cannot ingest video: No transcript found or processed for {video_url}.")
+    # chunk transcript
+    report("chunking")
+    chunks: list[Document] = chunk_documents(documents, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    # embed chunks, upload to vectordb
+    report("embedding")
+    save_chunk_vectors(db, video_id, chunks, vector_store)
+    logger.info(f"Ingested {len(chunks)} chunks for video {video_id}")
+
+
+def save_chunk_vectors(db: Session, video_id: str, chunks: list[Document], vector_store: Chroma) -> None:
+    """
+    Embeds the chunks into Chroma, then refreshes the video's local search index from it.
+
+    Checkpointed: each upserted batch is recorded as StoredChunk rows, and a re-run after a failure
+    only embeds chunks without a record. A record only counts while the chunk is still in the collection
+    (it may be a new collection, or a wiped volume). The ingestion manifest marks the video complete
+    once every chunk is stored.
+    """
+    ids = [chunk_id(doc, i) for i, doc in enumerate(chunks)]
+    mark_embedding(db, video_id, chunk_count=len(chunks), chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+    in_store = set(get_video_chunk_ids(video_id, vector_store))
+    stored = load_stored_chunk_ids(db, video_id) & in_store
+    pending = [doc for doc, id_ in zip(chunks, ids) if id_ not in stored]
+    if len(pending) < len(chunks):
+        logger.info(f"Resuming ingest of video {video_id}: {len(chunks) - len(pending)} of {len(chunks)} chunks already stored")
+    embed_and_save(
+        pending,
+        vector_store=vector_store,
+        on_batch_stored=lambda batch_ids: save_stored_chunks(db, video_id, batch_ids)
+    )
+
+    # Drop vectors of chunks that no longer exist (older chunking, or the old position-only ids)
+    current = set(ids)
+    stale = [id_ for id_ in in_store if id_ not in current]
+    if stale:
+        delete_chunk_vectors(vector_store, stale)
+        logger.info(f"Removed {len(stale)} stale chunk(s) of video {video_id}")
+    delete_stored_chunks(db, video_id, keep=current)
+
+    if settings.LOCAL_INDEX_ENABLED:
+        get_local_index().sync_from_chroma(video_id, vector_store)
+    mark_ingested(db, video_id, chunk_count=len(chunks), chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    # Answers were drawn from the old chunks
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        answer_cache.invalidate(video_id)
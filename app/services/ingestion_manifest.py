@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+
+from langchain.schema import Document
+from langchain_chroma.vectorstores import Chroma
+from sqlmodel import Session
+
+from app.embedding_providers import get_embedding_provider
+from app.services.chunking import chunk_documents
+from app.vector_database import get_video_chunk_positions, list_video_ids_in_store
+from db.crud import (delete_stored_chunks, load_ingestion_manifest,
+                     load_ingestion_manifests, load_transcript, save_ingestion_manifest,
+                     set_ingestion_manifest_status, touch_ingestion_manifest)
+
+logger = logging.getLogger(__name__)
+
+# Video ids whose manifest says every chunk is embedded with the current model; mirrors the table
+_complete: set[str] = set()
+_lock = threading.Lock()
+
+
+def is_ingested(video_id: str, db: Session) -> bool:
+    """
+    True if every chunk of the video is embedded with the configured model.
+    Answered from memory; only videos not yet seen by this process touch the (local) database.
+    """
+    with _lock:
+        if video_id in _complete:
+            return True
+    manifest = load_ingestion_manifest(db, video_id)
+    if manifest is None or manifest.status != "complete" or manifest.embedding_model != get_embedding_provider().model_name:
+        return False
+    with _lock:
+        _complete.add(video_id)
+    return True
+
+
+def mark_embedding(db: Session, video_id: str, chunk_count: int, chunk_size: int, chunk_overlap: int) -> None:
+    """
+    Records that the video's chunks are being embedded; stays this way if the run dies partway.
+    Checkpoints left by a run with another embedding model are dropped, as those vectors can't be reused.
+    """
+    with _lock:
+        _complete.discard(video_id)
+    model_name = get_embedding_provider().model_name
+    previous = load_ingestion_manifest(db, video_id)
+    if previous is not None and previous.embedding_model != model_name:
+        removed = delete_stored_chunks(db, video_id)
+        logger.info(f"Video {video_id} was embedded with {previous.embedding_model}; dropped {removed} checkpoint(s)")
+    save_ingestion_manifest(
+        db, video_id, status="embedding", chunk_count=chunk_count, chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap, embedding_model=model_name
+    )
+
+
+def mark_ingested(db: Session, video_id: str, chunk_count: int, chunk_size: int, chunk_overlap: int) -> None:
+    save_ingestion_manifest(
+        db, video_id, status="complete", chunk_count=chunk_count, chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap, embedding_model=get_embedding_provider().model_name
+    )
+    with _lock:
+        _complete.add(video_id)
+
+
+def mark_evicted(db: Session, video_id: str) -> None:
+    """Records that the video's vectors were dropped; the next chat about it re-ingests it."""
+    with _lock:
+        _complete.discard(video_id)
+    set_ingestion_manifest_status(db, video_id, status="evicted")
+
+
+# Last access time written per video, so a busy video costs one write a minute, not one per question
+_last_touched: dict[str, float] = {}
+TOUCH_INTERVAL_SECONDS = 60.0
+
+def touch_video(db: Session, video_id: str) -> None:
+    now = time.monotonic()
+    with _lock:
+        if now - _last_touched.get(video_id, -TOUCH_INTERVAL_SECONDS) < TOUCH_INTERVAL_SECONDS:
+            return
+        _last_touched[video_id] = now
+    touch_ingestion_manifest(db, video_id)
+
+
+def warm_manifest_cache(db: Session) -> int:
+    """Loads every complete video id into memory (at startup), returning how many there are."""
+    model_name = get_embedding_provider().model_name
+    complete = {m.video_id for m in load_ingestion_manifests(db) if m.status == "complete" and m.embedding_model == model_name}
+    with _lock:
+        _complete.clear()
+        _complete.update(complete)
+    logger.info(f"Ingestion manifest: {len(complete)} complete video(s)")
+    return len(complete)
+
+
+def reconcile_manifest(db: Session, vector_store: Chroma, chunk_size: int, chunk_overlap: int) -> dict[str, int]:
+    """
+    Repairs the manifest against what Chroma actually holds:
+    videos with every chunk present are marked complete, short ones go back to 'embedding' so the next
+    ingest resumes them (keeping only checkpoints for chunks Chroma really has), and videos in Chroma
+    without a manifest entry are added. Videos with chunks stored before chunk positions were recorded
+    also go back to 'embedding', so they are re-chunked and their context can be stitched in order. Evicted videos with no vectors are left as they are.
+    Returns how many videos ended up complete, partial, missing (no vectors at all) and added.
+    """
+    counts = {"complete": 0, "partial": 0, "missing": 0, "added": 0}
+    manifests = {m.video_id: m for m in load_ingestion_manifests(db)}
+    stored_positions: dict[str, dict[str, int | None]] = {}
+
+    for video_id in list_video_ids_in_store(vector_store):
+        if video_id not in manifests:
+            stored_positions[video_id] = get_video_chunk_positions(video_id, vector_store)
+            stored = len(stored_positions[video_id])
+            expected = _expected_chunk_count(db, video_id, chunk_size, chunk_overlap)
+            # Without a cached transcript there is nothing to compare against; trust Chroma
+            chunk_count = expected if expected is not None else stored
+            status = "complete" if stored >= chunk_count else "embedding"
+            manifests[video_id] = save_ingestion_manifest(
+                db, video_id, status=status, chunk_count=chunk_count, chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap, embedding_model=get_embedding_provider().model_name
+            )
+            counts["added"] += 1
+
+    for video_id, manifest in manifests.items():
+        if video_id not in stored_positions:
+            stored_positions[video_id] = get_video_chunk_positions(video_id, vector_store)
+        positioned = {chunk_id for chunk_id, position in stored_positions[video_id].items() if position is not None}
+        stored = len(stored_positions[video_id])
+        if stored >= manifest.chunk_count and stored > 0 and len(positioned) == stored:
+            counts["complete"] += 1
+            if manifest.status != "complete":
+                mark_ingested(db, video_id, manifest.chunk_count, manifest.chunk_size, manifest.chunk_overlap)
+            continue
+        if manifest.status == "evicted" and not stored:
+            continue # Dropped on purpose; re-ingested when next opened
+        counts["partial" if stored else "missing"] += 1
+        if len(positioned) < stored:
+            logger.warning(f"Video {video_id}: {stored - len(positioned)} chunk(s) have no chunk_index; re-chunking it")
+        else:
+            logger.warning(f"Video {video_id}: {stored} of {manifest.chunk_count} chunks in the vector store")
+        mark_embedding(db, video_id, manifest.chunk_count, manifest.chunk_size, manifest.chunk_overlap)
+        # Resuming must not skip chunks whose checkpoint outlived their vectors, or that lack a position
+        delete_stored_chunks(db, video_id, keep=positioned)
+
+    logger.info(f"Reconciled ingestion manifest: {counts}")
+    return counts
+
+
+def _expected_chunk_count(db: Session, video_id: str, chunk_size: int, chunk_overlap: int) -> int | None:
+    transcript = load_transcript(db, video_id)
+    if transcript is None:
+        return None
+    document = Document(page_content=transcript.transcript, metadata={"title": transcript.title, **(transcript.doc_metadata or {})})
+    return len(chunk_documents([document], chunk_size=chunk_size, chunk_overlap=chunk_overlap))
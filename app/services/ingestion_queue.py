@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+
+from langchain_chroma.vectorstores import Chroma
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from app.services.ingestion import ingest_video
+from app.services.ingestion_manifest import is_ingested
+from app.services.transcription import check_transcript_available, extract_video_id
+from app.vector_database import get_embedding_function, get_vector_store
+from db.crud import (claim_next_ingestion_job, enqueue_ingestion_job,
+                     load_ingestion_job, requeue_running_ingestion_jobs,
+                     update_ingestion_job)
+from db.models import IngestionJob
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionPendingError(Exception):
+    """Raised when a video's vectors are not ready yet and its ingestion job is still queued or running."""
+
+    def __init__(self, job: IngestionJob) -> None:
+        super().__init__(f"Video {job.video_id} is still being ingested (status: {job.status}, stage: {job.stage})")
+        self.job = job
+
+
+class IngestionWorkerPool:
+    """
+    Runs queued ingestion jobs on a fixed number of background threads.
+    Jobs live in the SQLite `IngestionJob` table, so queued work survives restarts.
+    """
+
+    def __init__(self, engine: Engine, num_workers: int, poll_interval: float = 1.0) -> None:
+        self.engine = engine
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        with Session(self.engine) as db:
+            requeue_running_ingestion_jobs(db)
+        self._stopping.clear()
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._run, name=f"ingest-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.num_workers} ingestion worker(s)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        logger.info("Stopped ingestion workers")
+
+    def notify(self) -> None:
+        """Wakes idle workers so a newly queued job starts without waiting for the next poll."""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            with Session(self.engine) as db:
+                job = claim_next_ingestion_job(db)
+                if job is not None:
+                    self._process(db, job)
+                    continue
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _process(self, db: Session, job: IngestionJob) -> None:
+        video_id = job.video_id
+        logger.info(f"Worker {threading.current_thread().name} ingesting video {video_id}")
+        def on_stage(stage: str) -> None:
+            update_ingestion_job(db, video_id, stage=stage)
+
+        try:
+            vector_store = get_vector_store(get_embedding_function())
+            ingest_video(
+                video_url=job.video_url,
+                db=db,
+                vector_store=vector_store,
+                on_stage=on_stage
+            )
+        except Exception as e:
+            logger.exception(f"Ingestion job for video {video_id} failed")
+            db.rollback()
+            update_ingestion_job(db, video_id, status="failed", error=str(e))
+            return
+        update_ingestion_job(db, video_id, status="done")
+
+
+_worker_pool: IngestionWorkerPool | None = None
+
+def start_ingestion_workers(engine: Engine, num_workers: int) -> IngestionWorkerPool | None:
+    global _worker_pool
+    if num_workers <= 0:
+        logger.info("Ingestion workers disabled")
+        return None
+    if _worker_pool is None:
+        _worker_pool = IngestionWorkerPool(engine=engine, num_workers=num_workers)
+        _worker_pool.start()
+    return _worker_pool
+
+def stop_ingestion_workers() -> None:
+    global _worker_pool
+    if _worker_pool is not None:
+        _worker_pool.stop()
+        _worker_pool = None
+
+
+def submit_ingestion_job(video_url: str, db: Session) -> IngestionJob:
+    """Queues the video for background ingestion and wakes the workers."""
+    video_id = extract_video_id(video_url)
+    job = enqueue_ingestion_job(db, video_id=video_id, video_url=video_url)
+    if _worker_pool is not None:
+        _worker_pool.notify()
+    return job
+
+def wait_for_ingestion_job(video_id: str, db: Session, timeout: float, poll_interval: float = 0.25) -> IngestionJob | None:
+    """Polls the job until it is done or failed, or until `timeout` seconds have passed."""
+    deadline = time.monotonic() + timeout
+    while True:
+        db.expire_all() # Re-read the row written by the worker's session
+        job = load_ingestion_job(db, video_id)
+        if job is None or job.status in ("done", "failed"):
+            return job
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return job
+        time.sleep(min(poll_interval, remaining))
+
+def ensure_ingested(video_url: str, db: Session, vector_store: Chroma, timeout: float) -> None:
+    """
+    Makes sure the video's vectors are ready for retrieval.
+    With workers running, queues a job and waits up to `timeout` seconds for it,
+    raising IngestionPendingError if it is still in progress; otherwise ingests inline.
+    """
+    video_id = extract_video_id(video_url)
+    if is_ingested(video_id, db):
+        return
+
+    if _worker_pool is None:
+        ingest_video(video_url=video_url, db=db, vector_store=vector_store)
+        return
+
+    submit_ingestion_job(video_url=video_url, db=db)
+    job = wait_for_ingestion_job(video_id, db, timeout=timeout)
+    if job is None or job.status == "failed":
+        # Surface a missing transcript as such (the worker records it in the negative cache)
+        check_transcript_available(video_id, db)
+        error = job.error if job is not None else "job not found"
+        raise ValueError(f"Ingestion failed for video {video_id}: {error}")
+    if job.status != "done":
+        raise IngestionPendingError(job)
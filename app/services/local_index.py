@@ -0,0 +1,225 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from chromadb.api.types import GetResult
+from langchain.schema import Document
+from langchain_chroma.vectorstores import Chroma
+
+from app.embedding_providers import get_embedding_provider
+from app.services.bm25 import BM25Index
+from app.vector_database import aget_video_chunks
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class VideoIndex:
+    """
+    One video's chunks: a memory-mapped matrix of unit-length embeddings, the chunk texts,
+    and a BM25 index over those texts.
+    """
+
+    def __init__(self, ids: list[str], vectors: np.ndarray, texts: list[str], metadatas: list[dict], lexical: BM25Index | None = None) -> None:
+        self.ids = ids
+        self.vectors = vectors # shape (n_chunks, dimension), float32, rows L2-normalised
+        self.texts = texts
+        self.metadatas = metadatas
+        # Chunks ingested before positions were recorded are in no known order, so neighbours mean nothing
+        self.ordered = all((metadata or {}).get("chunk_index") is not None for metadata in metadatas)
+        self.lexical = lexical if lexical is not None else BM25Index.build(texts)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def document(self, i: int) -> Document:
+        return Document(page_content=self.texts[i], metadata=self.metadatas[i])
+
+    def top_k(self, query_vector: list[float], k: int) -> list[tuple[int, float]]:
+        """Exact top-k chunk positions by cosine similarity, best first."""
+        if not self.ids or k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        scores = self.vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def search(self, query_vector: list[float], k: int) -> list[tuple[Document, float]]:
+        return [(self.document(i), score) for i, score in self.top_k(query_vector, k)]
+
+
+class LocalVectorIndex:
+    """
+    Per-video vector indexes on local disk, searched in-process instead of over Chroma's HTTP API.
+
+    Layout: <root>/<embedding model>/<video_id>/vectors.f32 (raw float32 rows, opened with np.memmap),
+    chunks.json (ids, texts, metadata, dimension) and bm25.json (the chunks' term statistics).
+    Chroma stays the system of record; a video's index is (re)written from it after ingest or on first use.
+
+    At most `max_videos` indexes are kept open, least recently used are closed first.
+    """
+
+    def __init__(self, root: str | Path, model_name: str, max_videos: int) -> None:
+        self.root = Path(root) / re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.max_videos = max_videos
+        self._hot: OrderedDict[str, VideoIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _dir(self, video_id: str) -> Path:
+        return self.root / video_id
+
+    def has(self, video_id: str) -> bool:
+        with self._lock:
+            if video_id in self._hot:
+                return True
+        return (self._dir(video_id) / "chunks.json").exists()
+
+    def write(self, video_id: str, ids: list[str], embeddings: list[list[float]], texts: list[str], metadatas: list[dict]) -> None:
+        """Replaces the video's index. Vectors are normalised once here so search is a plain dot product."""
+        vectors = np.asarray(embeddings, dtype="<f4").reshape(len(ids), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms > 0, norms, 1.0)
+
+        # Write to a sibling directory and swap it in, so readers never see half an index
+        final_dir = self._dir(video_id)
+        tmp_dir = final_dir.with_name(f"{video_id}.{threading.get_ident()}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        vectors.astype("<f4").tofile(tmp_dir / "vectors.f32")
+        sidecar = {"dimension": int(vectors.shape[1]), "ids": ids, "texts": texts, "metadatas": metadatas}
+        (tmp_dir / "chunks.json").write_text(json.dumps(sidecar))
+        (tmp_dir / "bm25.json").write_text(json.dumps(BM25Index.build(texts).to_dict()))
+
+        with self._lock:
+            old_dir = final_dir.with_name(f"{video_id}.{threading.get_ident()}.old")
+            if final_dir.exists():
+                os.replace(final_dir, old_dir)
+            os.replace(tmp_dir, final_dir)
+            self._hot.pop(video_id, None)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        logger.info(f"Local index for video {video_id}: {len(ids)} chunks written")
+
+    def remove(self, video_id: str) -> None:
+        with self._lock:
+            self._hot.pop(video_id, None)
+        shutil.rmtree(self._dir(video_id), ignore_errors=True)
+
+    def load(self, video_id: str) -> VideoIndex | None:
+        with self._lock:
+            index = self._hot.get(video_id)
+            if index is not None:
+                self._hot.move_to_end(video_id)
+                return index
+
+        index_dir = self._dir(video_id)
+        try:
+            sidecar = json.loads((index_dir / "chunks.json").read_text())
+            n_chunks = len(sidecar["ids"])
+            vectors: np.ndarray
+            if n_chunks:
+                vectors = np.memmap(index_dir / "vectors.f32", dtype="<f4", mode="r", shape=(n_chunks, sidecar["dimension"]))
+            else:
+                vectors = np.zeros((0, sidecar["dimension"]), dtype="<f4")
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            lexical = BM25Index.from_dict(json.loads((index_dir / "bm25.json").read_text()))
+        except (OSError, ValueError, KeyError):
+            lexical = None # Rebuilt from the texts
+        index = VideoIndex(ids=sidecar["ids"], vectors=vectors, texts=sidecar["texts"], metadatas=sidecar["metadatas"], lexical=lexical)
+
+        with self._lock:
+            self._hot[video_id] = index
+            self._hot.move_to_end(video_id)
+            while len(self._hot) > self.max_videos:
+                self._hot.popitem(last=False)
+        return index
+
+    def sync_from_chroma(self, video_id: str, vector_store: Chroma) -> bool:
+        """Copies the video's chunks and embeddings out of Chroma. Returns False if Chroma has none."""
+        result = vector_store._collection.get(
+            where={"video_id": video_id},
+            include=["embeddings", "documents", "metadatas"]
+        )
+        return self._write_chroma_result(video_id, result)
+
+    async def async_sync_from_chroma(self, video_id: str) -> bool:
+        """`sync_from_chroma` through the async Chroma client; the file writes run in a worker thread."""
+        result = await aget_video_chunks(video_id)
+        return await asyncio.to_thread(self._write_chroma_result, video_id, result)
+
+    def _write_chroma_result(self, video_id: str, result: GetResult) -> bool:
+        if not result["ids"]:
+            return False
+        # Chroma returns rows in no particular order; keep transcript order where we know it
+        rows = sorted(
+            zip(result["ids"], result["embeddings"], result["documents"], result["metadatas"]),  # type: ignore[arg-type]
+            key=lambda row: int((row[3] or {}).get("chunk_index") or 0)
+        )
+        self.write(
+            video_id,
+            ids=[row[0] for row in rows],
+            embeddings=[list(row[1]) for row in rows],
+            texts=[row[2] for row in rows],
+            metadatas=[dict(row[3] or {}) for row in rows]
+        )
+        return True
+
+    def get(self, video_id: str, vector_store: Chroma | None = None) -> VideoIndex | None:
+        """
+        The video's index, loaded from disk, or from Chroma when `vector_store` is given
+        and the video has no local index yet. None if the video isn't indexed anywhere.
+        """
+        index = self.load(video_id)
+        if index is None and vector_store is not None and self.sync_from_chroma(video_id, vector_store):
+            index = self.load(video_id)
+        return index
+
+    async def aget(self, video_id: str) -> VideoIndex | None:
+        """`get` for the event loop: an index not open yet is read from disk in a worker thread, or fetched with the async Chroma client."""
+        with self._lock:
+            index = self._hot.get(video_id)
+            if index is not None:
+                self._hot.move_to_end(video_id)
+        if index is None:
+            index = await asyncio.to_thread(self.load, video_id)
+        if index is None and await self.async_sync_from_chroma(video_id):
+            index = await asyncio.to_thread(self.load, video_id)
+        return index
+
+    def search(self, video_id: str, query_vector: list[float], k: int, vector_store: Chroma | None = None) -> list[tuple[Document, float]] | None:
+        """Top-k chunks of one video, or None if the video isn't indexed (see `get`)."""
+        index = self.get(video_id, vector_store=vector_store)
+        if index is None:
+            return None
+        return index.search(query_vector, k)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hot_videos": len(self._hot), "max_videos": self.max_videos}
+
+
+_local_index: LocalVectorIndex | None = None
+
+def get_local_index() -> LocalVectorIndex:
+    """Returns the singleton local index for the configured embedding model."""
+    global _local_index
+    if _local_index is None:
+        _local_index = LocalVectorIndex(
+            root=settings.LOCAL_INDEX_DIR,
+            model_name=get_embedding_provider().model_name,
+            max_videos=settings.LOCAL_INDEX_MAX_VIDEOS
+        )
+    return _local_index
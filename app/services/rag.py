@@ -1,16 +1,27 @@
+import asyncio
 import logging
+from typing import AsyncIterator
 
-from langchain.vectorstores import VectorStore
-from langchain_chroma.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAI
+import numpy as np
 from langchain.schema import Document
+from langchain_chroma.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
 from sqlmodel import Session
 
-from app.services.chunking import chunk_documents
-from app.services.embedding import embed_and_save
-from app.services.transcription import extract_video_id, get_transcript
-from app.vector_database import get_embedding_function, get_vector_store, check_if_vectors_exist
-from app.llm import get_llm
+from app.llm import LLMGateway, get_llm_gateway
+from app.services.answer_cache import (SemanticAnswerCache, get_answer_cache,
+                                       history_fingerprint)
+from app.services.bm25 import reciprocal_rank_fusion
+from app.services.context import (assemble_context, drop_near_duplicates,
+                                  expand_with_neighbours, mmr_select, trim_to_budget)
+from app.services.ingestion_manifest import touch_video
+from app.services.ingestion_queue import ensure_ingested
+from app.services.local_index import VideoIndex, get_local_index
+from app.services.transcription import check_transcript_available, extract_video_id
+from app.vector_database import (asimilarity_search_by_vector,
+                                 asimilarity_search_with_vectors,
+                                 get_embedding_function, get_vector_store)
+from config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -32,54 +43,174 @@ class ChatMemory:
         logger.debug(f"ChatMemory.to_prompt called. History: {history}")
         return "\n\n".join(history)
 
+def store_embeddings(vector_store: Chroma) -> Embeddings:
+    """The store's embedding function; questions are embedded with it, so a store without one is a setup error."""
+    if vector_store.embeddings is None:
+        raise ValueError("The vector store has no embedding function")
+    return vector_store.embeddings
+
+def message_text(content: str | list[str | dict]) -> str:
+    """The text of an LLM message's content, which some models return as a list of parts."""
+    if isinstance(content, str):
+        return content
+    return "".join(part if isinstance(part, str) else str(part.get("text", "")) for part in content)
+
 class TranscriptRetriever:
-    def __init__(self, vector_store: VectorStore, k: int=4) -> None:
+    def __init__(self, vector_store: Chroma, k: int=4) -> None:
         self.vector_store = vector_store 
+        self.embeddings = store_embeddings(vector_store)
         self.k = k
-        # retriever = vector_store.as_retriever(
-        #     search_type= "mmr",
-        #     search_kwargs={"k":k}
-        # )
         # logger.info(f"Initialised TranscriptReciever with vector store {vector_store.__repr__}, {k} retrival context chunks")
 
-    def get_context(self, query: str, video_id: str) -> str:
-        logger.debug(f"get_context received query of type {type(query)}, {query}")
+    async def aget_context(self, query: str, video_id: str) -> str:
+        """The transcript context for `query`, without blocking the event loop: Chroma is reached through the async client."""
         try:
-            retriever = self.vector_store.as_retriever(
-                search_kwargs={
-                    "k": self.k,
-                    "filter": {"video_id": video_id}
-                }
-            )
-            results = retriever.invoke(input=query)
+            results = await self._asearch(query=query, video_id=video_id)
         except Exception:
-            logger.error("Failed calling get_relevant_documents with query=%r", query, exc_info=True)
+            logger.error("Failed retrieving context with query=%r", query, exc_info=True)
             raise
+        return "\n\n".join(result.page_content for result in results)
+
+    async def _asearch(self, query: str, video_id: str) -> list[Document]:
+        # Prefer the in-process index; Chroma is only queried for videos it can't load.
+        # Lexical retrieval needs the local index's BM25 statistics, so it loads it regardless.
+        index = None
+        if self._uses_local_index():
+            index = await get_local_index().aget(video_id)
+        if index is not None and settings.RETRIEVAL_MODE == "bm25":
+            return self._rank(index, query, query_vector=None)
+
+        # Embedded once per question (repeats come from the query embedding cache), then searched by vector
+        query_vector = await self.embeddings.aembed_query(query)
+        if index is None:
+            if settings.RETRIEVAL_MMR:
+                candidates, vectors = await asimilarity_search_with_vectors(video_id, query_vector, k=settings.RETRIEVAL_CANDIDATES)
+                picked = mmr_select(query_vector, np.asarray(vectors, dtype=np.float32), k=self.k, lambda_mult=settings.MMR_LAMBDA)
+                results = [candidates[i] for i in picked]
+            else:
+                results = await asimilarity_search_by_vector(video_id, query_vector, k=self.k)
+            return self._assemble_results(results)
+        return self._rank(index, query, query_vector)
 
-        context = "\n\n".join(result.page_content for result in results)
-        logger.debug(f"TranscriptReciever.get_context called. Context: \n\n{context}")
+    def _uses_local_index(self) -> bool:
+        return settings.LOCAL_INDEX_ENABLED or settings.RETRIEVAL_MODE != "vector"
 
-        return context
+    def _rank(self, index: VideoIndex, query: str, query_vector: list[float] | None) -> list[Document]:
+        mode = settings.RETRIEVAL_MODE
+        if mode == "bm25" or query_vector is None:
+            positions = index.lexical.top_k(query, self.k)
+        else:
+            if mode == "hybrid":
+                dense = [i for i, _ in index.top_k(query_vector, settings.RETRIEVAL_CANDIDATES)]
+                lexical = index.lexical.top_k(query, settings.RETRIEVAL_CANDIDATES)
+                candidates = reciprocal_rank_fusion([dense, lexical], k=settings.RRF_K)[:settings.RETRIEVAL_CANDIDATES]
+            else:
+                candidates = [i for i, _ in index.top_k(query_vector, settings.RETRIEVAL_CANDIDATES)]
+            if settings.RETRIEVAL_MMR:
+                # Re-rank the over-fetched candidates so the k hits don't all cover the same moment
+                picked = mmr_select(query_vector, index.vectors[candidates], k=self.k, lambda_mult=settings.MMR_LAMBDA)
+                positions = [candidates[i] for i in picked]
+            else:
+                positions = candidates[:self.k]
+        return self._assemble(index, positions)
+
+    def _assemble(self, index: VideoIndex, positions: list[int]) -> list[Document]:
+        """Adds neighbouring chunks, then merges, dedupes and trims them to the context budget (see `assemble_context`)."""
+        if not index.ordered:
+            return self._assemble_unordered([index.document(position) for position in positions])
+        expanded = expand_with_neighbours(positions, n_chunks=len(index), window=settings.CONTEXT_NEIGHBOURS)
+        return assemble_context(
+            [(position, index.document(position)) for position in expanded],
+            hits=positions,
+            max_tokens=settings.CONTEXT_MAX_TOKENS,
+            dedupe_threshold=settings.CONTEXT_DEDUPE_SIMILARITY
+        )
+
+    def _assemble_results(self, results: list[Document]) -> list[Document]:
+        """`_assemble` for Chroma results (best first), positioned by their chunk_index metadata."""
+        if any(result.metadata.get("chunk_index") is None for result in results):
+            return self._assemble_unordered(results)
+        positions = [int(result.metadata["chunk_index"]) for result in results]
+        return assemble_context(
+            list(zip(positions, results)),
+            hits=positions,
+            max_tokens=settings.CONTEXT_MAX_TOKENS,
+            dedupe_threshold=settings.CONTEXT_DEDUPE_SIMILARITY
+        )
+
+    def _assemble_unordered(self, results: list[Document]) -> list[Document]:
+        # Chunks ingested before positions were recorded can't be ordered or merged
+        unique = drop_near_duplicates(results, threshold=settings.CONTEXT_DEDUPE_SIMILARITY)
+        return trim_to_budget(unique, max_tokens=settings.CONTEXT_MAX_TOKENS)
         
 class ChatSession:
-    def __init__(self, llm: GoogleGenerativeAI, vectordb: Chroma, retriever: TranscriptRetriever, memory: ChatMemory, prompt_template: str) -> None:
+    def __init__(self, llm: LLMGateway, vectordb: Chroma, retriever: TranscriptRetriever, memory: ChatMemory, prompt_template: str, answer_cache: SemanticAnswerCache | None = None) -> None:
         self.llm = llm
         self.vectorstore = vectordb
         self.retriever = retriever
         self.memory = memory
         self.prompt_template = prompt_template
+        self.answer_cache = answer_cache
+        # Questions are only embedded here to look up the answer cache
+        self.embeddings = store_embeddings(vectordb) if answer_cache is not None else None
         logger.debug(f"ChatSession initialised with {llm.__str__}, retriever {retriever.__str__}, memory {memory.__str__}")
 
-    def ask(self, question: str, history: list[tuple[str,str]], video_id: str) -> str:
-        # 1) Retrieve context
-        context = self.retriever.get_context(query = question, video_id= video_id)
+    async def aask(self, question: str, history: list[tuple[str,str]], video_id: str, history_summary: str = "") -> str:
+        """Answers the question about the video: async retrieval and `ainvoke`, so no thread waits on the network."""
+        question_vector = await self._aquestion_vector(question)
+        cached = self._cached_answer(question_vector, history, history_summary, video_id)
+        if cached is not None:
+            return cached
+        context = await self.retriever.aget_context(query=question, video_id=video_id)
+        prompt = self._build_prompt(question, history, context, history_summary)
+        result = await self.llm.ainvoke(prompt)
+        logger.info(f"LLM called. Result: {result}")
+        answer = message_text(result.content)
+        self._remember_answer(question_vector, history, history_summary, video_id, answer)
+        return answer
+
+    async def astream(self, question: str, history: list[tuple[str,str]], video_id: str, history_summary: str = "") -> AsyncIterator[str]:
+        """`aask`, yielding the answer's text as the LLM generates it."""
+        question_vector = await self._aquestion_vector(question)
+        cached = self._cached_answer(question_vector, history, history_summary, video_id)
+        if cached is not None:
+            yield cached
+            return
+        context = await self.retriever.aget_context(query=question, video_id=video_id)
+        prompt = self._build_prompt(question, history, context, history_summary)
+        parts: list[str] = []
+        async for chunk in self.llm.astream(prompt):
+            text = message_text(chunk.content)
+            if text:
+                parts.append(text)
+                yield text
+        self._remember_answer(question_vector, history, history_summary, video_id, "".join(parts))
 
-        # logger.debug(f"Excerpt: {context}")
+    async def _aquestion_vector(self, question: str) -> list[float] | None:
+        # Retrieval embeds the same question next, which the query embedding cache then answers
+        if self.embeddings is None:
+            return None
+        return await self.embeddings.aembed_query(question)
 
-        # 2) Build the prompt
+    def _cached_answer(self, question_vector: list[float] | None, history: list[tuple[str,str]], history_summary: str, video_id: str) -> str | None:
+        if self.answer_cache is None or question_vector is None:
+            return None
+        answer = self.answer_cache.get(video_id, question_vector, history=history_fingerprint(history, history_summary))
+        if answer is not None:
+            logger.info(f"Answer cache hit for video {video_id}")
+        return answer
+
+    def _remember_answer(self, question_vector: list[float] | None, history: list[tuple[str,str]], history_summary: str, video_id: str, answer: str) -> None:
+        if self.answer_cache is not None and question_vector is not None and answer:
+            self.answer_cache.put(video_id, question_vector, answer, history=history_fingerprint(history, history_summary))
+
+    def _build_prompt(self, question: str, history: list[tuple[str,str]], context: str, history_summary: str = "") -> str:
         prompt_blocks = []
 
         prompt_blocks.append(self.prompt_template)
+
+        if history_summary:
+            prompt_blocks.append(f"Summary of the earlier conversation: {history_summary}\n")
         
         history_as_prompt: str = history_to_prompt(history)
 
@@ -94,31 +225,29 @@ class ChatSession:
 
         prompt = "\n".join(prompt_blocks)
         logger.debug(f"Prompt: {prompt}")
+        return prompt
 
-        # 3) Call the LLM
-        result = self.llm.invoke(prompt)
-        logger.info(f"LLM called. Result: {result}")
-        answer = result.content
-        # logger.info(f"LLM answer text: {answer}")
-
-        # 4) Update memory
-        # self.memory.append(user_message=question, assistant_message=answer)
 
-        return answer
+prompt_starter = "You are an assistant for question-answering tasks. Use the following pieces of retrieved context to answer the question. If the context provided doesn't provide an answer to the question, just say that you don't know. Use three sentences maximum and keep the answer concise."
 
+_retriever: TranscriptRetriever | None = None
 
-prompt_starter = "You are an assistant for question-answering tasks. Use the following pieces of retrieved context to answer the question. If the context provided doesn't provide an answer to the question, just say that you don't know. Use three sentences maximum and keep the answer concise."
+def get_transcript_retriever(vector_store: Chroma) -> TranscriptRetriever:
+    """Returns the shared retriever; it holds no per-request state, so one serves every chat."""
+    global _retriever
+    if _retriever is None or _retriever.vector_store is not vector_store:
+        _retriever = TranscriptRetriever(vector_store=vector_store, k=settings.RETRIEVAL_K)
+    return _retriever
 
-def create_chat_session() -> ChatSession:
-    # (1) instantiate your pieces
+def create_chat_session(vector_store: Chroma | None = None, llm: LLMGateway | None = None) -> ChatSession:
+    # (1) instantiate your pieces (the API passes in the components built at startup)
     memory = ChatMemory(max_turns=5)
-    embedding_function = get_embedding_function()
-    vectordb = get_vector_store(embedding_function)
-    retriever = TranscriptRetriever(vector_store=vectordb, k=6)
-    llm: GoogleGenerativeAI = get_llm()
+    vectordb = vector_store or get_vector_store(get_embedding_function())
+    retriever = get_transcript_retriever(vectordb)
+    llm = llm or get_llm_gateway()
 
     # (2) create a session
-    session = ChatSession(llm=llm, vectordb=vectordb, retriever=retriever, memory=memory, prompt_template= prompt_starter)
+    session = ChatSession(llm=llm, vectordb=vectordb, retriever=retriever, memory=memory, prompt_template= prompt_starter, answer_cache=get_answer_cache())
     logger.debug("Chat session created.")
     return session
 
@@ -126,19 +255,30 @@ def history_to_prompt(history: list[tuple[str,str]]) -> str:
     history_chunks = [f"User: {u}\n Assistant: {a}" for u, a in history]
     return "\n\n".join(history_chunks)
 
-def rag_chat_service(video_url: str, question: str, history: list[tuple[str,str]], db: Session) -> str:
-    # extract video_id
+async def arag_chat_service(video_url: str, question: str, history: list[tuple[str,str]], db: Session, vector_store: Chroma | None = None, llm: LLMGateway | None = None, history_summary: str = "") -> str:
+    """
+    Answers a question about the video for the chat endpoint. Waiting on a first-time ingest happens in a worker thread.
+    `history` is the latest turns; `history_summary` summarises the ones before (see app.services.history).
+    """
+    session, video_id = await _aprepare_chat(video_url, db, vector_store, llm)
+    return await session.aask(question=question, history=history, video_id=video_id, history_summary=history_summary)
+
+async def arag_chat_stream(video_url: str, question: str, history: list[tuple[str,str]], db: Session, vector_store: Chroma | None = None, llm: LLMGateway | None = None, history_summary: str = "") -> AsyncIterator[str]:
+    """
+    `arag_chat_service`, streaming the answer's tokens.
+    The transcript and ingestion checks run before this returns, so their errors are raised before any token is sent.
+    """
+    session, video_id = await _aprepare_chat(video_url, db, vector_store, llm)
+    return session.astream(question=question, history=history, video_id=video_id, history_summary=history_summary)
+
+async def _aprepare_chat(video_url: str, db: Session, vector_store: Chroma | None, llm: LLMGateway | None) -> tuple[ChatSession, str]:
     video_id: str = extract_video_id(video_url)
-    # create chat session
-    session: ChatSession = create_chat_session()
-    # if not video_id exists in vectordb
-    if not check_if_vectors_exist(video_id, session.vectorstore):
-        # retrieve transcript
-        documents: list[Document] = get_transcript(video_url=video_url, db=db)
-        # chunk transcript
-        chunks: list[Document] = chunk_documents(documents, chunk_size= 800, chunk_overlap= 50)
-        # embed chunks, upload to vectordb
-        embed_and_save(chunks)
-    
-    answer: str = session.ask(question=question, history = history, video_id=video_id)
-    return answer
\ No newline at end of file
+    session: ChatSession = create_chat_session(vector_store=vector_store, llm=llm)
+    # Everything that touches the database (or waits on an ingest) runs in one worker thread
+    await asyncio.to_thread(_prepare_video, video_url, video_id, db, session.vectorstore)
+    return session, video_id
+
+def _prepare_video(video_url: str, video_id: str, db: Session, vector_store: Chroma) -> None:
+    check_transcript_available(video_id, db)
+    ensure_ingested(video_url=video_url, db=db, vector_store=vector_store, timeout=settings.CHAT_INGEST_WAIT_SECONDS)
+    touch_video(db, video_id)
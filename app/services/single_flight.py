@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Generic, TypeVar, cast
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Call(Generic[T]):
+    """A single in-flight execution that followers can wait on."""
+
+    def __init__(self) -> None:
+        self.future: Future[T] = Future()
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into a single execution.
+
+    The first caller for a key (the leader) runs the function; every caller that
+    arrives while it is still running (a follower) blocks until the leader finishes
+    and receives the same result, or the same exception.
+    Once the leader returns, the key is released so later calls run again.
+    `ado` joins the same keys from coroutines, so sync and async callers share one execution.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        call, is_leader = self._join(key)
+        if not is_leader:
+            logger.debug(f"Waiting on in-flight call for key '{key}'")
+            return cast(T, call.future.result())
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """`do` for coroutines: the leader awaits `fn()` on the running loop, and a follower awaits the key's future; neither holds a thread."""
+        call, is_leader = self._join(key)
+        if not is_leader:
+            logger.debug(f"Awaiting in-flight call for key '{key}'")
+            # Shielded: a follower going away must not cancel the future the others wait on
+            return await asyncio.shield(asyncio.wrap_future(call.future))
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+    def _join(self, key: str) -> tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def _finish(self, key: str, call: _Call, result: object = None, error: BaseException | None = None) -> None:
+        with self._lock:
+            del self._calls[key]
+        if error is not None:
+            call.future.set_exception(error)
+        else:
+            call.future.set_result(result)
+        if call.followers:
+            logger.info(f"Shared result of '{key}' with {call.followers} waiting caller(s)")
+
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._calls
+
+
+class AsyncSingleFlight:
+    """
+    `SingleFlight` for coroutines on one event loop: followers await the leader's task
+    instead of blocking a thread.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            logger.debug(f"Awaiting in-flight call for key '{key}'")
+        # Shielded so one caller disconnecting doesn't cancel the work for the others
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+
+# Shared coordinator for per-video transcript download, summary generation and vector ingestion
+ingestion_flight = SingleFlight()
+# The same for async request handlers (summary generation awaited on the event loop)
+async_ingestion_flight = AsyncSingleFlight()
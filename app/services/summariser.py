@@ -1,37 +1,199 @@
+import asyncio
 import logging
-from typing import TypedDict, cast
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from langchain.chains.summarize import load_summarize_chain
+from langchain.chains.summarize import stuff_prompt
 from langchain_core.documents import Document
 from sqlmodel import Session
 
 from app.backend_schemas import IngestedSummaryData
-from app.services.transcription import extract_video_id, get_transcript
-from db.crud import load_summary, save_summary
-from app.llm import get_llm
+from app.llm import get_llm_gateway
+from app.services.chunking import chunk_documents
+from app.services.embedding_cache import content_hash
+from app.services.single_flight import async_ingestion_flight, ingestion_flight
+from app.services.tokens import calibration_samples, get_token_counter
+from app.services.transcription import (check_transcript_available, extract_video_id,
+                                        get_transcript)
+from config import settings
+from db.crud import (delete_summary_partials, load_summary, load_summary_partials,
+                     save_summary, save_summary_partial)
 
 logger = logging.getLogger(__name__)
 
-llm = get_llm()
+llm = get_llm_gateway()
 
-class SummaryChainOutput(TypedDict):
-    output_text: str
+def summarise_documents(documents: list[Document], db: Session | None = None, video_id: str | None = None) -> str:
+    """
+    Summarises a transcript. One that fits SUMMARY_STUFF_MAX_TOKENS goes to the LLM in a single prompt;
+    a longer one is map-reduced: split into parts summarised in parallel, whose summaries are then
+    summarised in groups, level by level, until they fit one prompt.
+    With `db`, part summaries are saved as they finish, so a retry after a failure reuses them.
+    """
+    if length_function(documents) <= settings.SUMMARY_STUFF_MAX_TOKENS:
+        return _stuff(documents)
 
-def summarise_documents(documents: list[Document]) -> str:
-    chain = load_summarize_chain(llm=llm, chain_type="stuff")
-    summary: SummaryChainOutput = cast(SummaryChainOutput, chain.invoke({"input_documents":documents}))
-    logger.info(f"Summarised transcript from video '{documents[0].metadata["title"]}'  documents using '{chain._chain_type}' chain type")
-    logger.debug(f"Summary: {summary["output_text"]}")
-    
-    return summary["output_text"]
+    partials = PartialSummaries(db, video_id)
+    metadata = documents[0].metadata
+    texts = [part.page_content for part in split_for_map(documents)]
+    level = 0
+    with ThreadPoolExecutor(max_workers=settings.SUMMARY_MAP_CONCURRENCY, thread_name_prefix="summary-map") as pool:
+        while True:
+            futures = {pool.submit(_stuff, [Document(page_content=text, metadata=metadata)]): text for text in texts if not partials.has(text)}
+            errors = []
+            for future in as_completed(futures):
+                try:
+                    partials.put(futures[future], future.result()) # On this thread: the session isn't thread-safe
+                except Exception as e:
+                    errors.append(e)
+            if errors:
+                raise errors[0]
+            summaries = [partials.get(text) for text in texts]
+            logger.info(f"Summary level {level}: {len(texts)} part(s) summarised ({len(futures)} new)")
+            if _fits_one_prompt(summaries):
+                break
+            texts = group_for_reduce(summaries)
+            level += 1
+
+    summary = _stuff([Document(page_content=text, metadata=metadata) for text in summaries])
+    partials.clear()
+    return summary
+
+async def asummarise_documents(documents: list[Document], db: Session | None = None, video_id: str | None = None) -> str:
+    """`summarise_documents` with the chain's `ainvoke`, so no Gemini call holds a thread; parts run concurrently up to SUMMARY_MAP_CONCURRENCY."""
+    if length_function(documents) <= settings.SUMMARY_STUFF_MAX_TOKENS:
+        return await _astuff(documents)
+
+    partials = PartialSummaries(db, video_id)
+    await asyncio.to_thread(partials.load)
+    metadata = documents[0].metadata
+    texts = [part.page_content for part in split_for_map(documents)]
+    slots = asyncio.Semaphore(settings.SUMMARY_MAP_CONCURRENCY)
+
+    async def summarise_part(text: str) -> str:
+        async with slots:
+            return await _astuff([Document(page_content=text, metadata=metadata)])
+
+    level = 0
+    while True:
+        pending = [text for text in texts if not partials.has(text)]
+        results = await asyncio.gather(*(summarise_part(text) for text in pending), return_exceptions=True)
+        done = [(text, result) for text, result in zip(pending, results) if isinstance(result, str)]
+        # Saved even if other parts failed; one thread at a time, as the session isn't thread-safe
+        def _save() -> None:
+            for text, summary in done:
+                partials.put(text, summary)
+
+        await asyncio.to_thread(_save)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+        summaries = [partials.get(text) for text in texts]
+        logger.info(f"Summary level {level}: {len(texts)} part(s) summarised ({len(pending)} new)")
+        if _fits_one_prompt(summaries):
+            break
+        texts = group_for_reduce(summaries)
+        level += 1
+
+    summary = await _astuff([Document(page_content=text, metadata=metadata) for text in summaries])
+    await asyncio.to_thread(partials.clear)
+    return summary
+
+def _stuff_prompt(documents: list[Document]) -> str:
+    """The "stuff" summarize chain's prompt, sent through the LLM gateway so identical requests in flight are coalesced."""
+    return stuff_prompt.PROMPT.format(text="\n\n".join(doc.page_content for doc in documents))
+
+def _stuff(documents: list[Document]) -> str:
+    summary = str(llm.invoke(_stuff_prompt(documents)).content)
+    logger.info(f"Summarised transcript from video '{documents[0].metadata['title']}' ({len(documents)} documents, stuff prompt)")
+    logger.debug(f"Summary: {summary}")
+    return summary
+
+async def _astuff(documents: list[Document]) -> str:
+    summary = str((await llm.ainvoke(_stuff_prompt(documents))).content)
+    logger.info(f"Summarised transcript from video '{documents[0].metadata['title']}' ({len(documents)} documents, stuff prompt)")
+    return summary
+
+def split_for_map(documents: list[Document]) -> list[Document]:
+    """Parts of about SUMMARY_MAP_CHUNK_TOKENS, split at sentence or word boundaries."""
+    chars = sum(len(doc.page_content) for doc in documents)
+    size = max(1, settings.SUMMARY_MAP_CHUNK_TOKENS * chars // max(1, length_function(documents)))
+    return chunk_documents(documents, chunk_size=size, chunk_overlap=size // 50)
+
+def group_for_reduce(summaries: list[str]) -> list[str]:
+    """Packs consecutive summaries into groups of about SUMMARY_MAP_CHUNK_TOKENS (at least two per group, so each level shrinks)."""
+    counter = get_token_counter()
+    groups: list[list[str]] = []
+    used = 0
+    for summary in summaries:
+        tokens = counter.count(summary)
+        if groups and (len(groups[-1]) < 2 or used + tokens <= settings.SUMMARY_MAP_CHUNK_TOKENS):
+            groups[-1].append(summary)
+            used += tokens
+        else:
+            groups.append([summary])
+            used = tokens
+    return ["\n\n".join(group) for group in groups]
+
+def _fits_one_prompt(summaries: list[str]) -> bool:
+    counter = get_token_counter()
+    return len(summaries) == 1 or sum(counter.count(s) for s in summaries) <= settings.SUMMARY_STUFF_MAX_TOKENS
+
+
+class PartialSummaries:
+    """
+    Summaries of transcript parts (and of groups of part summaries) by text hash.
+    Persisted in the SummaryPartial table when a session is given, until the video's summary is done.
+    """
+
+    def __init__(self, db: Session | None, video_id: str | None) -> None:
+        self._store = (db, video_id) if db is not None and video_id is not None else None # Persisted only with both
+        self._summaries: dict[str, str] = {}
+        self._loaded = False
+
+    def load(self) -> None:
+        if self._store is not None and not self._loaded:
+            db, video_id = self._store
+            self._summaries.update(load_summary_partials(db, video_id))
+            if self._summaries:
+                logger.info(f"Reusing {len(self._summaries)} partial summaries of video {video_id}")
+        self._loaded = True
+
+    def has(self, text: str) -> bool:
+        self.load()
+        return content_hash(text) in self._summaries
+
+    def get(self, text: str) -> str:
+        return self._summaries[content_hash(text)]
+
+    def put(self, text: str, summary: str) -> None:
+        text_hash = content_hash(text)
+        self._summaries[text_hash] = summary
+        if self._store is not None:
+            db, video_id = self._store
+            save_summary_partial(db, text_hash=text_hash, video_id=video_id, summary=summary)
+
+    def clear(self) -> None:
+        self._summaries.clear()
+        if self._store is not None:
+            delete_summary_partials(*self._store)
 
 def length_function(documents: list[Document]) -> int:
-    """Get number of tokens for input contents."""
-    length = sum(llm.get_num_tokens(doc.page_content) for doc in documents)
-    char_length = sum(len(doc.page_content) for doc in documents)
-    logger.info(f"Total documents token length: {length}, char length {char_length}")
-    # logger.info(f"Max input size: {llm.max_input_size}")
-    return length 
+    """Get number of tokens for input contents (counted locally, see app.services.tokens)."""
+    return get_token_counter().count_documents(documents)
+
+def calibrate_token_counter(documents: list[Document]) -> None:
+    """
+    Measures the local token estimate against Gemini's tokenizer on samples of the transcript.
+    Runs once per model (the scale is saved), so later summaries never call the tokenizer.
+    """
+    counter = get_token_counter()
+    if counter.calibrated:
+        return
+    text = "\n\n".join(doc.page_content for doc in documents)
+    try:
+        counter.calibrate(calibration_samples(text), llm.get_num_tokens)
+    except Exception:
+        logger.warning("Token counter calibration failed; using the uncalibrated estimate", exc_info=True)
 
 def summarise_ingest(video_url: str, db: Session) -> IngestedSummaryData:
     video_id = extract_video_id(video_url)
@@ -41,7 +203,21 @@ def summarise_ingest(video_url: str, db: Session) -> IngestedSummaryData:
     if cached is not None:
         return IngestedSummaryData(video_id=cached.video_id, summary=cached.summary, title=cached.title)
     
-    # Cache miss → generate new summary
+    # Fail fast for videos known to have no transcript
+    check_transcript_available(video_id, db)
+
+    # Cache miss → generate new summary, once per video however many requests are waiting
+    return ingestion_flight.do(
+        f"summary:{video_id}",
+        lambda: _generate_summary(video_url=video_url, video_id=video_id, db=db)
+    )
+
+def _generate_summary(video_url: str, video_id: str, db: Session) -> IngestedSummaryData:
+    # Another request may have saved the summary while we waited to lead
+    cached = load_summary(db, video_id)
+    if cached is not None:
+        return IngestedSummaryData(video_id=cached.video_id, summary=cached.summary, title=cached.title)
+
     logger.debug("Summary not found in cache, retrieving transcript to summarise")
     docs = get_transcript(video_url, db) # Searches for cached transcript, otherwise downloads it
 
@@ -50,7 +226,8 @@ def summarise_ingest(video_url: str, db: Session) -> IngestedSummaryData:
         # Raise an error to be caught by the endpoint
         raise ValueError(f"Cannot summarize video: No transcript found or processed for {video_url}.")
 
-    new_summary = summarise_documents(docs)
+    calibrate_token_counter(docs)
+    new_summary = summarise_documents(docs, db=db, video_id=video_id)
     title = docs[0].metadata["title"]
     # Persist for next time:
     save_summary(
@@ -64,3 +241,43 @@ def summarise_ingest(video_url: str, db: Session) -> IngestedSummaryData:
         video_id=video_id,
         summary=new_summary,
         title=title)
+
+
+async def asummarise_ingest(video_url: str, db: Session) -> IngestedSummaryData:
+    """
+    `summarise_ingest` for async endpoints. The LLM call is awaited on the event loop; database access and
+    the transcript download (blocking libraries) run in worker threads.
+    """
+    video_id = extract_video_id(video_url)
+
+    cached = await asyncio.to_thread(load_summary, db, video_id)
+    if cached is not None:
+        return IngestedSummaryData(video_id=cached.video_id, summary=cached.summary, title=cached.title)
+
+    await asyncio.to_thread(check_transcript_available, video_id, db)
+
+    # Requests on this loop share one task, which joins sync callers (e.g. batch ingest) on the same key
+    return await async_ingestion_flight.do(
+        f"summary:{video_id}",
+        lambda: ingestion_flight.ado(
+            f"summary:{video_id}",
+            lambda: _agenerate_summary(video_url=video_url, video_id=video_id, db=db)
+        )
+    )
+
+async def _agenerate_summary(video_url: str, video_id: str, db: Session) -> IngestedSummaryData:
+    cached = await asyncio.to_thread(load_summary, db, video_id)
+    if cached is not None:
+        return IngestedSummaryData(video_id=cached.video_id, summary=cached.summary, title=cached.title)
+
+    docs = await asyncio.to_thread(get_transcript, video_url, db)
+    if not docs:
+        logger.warning(f"No transcript documents available for summarization for URL: {video_url}")
+        raise ValueError(f"Cannot summarize video: No transcript found or processed for {video_url}.")
+
+    await asyncio.to_thread(calibrate_token_counter, docs)
+    new_summary = await asummarise_documents(docs, db=db, video_id=video_id)
+    title = docs[0].metadata["title"]
+    await asyncio.to_thread(save_summary, db=db, video_id=video_id, title=title, summary=new_summary, metadata=docs[0].metadata)
+
+    return IngestedSummaryData(video_id=video_id, summary=new_summary, title=title)
@@ -0,0 +1,145 @@
+import json
+import logging
+import math
+import re
+import threading
+from pathlib import Path
+from typing import Callable
+
+from langchain_core.documents import Document
+
+from app.core.cache import TTLCache
+from app.services.embedding_cache import content_hash
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+_SYMBOL = re.compile(r"[^\w\s]")
+CHARS_PER_WORD_PIECE = 6 # Long or rare words split into several tokens; common ones are one
+MEMO_MIN_CHARS = 1000 # Shorter texts are counted again rather than hashed and looked up
+
+
+def estimate_raw_tokens(text: str) -> int:
+    """Uncalibrated token estimate: one token per word piece of up to six characters, and one per symbol."""
+    words = sum((len(word) + CHARS_PER_WORD_PIECE - 1) // CHARS_PER_WORD_PIECE for word in _WORD.findall(text))
+    return words + len(_SYMBOL.findall(text))
+
+
+class TokenCounter:
+    """
+    Counts the LLM's tokens locally, without calling the model's tokenizer: the raw estimate
+    times `scale`, a ratio measured against the real tokenizer by `calibrate` and kept in
+    `calibration_file` per model. Raw estimates of long texts (transcripts, parts of them)
+    are memoized by text hash; since they don't depend on the scale, recalibrating keeps them valid.
+    """
+
+    def __init__(self, model_name: str, calibration_file: str | Path | None, memo_size: int, default_scale: float = 1.0) -> None:
+        self.model_name = model_name
+        self.calibration_file = Path(calibration_file) if calibration_file else None
+        self.scale = default_scale
+        self.calibrated = False
+        self._memo = TTLCache(max_entries=memo_size, ttl_seconds=math.inf)
+        self._lock = threading.Lock()
+        self._load_calibration()
+
+    def raw(self, text: str) -> int:
+        if len(text) < MEMO_MIN_CHARS:
+            return estimate_raw_tokens(text)
+        key = content_hash(text)
+        raw = self._memo.get(key)
+        if raw is None:
+            raw = estimate_raw_tokens(text)
+            self._memo.put(key, raw)
+        return raw
+
+    def remember(self, text: str, raw: int) -> None:
+        """Seeds the memo with a raw estimate stored earlier (e.g. next to a transcript in the DB)."""
+        if len(text) >= MEMO_MIN_CHARS:
+            self._memo.put(content_hash(text), raw)
+
+    def count(self, text: str) -> int:
+        return math.ceil(self.raw(text) * self.scale)
+
+    def count_documents(self, documents: list[Document]) -> int:
+        return math.ceil(sum(self.raw(doc.page_content) for doc in documents) * self.scale)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """The longest prefix of `text` (cut at a word boundary where possible) within `max_tokens`."""
+        if max_tokens <= 0:
+            return ""
+        tokens = self.count(text)
+        if tokens <= max_tokens:
+            return text
+        end = len(text) * max_tokens // tokens
+        while end > 0 and self.count(text[:end]) > max_tokens:
+            end = end * 9 // 10
+        space = text.rfind(" ", 0, end + 1)
+        return text[:space] if space > end // 2 else text[:end]
+
+    def calibrate(self, samples: list[str], reference: Callable[[str], int]) -> float:
+        """
+        Sets `scale` from the real tokenizer's counts (`reference`, e.g. the LLM's `get_num_tokens`)
+        for `samples`, and saves it so later processes start calibrated.
+        """
+        samples = [sample for sample in samples if sample.strip()]
+        estimated = sum(estimate_raw_tokens(sample) for sample in samples)
+        if not estimated:
+            return self.scale
+        actual = sum(reference(sample) for sample in samples)
+        with self._lock:
+            self.scale = actual / estimated
+            self.calibrated = True
+            self._save_calibration(actual, estimated)
+        logger.info(f"Token counter for {self.model_name} calibrated on {len(samples)} sample(s): scale {self.scale:.3f}")
+        return self.scale
+
+    def _load_calibration(self) -> None:
+        if self.calibration_file is None:
+            return
+        try:
+            entry = json.loads(self.calibration_file.read_text())[self.model_name]
+            self.scale = float(entry["scale"])
+            self.calibrated = True
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def _save_calibration(self, actual: int, estimated: int) -> None:
+        if self.calibration_file is None:
+            return
+        try:
+            calibrations = json.loads(self.calibration_file.read_text())
+        except (OSError, ValueError):
+            calibrations = {}
+        calibrations[self.model_name] = {"scale": self.scale, "reference_tokens": actual, "estimated_tokens": estimated}
+        self.calibration_file.parent.mkdir(parents=True, exist_ok=True)
+        self.calibration_file.write_text(json.dumps(calibrations, indent=2))
+
+    def stats(self) -> dict:
+        return {**self._memo.stats(), "model": self.model_name, "scale": self.scale, "calibrated": self.calibrated}
+
+
+def calibration_samples(text: str, n_samples: int = 3, sample_chars: int = 2000) -> list[str]:
+    """Evenly spaced slices of a long text, so calibration doesn't depend on how it starts."""
+    if len(text) <= n_samples * sample_chars:
+        return [text]
+    step = (len(text) - sample_chars) // (n_samples - 1)
+    return [text[i * step:i * step + sample_chars] for i in range(n_samples)]
+
+
+_token_counter: TokenCounter | None = None
+
+def get_token_counter() -> TokenCounter:
+    """Returns the singleton token counter for the configured LLM."""
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = TokenCounter(
+            model_name=settings.LLM_MODEL,
+            calibration_file=settings.TOKEN_CALIBRATION_FILE,
+            memo_size=settings.TOKEN_COUNT_CACHE_SIZE
+        )
+    return _token_counter
+
+
+def count_tokens(text: str) -> int:
+    return get_token_counter().count(text)
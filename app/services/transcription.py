@@ -1,19 +1,90 @@
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from urllib.parse import parse_qs, urlparse
 
 from langchain.schema import Document
 from langchain_community.document_loaders import YoutubeLoader
 from sqlmodel import Session
+from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
 from yt_dlp import YoutubeDL  # for metadata
 
 from app.core.logging_setup import setup_logging
-from db.crud import load_transcript, save_transcript
+from app.services.single_flight import ingestion_flight
+from app.services.tokens import get_token_counter
+from config import settings
+from db.crud import (as_utc, clear_transcript_failure, load_transcript,
+                     load_transcript_failures, load_video_metadata,
+                     record_transcript_failure, save_transcript, save_video_metadata)
 
 # Set up logger
 setup_logging()
 
 logger = logging.getLogger(__name__)
 
+# Runs yt-dlp metadata lookups alongside transcript downloads
+_fetch_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="yt-metadata")
+
+
+class TranscriptUnavailableError(ValueError):
+    """No transcript could be fetched for the video, now or (if `retry_at` is set) on a recent attempt."""
+
+    def __init__(self, video_id: str, reason: str, retry_at: float | None = None) -> None:
+        message = f"No transcript available for video {video_id}: {reason}"
+        if retry_at is not None:
+            message += f" (will re-check after {datetime.fromtimestamp(retry_at, timezone.utc):%Y-%m-%d %H:%M:%S} UTC)"
+        super().__init__(message)
+        self.video_id = video_id
+        self.reason = reason
+        self.retry_at = retry_at
+
+
+# --- Negative cache of videos without transcripts ---
+# In-process mirror of the TranscriptFailure table: video_id -> (reason, retry_at epoch seconds).
+# Loaded once from the DB, then checks are a dict lookup.
+_negative_cache: dict[str, tuple[str, float]] = {}
+_negative_cache_loaded = False
+_negative_cache_lock = threading.Lock()
+
+def check_transcript_available(video_id: str, db: Session) -> None:
+    """Raises TranscriptUnavailableError if the video recently failed and is still in backoff."""
+    if not _negative_cache_loaded:
+        _load_negative_cache(db)
+    entry = _negative_cache.get(video_id)
+    if entry is None:
+        return
+    reason, retry_at = entry
+    if time.time() < retry_at:
+        raise TranscriptUnavailableError(video_id, reason=reason, retry_at=retry_at)
+    # Backoff has elapsed: let this request re-check YouTube
+
+def remember_transcript_failure(db: Session, error: TranscriptUnavailableError) -> None:
+    failure = record_transcript_failure(
+        db=db,
+        video_id=error.video_id,
+        reason=error.reason,
+        base_ttl_seconds=settings.TRANSCRIPT_FAILURE_TTL_SECONDS,
+        max_ttl_seconds=settings.TRANSCRIPT_FAILURE_MAX_TTL_SECONDS
+    )
+    _negative_cache[error.video_id] = (failure.reason, as_utc(failure.retry_after).timestamp())
+    logger.info(f"Video {error.video_id} has no transcript (failure #{failure.failure_count}); not re-checking until {failure.retry_after}")
+
+def forget_transcript_failure(db: Session, video_id: str) -> None:
+    if _negative_cache.pop(video_id, None) is not None:
+        clear_transcript_failure(db, video_id)
+
+def _load_negative_cache(db: Session) -> None:
+    global _negative_cache_loaded
+    with _negative_cache_lock:
+        if _negative_cache_loaded:
+            return
+        for failure in load_transcript_failures(db):
+            _negative_cache[failure.video_id] = (failure.reason, as_utc(failure.retry_after).timestamp())
+        _negative_cache_loaded = True
+        logger.debug(f"Loaded {len(_negative_cache)} transcript failure(s) into the negative cache")
+
 
 def extract_video_id(video_url: str) -> str:
     # Normalise to a build-in str
@@ -45,25 +116,104 @@ def get_transcript(video_url: str, db: Session) -> list[Document]:
     - If cached in the DB, wraps that single transcript in one Document.
     - Otherwise, downloads via YoutubeLoader, enriches metadata,
       saves the full transcript in the DB, and returns the raw Document.
+    - Concurrent calls for the same uncached video share a single download.
+    - Raises TranscriptUnavailableError if YouTube has no transcript for it, or if it
+      failed recently and is still in its re-check backoff (without calling YouTube).
     """
 
     video_id = extract_video_id(video_url)
-    clean_url = f"https://www.youtube.com/watch?v={video_id}"
-    
+
     # Try loading the existing record
+    cached_docs = _load_cached_transcript(db, video_id)
+    if cached_docs is not None:
+        return cached_docs
+
+    check_transcript_available(video_id, db)
+
+    # Concurrent requests for the same video wait on a single download
+    return ingestion_flight.do(
+        f"transcript:{video_id}",
+        lambda: _download_transcript(video_url=video_url, video_id=video_id, db=db)
+    )
+
+
+def _load_cached_transcript(db: Session, video_id: str) -> list[Document] | None:
     cache = load_transcript(db, video_id)
-    if cache is not None:
-        documents = [
-            Document(
-            metadata = cache.doc_metadata or {}, 
-            page_content=cache.transcript
-            )
-            ] # Single-item List[Document]
-        return documents
-    
+    if cache is None:
+        return None
+    if cache.token_estimate is not None:
+        get_token_counter().remember(cache.transcript, cache.token_estimate) # Not re-counted when summarised
+    documents = [
+        Document(
+        metadata = cache.doc_metadata or {}, 
+        page_content=cache.transcript
+        )
+        ] # Single-item List[Document]
+    return documents
+
+
+def _download_transcript(video_url: str, video_id: str, db: Session) -> list[Document]:
+    # Another request may have finished the download while we waited to lead
+    cached_docs = _load_cached_transcript(db, video_id)
+    if cached_docs is not None:
+        return cached_docs
+
     logger.info(f"Transcript not in cache for {video_id}. Fetching from YouTube via LangChain loader.")
-    
-    # Otherwise download transcript fresh:
+
+    # Otherwise download transcript fresh, fetching yt-dlp metadata at the same time
+    # (unless it is cached). Only the network calls run off-thread; the DB stays on this one.
+    metadata = _load_cached_metadata(db, video_id)
+    metadata_future = None
+    if metadata is None:
+        metadata_future = _fetch_executor.submit(fetch_video_metadata, video_id)
+
+    try:
+        docs = fetch_transcript_documents(video_id)
+    except TranscriptUnavailableError as e:
+        remember_transcript_failure(db, e)
+        raise
+    forget_transcript_failure(db, video_id)
+
+    if metadata_future is not None:
+        metadata = metadata_future.result()
+        save_video_metadata(db=db, video_id=video_id, metadata=metadata)
+
+    assert metadata is not None
+    return store_transcript(db=db, video_id=video_id, docs=docs, metadata=metadata)
+
+
+def get_video_metadata(video_id: str, db: Session) -> dict:
+    """
+    Returns title, uploader and upload date for the video.
+    Served from the VideoMetadata cache table while fresh; yt-dlp is only called on a miss.
+    """
+    metadata = _load_cached_metadata(db, video_id)
+    if metadata is None:
+        metadata = fetch_video_metadata(video_id)
+        save_video_metadata(db=db, video_id=video_id, metadata=metadata)
+    return metadata
+
+
+def _load_cached_metadata(db: Session, video_id: str) -> dict | None:
+    record = load_video_metadata(db, video_id, max_age_seconds=settings.METADATA_CACHE_TTL_SECONDS)
+    if record is None:
+        return None
+    logger.debug(f"Metadata cache hit for video {video_id}")
+    return {
+            "title":       record.title,
+            "uploader":    record.uploader,
+            "upload_date": record.upload_date,
+            "video_id":    video_id,
+        }
+
+
+def fetch_transcript_documents(video_id: str) -> list[Document]:
+    """
+    Downloads the transcript with LangChain's YoutubeLoader. Raises TranscriptUnavailableError if YouTube
+    says there is none; other failures (network, rate limits) are raised as they are, so they aren't
+    negatively cached.
+    """
+    clean_url = f"https://www.youtube.com/watch?v={video_id}"
 
     # Load transcript only
     loader = YoutubeLoader.from_youtube_url(clean_url)
@@ -76,56 +226,60 @@ def get_transcript(video_url: str, db: Session) -> list[Document]:
         docs = loader.load() # This is the line that fails in the traceback
 
         if not docs:
-            logger.warning(f"LangChain loader returned no documents for video_url: {video_url} (video_id: {video_id}). This might mean no transcript was found or an issue occurred.")
-            # You might want to raise a specific error or return an empty list
-            # depending on how summarise_ingest should handle this.
-            # For now, let's allow summarise_ingest to handle an empty list if that's its design.
-            return [] # Return empty list if no transcript docs found
+            logger.warning(f"LangChain loader returned no documents for video_url: {clean_url} (video_id: {video_id}). This might mean no transcript was found or an issue occurred.")
+            raise TranscriptUnavailableError(video_id, reason="No transcript returned by YouTube")
 
         logger.info(f"Successfully fetched {len(docs)} transcript document(s) for video_id: {video_id} from Langchain YoutubeLoader")
-        # # 2. Save the fetched transcript to your DB cache here
-        # # save_transcript_to_db(db, video_id, docs, ...) # (You'll need to implement this)
-        # return docs
 
-    except Exception as e: # Catch specific exceptions from youtube_transcript_api if known, or general Exception
-        logger.error(f"Failed to load transcript using LangChain loader for URL {video_url} (video_id: {video_id}): {type(e).__name__} - {e}", exc_info=True)
-        # Option 1: Re-raise a custom error that summarise_endpoint can catch and give a nice message
-        # raise ValueError(f"Could not retrieve or process transcript for the video: {video_url}. Please check the URL or try another video.") from e
-        # Option 2: Return an empty list and let downstream functions handle it
-        return []
+    except (NoTranscriptFound, TranscriptsDisabled) as e:
+        # Re-raise a custom error that the endpoints can catch and give a nice message
+        raise TranscriptUnavailableError(video_id, reason=f"{type(e).__name__}: {e}") from e
+    except TranscriptUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to load transcript using LangChain loader for URL {clean_url} (video_id: {video_id}): {type(e).__name__} - {e}", exc_info=True)
+        raise
+
+    return docs
 
 
-    # fetch video metadata via yt-dlp
+def fetch_video_metadata(video_id: str) -> dict:
+    """Fetches title, uploader and upload date via yt-dlp, without downloading the video."""
+    clean_url = f"https://www.youtube.com/watch?v={video_id}"
     ydl_opts = {"quiet": True, "skip_download": True}
     with YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(video_url, download=False) # get metadata, don't dl video/audio
-    logger.info(f"Downloaded {info.get("title")} video metadata from yt-dlp")
+        info = ydl.extract_info(clean_url, download=False) # get metadata, don't dl video/audio
+    title = info.get("title")
+    logger.info(f"Downloaded {title} video metadata from yt-dlp")
 
-    # Add information to documents' metadata
-    base_meta = {
-            "title":       info.get("title"),
+    return {
+            "title":       title,
             "uploader":    info.get("uploader"),
             "upload_date": info.get("upload_date"),
             "video_id":    video_id,
         }
-    
+
+
+def store_transcript(db: Session, video_id: str, docs: list[Document], metadata: dict) -> list[Document]:
+    """Adds the video metadata to the downloaded documents and saves the full transcript in the DB."""
+    # Add information to documents' metadata
     for doc in docs:
-        doc.metadata.update(base_meta)
+        doc.metadata.update(metadata)
 
     # In case chunked documents returned, combine into one full transcript text
     full_text = "\n\n".join(doc.page_content for doc in docs)
-    metadata = docs[0].metadata
-    title = metadata.get("title", f"Title not available for {video_id}")
-    
+    doc_metadata = docs[0].metadata
+    title = doc_metadata.get("title") or f"Title not available for {video_id}"
+
     # Save the transcript to db
     save_transcript(
         db=db, 
         video_id=video_id, 
         title=title, 
         transcript=full_text, 
-        metadata=metadata
+        metadata=doc_metadata,
+        token_estimate=get_token_counter().raw(full_text)
         )
-    
+
     # Return List[Document]
     return docs
-
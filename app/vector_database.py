@@ -1,32 +1,79 @@
+import asyncio
 import logging
 
 import chromadb
-from chromadb import ClientAPI
+from chromadb import ClientAPI, Collection
+from chromadb.api.models.AsyncCollection import AsyncCollection
+from chromadb.api.types import GetResult
 from langchain_chroma.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
+from app.core.cache import TTLCache
+from app.embedding_providers import EmbeddingProvider, get_embedding_provider
+from app.services.embedding_cache import (CachedEmbeddings, EmbeddingDiskStore,
+                                          QueryCachedEmbeddings)
 from config import settings
 
 logger = logging.getLogger()
 
+_cached_embedding_function: Embeddings | None = None
+_document_cache: CachedEmbeddings | None = None
+_query_cache: QueryCachedEmbeddings | None = None
+
 # Initalise embedding function
-def get_embedding_function() -> GoogleGenerativeAIEmbeddings:
-    
-    api_key = settings.GEMINI_API_KEY
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not found for embedding function. Please check your .env file.")
-    
-    embedding_function = GoogleGenerativeAIEmbeddings(
-        model="models/text-embedding-004",
-        google_api_key=api_key,
-    )
-    return embedding_function
+def get_embedding_function() -> Embeddings:
+    """
+    Returns the configured provider's embedding model (EMBEDDING_PROVIDER), wrapped in the
+    on-disk document embedding cache and the in-memory query embedding cache unless disabled.
+    A shared instance, so cache counters cover every caller.
+    """
+    global _cached_embedding_function, _document_cache, _query_cache
+    if _cached_embedding_function is not None:
+        return _cached_embedding_function
+
+    provider = get_embedding_provider()
+    embedding_function: Embeddings = provider.embeddings
+    if settings.EMBEDDING_CACHE_ENABLED:
+        store = EmbeddingDiskStore(
+            root=settings.EMBEDDING_CACHE_DIR,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES
+        )
+        _document_cache = CachedEmbeddings(
+            underlying=embedding_function,
+            model_name=provider.model_name,
+            store=store
+        )
+        embedding_function = _document_cache
+    if settings.QUERY_EMBEDDING_CACHE_SIZE > 0:
+        cache = TTLCache(
+            max_entries=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+        )
+        _query_cache = QueryCachedEmbeddings(
+            underlying=embedding_function,
+            model_name=provider.model_name,
+            cache=cache
+        )
+        embedding_function = _query_cache
+
+    _cached_embedding_function = embedding_function
+    return _cached_embedding_function
+
+def get_embedding_cache_stats() -> dict:
+    """Hit/miss counters of the embedding caches in use (empty until embeddings are first needed)."""
+    stats = {}
+    if _document_cache is not None:
+        stats["document_embeddings"] = _document_cache.stats()
+    if _query_cache is not None:
+        stats["query_embeddings"] = _query_cache.stats()
+    return stats
 
 # --- Globals to hold our single client and vector store instance ---
 _db_client = None
 _vector_store = None
 
-def get_chroma_client() -> ClientAPI | None:
+def get_chroma_client() -> ClientAPI:
     """Returns a singleton instance of the ChromaDB HTTP client."""
     global _db_client
     if _db_client is None:
@@ -35,10 +82,10 @@ def get_chroma_client() -> ClientAPI | None:
             host=settings.CHROMA_HOST,
             port=settings.CHROMA_PORT
         )
-        return _db_client
+    return _db_client
 
 
-def get_vector_store(embedding_function) -> Chroma | None:
+def get_vector_store(embedding_function) -> Chroma:
     """
     Returns a singleton instance of the LangChain Chroma vector store,
     connected to our main persistent collection.
@@ -51,36 +98,158 @@ def get_vector_store(embedding_function) -> Chroma | None:
         client = get_chroma_client()
         
         # Create the LangChain vector store object, passing in the client and embedding function
-        _vector_store = Chroma(
+        provider = get_embedding_provider()
+        vector_store = Chroma(
             client=client,
-            collection_name="youtube_videos",
+            collection_name=settings.CHROMA_COLLECTION,
             embedding_function=embedding_function,
+            collection_metadata=provider.collection_metadata(),
         )
+        check_collection_embedding_model(vector_store._collection, provider)
+        _vector_store = vector_store
     return _vector_store
 
-def check_if_vectors_exist(video_id: str, vector_store: Chroma) -> bool:
+# Collections created before providers were recorded were always built with this model
+_LEGACY_COLLECTION_METADATA = {
+    "embedding_provider": "gemini",
+    "embedding_model": "models/text-embedding-004",
+    "embedding_dimension": 768,
+}
+
+def check_collection_embedding_model(collection: Collection, provider: EmbeddingProvider) -> None:
+    """
+    Refuses to use a collection whose vectors came from a different embedding model or dimension,
+    since mixing them silently breaks similarity search. Legacy collections get their metadata stamped.
     """
-    Checks if vectors for a specific video_id already exist in the single collection.
+    expected = provider.collection_metadata()
+    metadata = dict(collection.metadata or {})
+    recorded = {key: metadata.get(key) for key in expected}
 
-    Args:
-        video_id: The unique ID of the video to check for.
+    if all(value is None for value in recorded.values()):
+        if expected != _LEGACY_COLLECTION_METADATA:
+            raise ValueError(
+                f"Collection '{collection.name}' predates embedding metadata and was built with "
+                f"{_LEGACY_COLLECTION_METADATA['embedding_model']}, but {provider.model_name} is configured. "
+                "Set CHROMA_COLLECTION to a new collection name for this model."
+            )
+        # Chroma rejects distance settings in modify(), even unchanged ones; they live in the collection's configuration
+        kept = {key: value for key, value in metadata.items() if not key.startswith("hnsw:")}
+        collection.modify(metadata={**kept, **expected})
+        logger.info(f"Recorded embedding model {provider.model_name} on collection '{collection.name}'")
+        return
 
-    Returns:
-        True if at least one document with that video_id exists, False otherwise.
-    """
-    try:
-        # Retrieve result corresponding to video_id
-        result = vector_store.get(
-            where= {"video_id": video_id},
-            limit=1,
+    if recorded != expected:
+        raise ValueError(
+            f"Collection '{collection.name}' was built with {recorded['embedding_model']} "
+            f"({recorded['embedding_dimension']} dimensions) but {provider.model_name} "
+            f"({provider.dimension} dimensions) is configured. "
+            "Set CHROMA_COLLECTION to a new collection name for this model, or switch the provider back."
         )
 
-        # Result includes document IDs
-        found_ids = result.get("ids",[])
-        logger.info(f"Vector check for {video_id}: Found {len(found_ids)} existing document(s).")
-        return len(found_ids) > 0
-    
-    except Exception as e:
-        # This could happen if the collection doesn't exist yet, etc.
-        print(f"An error occurred during vector check for {video_id}: {e}")
-        return False
\ No newline at end of file
+def get_video_chunk_ids(video_id: str, vector_store: Chroma) -> list[str]:
+    """Ids of the chunks stored for the video."""
+    result = vector_store._collection.get(where={"video_id": video_id}, include=[])
+    return list(result["ids"])
+
+def get_video_chunk_positions(video_id: str, vector_store: Chroma) -> dict[str, int | None]:
+    """Ids of the chunks stored for the video, each with its chunk_index (None if it was ingested before positions were recorded)."""
+    result = vector_store._collection.get(where={"video_id": video_id}, include=["metadatas"])
+    metadatas = result["metadatas"] or [{}] * len(result["ids"])
+    positions: dict[str, int | None] = {}
+    for chunk_id, metadata in zip(result["ids"], metadatas):
+        chunk_index = (metadata or {}).get("chunk_index")
+        positions[chunk_id] = int(chunk_index) if chunk_index is not None else None
+    return positions
+
+def delete_chunk_vectors(vector_store: Chroma, ids: list[str]) -> None:
+    if ids:
+        vector_store._collection.delete(ids=ids)
+
+def list_video_ids_in_store(vector_store: Chroma, page_size: int = 5000) -> set[str]:
+    """Every video id with at least one chunk in the collection (reads metadata only, a page at a time)."""
+    video_ids: set[str] = set()
+    offset = 0
+    while True:
+        result = vector_store._collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        video_ids.update(str(m["video_id"]) for m in result["metadatas"] or [] if m and "video_id" in m)
+        if len(result["ids"]) < page_size:
+            return video_ids
+        offset += page_size
+
+def upsert_embeddings(vector_store: Chroma, ids: list[str], embeddings: list[list[float]], documents: list[Document]) -> None:
+    """Writes precomputed embeddings straight to the collection, skipping the store's own embedding call."""
+    vector_store._collection.upsert(
+        ids=ids,
+        embeddings=embeddings,  # type: ignore[arg-type]
+        metadatas=[doc.metadata for doc in documents],
+        documents=[doc.page_content for doc in documents],
+    )
+
+# --- Async access, for request paths running on the event loop ---
+# chromadb's async client keeps one pooled keep-alive httpx client per event loop;
+# the semaphore caps how many requests we have open against Chroma at once.
+_async_collection: AsyncCollection | None = None
+_async_init_lock: asyncio.Lock | None = None
+_async_request_slots: asyncio.Semaphore | None = None
+
+async def get_async_collection() -> AsyncCollection:
+    """Returns the main collection through a singleton chromadb AsyncHttpClient."""
+    global _async_collection, _async_init_lock, _async_request_slots
+    if _async_collection is not None:
+        return _async_collection
+    if _async_init_lock is None:
+        _async_init_lock = asyncio.Lock()
+    async with _async_init_lock:
+        if _async_collection is None:
+            logger.info("Initialising async ChromaDB client...")
+            client = await chromadb.AsyncHttpClient(
+                host=settings.CHROMA_HOST,
+                port=settings.CHROMA_PORT
+            )
+            # No embedding function: callers always pass precomputed vectors
+            _async_collection = await client.get_or_create_collection(
+                name=settings.CHROMA_COLLECTION,
+                metadata=get_embedding_provider().collection_metadata(),
+                embedding_function=None,
+            )
+            _async_request_slots = asyncio.Semaphore(settings.CHROMA_MAX_CONCURRENT_REQUESTS)
+    return _async_collection
+
+async def aget_video_chunks(video_id: str) -> GetResult:
+    """All of the video's chunks with their embeddings, texts and metadata."""
+    collection = await get_async_collection()
+    async with _async_request_slots: # type: ignore[union-attr]
+        return await collection.get(
+            where={"video_id": video_id},
+            include=["embeddings", "documents", "metadatas"]  # type: ignore[list-item]
+        )
+
+async def asimilarity_search_by_vector(video_id: str, embedding: list[float], k: int) -> list[Document]:
+    """The video's k chunks nearest to `embedding`."""
+    collection = await get_async_collection()
+    async with _async_request_slots: # type: ignore[union-attr]
+        result = await collection.query(
+            query_embeddings=[embedding],  # type: ignore[arg-type]
+            n_results=k,
+            where={"video_id": video_id},
+            include=["documents", "metadatas"]  # type: ignore[list-item]
+        )
+    documents = (result["documents"] or [[]])[0]
+    metadatas = (result["metadatas"] or [[]])[0]
+    return [Document(page_content=text, metadata=dict(metadata or {})) for text, metadata in zip(documents, metadatas)]
+
+async def asimilarity_search_with_vectors(video_id: str, embedding: list[float], k: int) -> tuple[list[Document], list[list[float]]]:
+    """`asimilarity_search_by_vector` that also returns each chunk's embedding (for re-ranking, e.g. MMR)."""
+    collection = await get_async_collection()
+    async with _async_request_slots: # type: ignore[union-attr]
+        result = await collection.query(
+            query_embeddings=[embedding],  # type: ignore[arg-type]
+            n_results=k,
+            where={"video_id": video_id},
+            include=["documents", "metadatas", "embeddings"]  # type: ignore[list-item]
+        )
+    documents = (result["documents"] or [[]])[0]
+    metadatas = (result["metadatas"] or [[]])[0]
+    embeddings = (result["embeddings"] or [[]])[0]
+    chunks = [Document(page_content=text, metadata=dict(metadata or {})) for text, metadata in zip(documents, metadatas)]
+    return chunks, [list(vector) for vector in embeddings]
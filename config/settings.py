@@ -11,6 +11,124 @@ load_dotenv()
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
 CHROMA_PORT = int(os.getenv("CHROMA_PORT", 8000))
+# Concurrent requests the async Chroma client keeps open (connections are pooled and kept alive)
+CHROMA_MAX_CONCURRENT_REQUESTS = int(os.getenv("CHROMA_MAX_CONCURRENT_REQUESTS", 32))
 
 # --------- API Keys -----------
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") 
\ No newline at end of file
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") 
+
+# --------- LLM -----------
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+# Tokens are counted locally; the estimator's scale is measured against the model's tokenizer once and kept here
+TOKEN_CALIBRATION_FILE = os.getenv("TOKEN_CALIBRATION_FILE", "./data/token_calibration.json")
+# Token counts of long texts (transcripts and their parts) memoized in memory, by text hash
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", 4096))
+# Prompts arriving within this many milliseconds of each other are sent to the LLM as one batch (0 disables)
+LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", 5))
+LLM_MAX_BATCH_SIZE = int(os.getenv("LLM_MAX_BATCH_SIZE", 16))
+# Requests of one batch sent to the LLM at once
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+
+# --------- Ingestion -----------
+# Background worker threads that run the transcript → chunk → embed pipeline
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+# How long a chat request waits for a first-time ingest before answering "ingesting"
+CHAT_INGEST_WAIT_SECONDS = float(os.getenv("CHAT_INGEST_WAIT_SECONDS", 20))
+# Threads async endpoints hand blocking work to (database, transcript downloads, waiting on an ingest)
+BLOCKING_IO_THREADS = int(os.getenv("BLOCKING_IO_THREADS", 64))
+
+# --------- Summaries -----------
+# Transcripts longer than this (model tokens) are summarised map-reduce style instead of in one prompt
+SUMMARY_STUFF_MAX_TOKENS = int(os.getenv("SUMMARY_STUFF_MAX_TOKENS", 24000))
+# Size of the parts (and groups of part summaries) summarised in the map and reduce steps
+SUMMARY_MAP_CHUNK_TOKENS = int(os.getenv("SUMMARY_MAP_CHUNK_TOKENS", 6000))
+# Part summaries requested from the LLM at once
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", 4))
+
+# --------- Chat history -----------
+# Latest turns of a conversation put into the prompt verbatim (estimated tokens, and at most this many turns);
+# older turns are folded into a rolling summary of at most HISTORY_SUMMARY_MAX_TOKENS
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 1000))
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", 6))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", 300))
+# Compacted histories kept in memory, per (user, video)
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", 1024))
+HISTORY_CACHE_TTL_SECONDS = int(os.getenv("HISTORY_CACHE_TTL_SECONDS", 60 * 60))
+
+# --------- Eviction -----------
+# Seconds between sweeps that drop cold videos' vectors from Chroma (0 disables eviction)
+EVICTION_INTERVAL_SECONDS = float(os.getenv("EVICTION_INTERVAL_SECONDS", 3600))
+# Evict videos nobody has chatted about for this long (0 = no idle limit)
+COLD_VIDEO_IDLE_SECONDS = float(os.getenv("COLD_VIDEO_IDLE_SECONDS", 7 * 24 * 3600))
+# Keep at most this many videos / chunks in Chroma, evicting the least recently used (0 = no cap)
+MAX_HOT_VIDEOS = int(os.getenv("MAX_HOT_VIDEOS", 0))
+MAX_HOT_CHUNKS = int(os.getenv("MAX_HOT_CHUNKS", 0))
+
+# --------- Batch ingestion -----------
+# Per-stage concurrency limits for the batch ingest pipeline
+BATCH_TRANSCRIPT_CONCURRENCY = int(os.getenv("BATCH_TRANSCRIPT_CONCURRENCY", 4))
+BATCH_METADATA_CONCURRENCY = int(os.getenv("BATCH_METADATA_CONCURRENCY", 4))
+BATCH_CHUNK_CONCURRENCY = int(os.getenv("BATCH_CHUNK_CONCURRENCY", 2))
+BATCH_EMBED_CONCURRENCY = int(os.getenv("BATCH_EMBED_CONCURRENCY", 2))
+BATCH_SUMMARY_CONCURRENCY = int(os.getenv("BATCH_SUMMARY_CONCURRENCY", 2))
+# Videos moving through the pipeline at once
+BATCH_MAX_IN_FLIGHT = int(os.getenv("BATCH_MAX_IN_FLIGHT", 8))
+# Finished batches whose progress can still be polled; older ones are forgotten as new batches start
+BATCH_HISTORY_SIZE = int(os.getenv("BATCH_HISTORY_SIZE", 100))
+
+# --------- Caches -----------
+# How long yt-dlp video metadata (title, uploader, upload date) is reused before re-fetching
+METADATA_CACHE_TTL_SECONDS = int(os.getenv("METADATA_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60))
+# Videos without a transcript are not re-checked for this long, doubling on each repeat failure
+TRANSCRIPT_FAILURE_TTL_SECONDS = int(os.getenv("TRANSCRIPT_FAILURE_TTL_SECONDS", 15 * 60))
+TRANSCRIPT_FAILURE_MAX_TTL_SECONDS = int(os.getenv("TRANSCRIPT_FAILURE_MAX_TTL_SECONDS", 24 * 60 * 60))
+# On-disk cache of chunk embeddings, keyed by embedding model + sha256 of the chunk text
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./data/embedding_cache")
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# In-memory LRU of question embeddings, keyed by embedding model + normalised question (0 disables)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 2048))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", 24 * 60 * 60))
+# In-memory cache of chat answers, hit by questions about the same video (after the same history)
+# whose embedding has at least this cosine similarity to an answered one (size 0 disables)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 4096))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", 6 * 60 * 60))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.95))
+
+# --------- Embedding -----------
+# Embedding backend: "gemini" (API), "onnx" / "sentence-transformers" (local CPU) or "hashing" (offline tests)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini")
+# Model name for the provider; unset uses the provider's default
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL") or None
+# Each collection records the model that built it, so switching models needs a new collection name
+CHROMA_COLLECTION = os.getenv("CHROMA_COLLECTION", "youtube_videos")
+# Chunks per embedding request are bounded by both count and total characters
+EMBED_BATCH_MAX_DOCS = int(os.getenv("EMBED_BATCH_MAX_DOCS", 100))
+EMBED_BATCH_MAX_CHARS = int(os.getenv("EMBED_BATCH_MAX_CHARS", 40_000))
+# Upper bound on concurrent embedding requests; halved on each rate-limit (429) response
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", 4))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 5))
+EMBED_RETRY_BASE_SECONDS = float(os.getenv("EMBED_RETRY_BASE_SECONDS", 1.0))
+
+# --------- Retrieval -----------
+# Search each video's chunks in-process from a local memory-mapped copy of its Chroma vectors
+LOCAL_INDEX_ENABLED = os.getenv("LOCAL_INDEX_ENABLED", "true").lower() == "true"
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "./data/vector_index")
+# Videos whose indexes are kept open at once
+LOCAL_INDEX_MAX_VIDEOS = int(os.getenv("LOCAL_INDEX_MAX_VIDEOS", 64))
+# "vector" (dense only), "bm25" (lexical only) or "hybrid" (both, merged with reciprocal rank fusion)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Chunks put in the prompt per question
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", 4))
+# Hybrid mode: candidates taken from each ranker before fusion, and the RRF rank constant
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", 20))
+RRF_K = int(os.getenv("RRF_K", 60))
+# Re-rank the candidates with maximal marginal relevance; lambda 1.0 = pure relevance, 0.0 = pure diversity
+RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "true").lower() == "true"
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", 0.5))
+# Chunks added either side of each hit; adjacent chunks are merged into one passage
+CONTEXT_NEIGHBOURS = int(os.getenv("CONTEXT_NEIGHBOURS", 0))
+# Upper bound on retrieved context tokens put in the prompt
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", 1000))
+# Retrieved passages sharing at least this fraction of their 4-word shingles with a better one are dropped (above 1 disables)
+CONTEXT_DEDUPE_SIMILARITY = float(os.getenv("CONTEXT_DEDUPE_SIMILARITY", 0.8))
@@ -1,8 +1,12 @@
 import logging
+from datetime import datetime, timedelta, timezone
 
-from sqlmodel import Session, select
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, update
 
-from db.models import ChatMessage, Summary, Transcript
+from db.models import (ChatMessage, ConversationSummary, IngestionJob,
+                       IngestionManifest, StoredChunk, Summary, SummaryPartial,
+                       Transcript, TranscriptFailure, VideoMetadata)
 
 logger = logging.getLogger(__name__)
 
@@ -31,17 +35,53 @@ def load_history(db: Session, user_id: str, video_id: str) -> list[ChatMessage]:
         logger.debug(f"No history found for video id {video_id}.")
     return list(history_sequence)
 
+def load_history_since(db: Session, user_id: str, video_id: str, since: datetime | None) -> list[ChatMessage]:
+    """The conversation's messages created after `since` (all of them if None), oldest first."""
+    statement = select(ChatMessage).where(
+        ChatMessage.user_id == user_id,
+        ChatMessage.video_id == video_id
+    )
+    if since is not None:
+        statement = statement.where(ChatMessage.created_at > since) # type: ignore[arg-type]
+    return list(db.exec(statement.order_by(ChatMessage.created_at)).all()) # type: ignore[arg-type]
+
+# ConversationSummary table:
+
+def load_conversation_summary(db: Session, user_id: str, video_id: str) -> ConversationSummary | None:
+    return db.get(ConversationSummary, (user_id, video_id))
+
+def save_conversation_summary(db: Session, user_id: str, video_id: str, summary: str, summarised_until: datetime, turns_folded: int) -> ConversationSummary:
+    record = db.get(ConversationSummary, (user_id, video_id))
+    if record is None:
+        record = ConversationSummary(user_id=user_id, video_id=video_id, summary=summary, summarised_until=summarised_until)
+    record.summary = summary
+    record.summarised_until = summarised_until
+    record.turns_folded = turns_folded
+    record.updated_at = datetime.now(timezone.utc)
+    db.add(record)
+    db.commit()
+    db.refresh(record)
+    return record
+
 # Summary table:
 
 def save_summary(db: Session, video_id: str, title: str, summary: str, metadata: dict) -> Summary:
-    summary_record = Summary(
-        video_id=video_id,
-        title=title,
-        summary=summary,
-        doc_metadata=metadata
-    )
-    db.add(summary_record)
-    db.commit()
+    """Saves (or replaces) the video's summary. If another session inserts it first, that summary is kept."""
+    try:
+        summary_record = db.merge(Summary(
+            video_id=video_id,
+            title=title,
+            summary=summary,
+            doc_metadata=metadata
+        ))
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        existing = db.get(Summary, video_id)
+        if existing is None:
+            raise
+        logger.info(f"Summary for video id {video_id} was saved concurrently; keeping that one.")
+        return existing
     db.refresh(summary_record)
     logger.debug(f"Successfully saved summary for video {title}; video id {video_id}.")
     return summary_record
@@ -54,14 +94,31 @@ def load_summary(db: Session, video_id: str) -> Summary | None:
         logger.debug(f"Successfully loaded transcript for video {summary.title}; video id {summary.video_id}.")
     return summary
 
+# SummaryPartial table (map-reduce summaries in progress):
+
+def load_summary_partials(db: Session, video_id: str) -> dict[str, str]:
+    statement = select(SummaryPartial).where(SummaryPartial.video_id == video_id)
+    return {partial.text_hash: partial.summary for partial in db.exec(statement).all()}
+
+def save_summary_partial(db: Session, text_hash: str, video_id: str, summary: str) -> None:
+    db.merge(SummaryPartial(text_hash=text_hash, video_id=video_id, summary=summary))
+    db.commit()
+
+def delete_summary_partials(db: Session, video_id: str) -> None:
+    statement = select(SummaryPartial).where(SummaryPartial.video_id == video_id)
+    for partial in db.exec(statement).all():
+        db.delete(partial)
+    db.commit()
+
 # Transcript table:
 
-def save_transcript(db: Session, video_id: str, title: str, transcript: str, metadata: dict) -> Transcript:
+def save_transcript(db: Session, video_id: str, title: str, transcript: str, metadata: dict, token_estimate: int | None = None) -> Transcript:
     transcript_record = Transcript(
         video_id=video_id,
         title=title,
         transcript=transcript,
         doc_metadata=metadata,       # ← keyword matches field name
+        token_estimate=token_estimate,
     )
     db.add(transcript_record)
     db.commit()
@@ -77,6 +134,132 @@ def load_transcript(db: Session, video_id: str) -> Transcript | None:
         logger.debug(f"Successfully loaded transcript for video {transcript.title}; video id {transcript.video_id}.")
     return transcript
 
+# VideoMetadata table:
+
+def save_video_metadata(db: Session, video_id: str, metadata: dict) -> VideoMetadata:
+    record = db.get(VideoMetadata, video_id) or VideoMetadata(video_id=video_id)
+    record.title = metadata.get("title")
+    record.uploader = metadata.get("uploader")
+    record.upload_date = metadata.get("upload_date")
+    record.fetched_at = datetime.now(timezone.utc)
+    db.add(record)
+    db.commit()
+    db.refresh(record)
+    logger.debug(f"Successfully saved metadata for video {record.title}; video id {video_id}.")
+    return record
+
+def load_video_metadata(db: Session, video_id: str, max_age_seconds: float | None = None) -> VideoMetadata | None:
+    """Returns the cached metadata, or None if missing or older than `max_age_seconds`."""
+    record = db.get(VideoMetadata, video_id)
+    if record is None:
+        logger.debug(f"No metadata found for video {video_id}.")
+        return None
+    if max_age_seconds is not None:
+        age = datetime.now(timezone.utc) - as_utc(record.fetched_at)
+        if age.total_seconds() > max_age_seconds:
+            logger.debug(f"Metadata for video id {video_id} expired ({age} old).")
+            return None
+    return record
+
+# TranscriptFailure table (negative cache):
+
+def record_transcript_failure(db: Session, video_id: str, reason: str, base_ttl_seconds: float, max_ttl_seconds: float) -> TranscriptFailure:
+    """Records a failed transcript fetch; each repeat failure doubles the time before the next re-check."""
+    now = datetime.now(timezone.utc)
+    failure = db.get(TranscriptFailure, video_id)
+    if failure is None:
+        failure = TranscriptFailure(video_id=video_id, reason=reason, failure_count=1, retry_after=now)
+    else:
+        failure.failure_count += 1
+        failure.reason = reason
+    ttl = min(base_ttl_seconds * 2 ** (failure.failure_count - 1), max_ttl_seconds)
+    failure.last_failed_at = now
+    failure.retry_after = now + timedelta(seconds=ttl)
+    db.add(failure)
+    db.commit()
+    db.refresh(failure)
+    logger.debug(f"Recorded transcript failure #{failure.failure_count} for video id {video_id}; retry in {ttl:.0f}s.")
+    return failure
+
+def load_transcript_failures(db: Session) -> list[TranscriptFailure]:
+    return list(db.exec(select(TranscriptFailure)).all())
+
+def clear_transcript_failure(db: Session, video_id: str) -> None:
+    failure = db.get(TranscriptFailure, video_id)
+    if failure is not None:
+        db.delete(failure)
+        db.commit()
+        logger.debug(f"Cleared transcript failure for video id {video_id}.")
+
+def as_utc(timestamp: datetime) -> datetime:
+    # SQLite drops the timezone, so stored UTC timestamps come back naive
+    return timestamp if timestamp.tzinfo is not None else timestamp.replace(tzinfo=timezone.utc)
+
+# IngestionManifest table:
+
+def save_ingestion_manifest(db: Session, video_id: str, status: str, chunk_count: int, chunk_size: int, chunk_overlap: int, embedding_model: str) -> IngestionManifest:
+    manifest = db.get(IngestionManifest, video_id) or IngestionManifest(
+        video_id=video_id, chunk_count=chunk_count, chunk_size=chunk_size, chunk_overlap=chunk_overlap, embedding_model=embedding_model
+    )
+    manifest.status = status
+    manifest.chunk_count = chunk_count
+    manifest.chunk_size = chunk_size
+    manifest.chunk_overlap = chunk_overlap
+    manifest.embedding_model = embedding_model
+    manifest.updated_at = datetime.now(timezone.utc)
+    db.add(manifest)
+    db.commit()
+    db.refresh(manifest)
+    logger.debug(f"Ingestion manifest for video id {video_id}: {status}, {chunk_count} chunks.")
+    return manifest
+
+def load_ingestion_manifest(db: Session, video_id: str) -> IngestionManifest | None:
+    return db.get(IngestionManifest, video_id)
+
+def load_ingestion_manifests(db: Session) -> list[IngestionManifest]:
+    return list(db.exec(select(IngestionManifest)).all())
+
+def touch_ingestion_manifest(db: Session, video_id: str) -> None:
+    """Records that the video was just chatted about (used to pick cold videos for eviction)."""
+    statement = update(IngestionManifest).where(
+        IngestionManifest.video_id == video_id # type: ignore[arg-type]
+    ).values(last_accessed_at=datetime.now(timezone.utc))
+    db.exec(statement) # type: ignore[call-overload]
+    db.commit()
+
+def set_ingestion_manifest_status(db: Session, video_id: str, status: str) -> IngestionManifest | None:
+    manifest = db.get(IngestionManifest, video_id)
+    if manifest is None:
+        return None
+    manifest.status = status
+    manifest.updated_at = datetime.now(timezone.utc)
+    db.add(manifest)
+    db.commit()
+    db.refresh(manifest)
+    return manifest
+
+# StoredChunk table (embedding checkpoints):
+
+def save_stored_chunks(db: Session, video_id: str, chunk_ids: list[str]) -> None:
+    """Records chunks whose vectors are in the vector store; existing records are left as they are."""
+    existing = load_stored_chunk_ids(db, video_id)
+    db.add_all(StoredChunk(chunk_id=chunk_id, video_id=video_id) for chunk_id in chunk_ids if chunk_id not in existing)
+    db.commit()
+    logger.debug(f"Recorded {len(chunk_ids)} stored chunk(s) for video id {video_id}.")
+
+def load_stored_chunk_ids(db: Session, video_id: str) -> set[str]:
+    statement = select(StoredChunk.chunk_id).where(StoredChunk.video_id == video_id)
+    return set(db.exec(statement).all())
+
+def delete_stored_chunks(db: Session, video_id: str, keep: set[str] | None = None) -> int:
+    """Forgets the video's stored chunks, except those in `keep`. Returns how many were removed."""
+    statement = select(StoredChunk).where(StoredChunk.video_id == video_id)
+    removed = [chunk for chunk in db.exec(statement).all() if keep is None or chunk.chunk_id not in keep]
+    for chunk in removed:
+        db.delete(chunk)
+    db.commit()
+    return len(removed)
+
 # Load video_id & title history from user_id (for side-panel)
 
 def get_video_ids_and_titles_by_user_id(db: Session, target_user_id: str) -> list[tuple[str,str]]:
@@ -88,3 +271,82 @@ def get_video_ids_and_titles_by_user_id(db: Session, target_user_id: str) -> lis
     results = db.exec(statement).all()
     return list(results) # Convert from type Sequence to List
 
+# IngestionJob table:
+
+def enqueue_ingestion_job(db: Session, video_id: str, video_url: str) -> IngestionJob:
+    """Queues the video for ingestion, unless a job for it is already queued or running."""
+    job = db.get(IngestionJob, video_id)
+    if job is not None and job.status in ("queued", "running"):
+        logger.debug(f"Ingestion job for video id {video_id} already {job.status}.")
+        return job
+
+    if job is None:
+        job = IngestionJob(video_id=video_id, video_url=video_url)
+    else:
+        # Re-queue a finished or failed job
+        job.video_url = video_url
+        job.status = "queued"
+        job.stage = None
+        job.error = None
+        job.updated_at = datetime.now(timezone.utc)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    logger.debug(f"Queued ingestion job for video id {video_id}.")
+    return job
+
+def claim_next_ingestion_job(db: Session) -> IngestionJob | None:
+    """Atomically moves the oldest queued job to 'running' and returns it."""
+    while True:
+        statement = select(IngestionJob).where(
+            IngestionJob.status == "queued"
+        ).order_by(IngestionJob.created_at).limit(1) # type: ignore[arg-type]
+        job = db.exec(statement).first()
+        if job is None:
+            return None
+
+        # Only one worker can win the queued → running transition
+        claim = update(IngestionJob).where(
+            IngestionJob.video_id == job.video_id,  # type: ignore[arg-type]
+            IngestionJob.status == "queued"         # type: ignore[arg-type]
+        ).values(
+            status="running",
+            attempts=IngestionJob.attempts + 1,
+            updated_at=datetime.now(timezone.utc)
+        )
+        result = db.exec(claim) # type: ignore[call-overload]
+        db.commit()
+        if result.rowcount == 1:
+            db.refresh(job)
+            logger.debug(f"Claimed ingestion job for video id {job.video_id}.")
+            return job
+        # Lost the race to another worker, try the next job
+
+def update_ingestion_job(db: Session, video_id: str, status: str | None = None, stage: str | None = None, error: str | None = None) -> IngestionJob | None:
+    job = db.get(IngestionJob, video_id)
+    if job is None:
+        return None
+    if status is not None:
+        job.status = status
+    if stage is not None:
+        job.stage = stage
+    job.error = error
+    job.updated_at = datetime.now(timezone.utc)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def load_ingestion_job(db: Session, video_id: str) -> IngestionJob | None:
+    return db.get(IngestionJob, video_id)
+
+def requeue_running_ingestion_jobs(db: Session) -> int:
+    """Puts jobs left 'running' by a previous process (e.g. after a crash) back on the queue."""
+    statement = update(IngestionJob).where(
+        IngestionJob.status == "running" # type: ignore[arg-type]
+    ).values(status="queued", updated_at=datetime.now(timezone.utc))
+    result = db.exec(statement) # type: ignore[call-overload]
+    db.commit()
+    if result.rowcount:
+        logger.info(f"Re-queued {result.rowcount} interrupted ingestion job(s).")
+    return int(result.rowcount)
@@ -12,14 +12,68 @@ class ChatMessage(SQLModel, table = True):
     answer: str
     created_at: datetime = Field(default_factory= lambda: datetime.now(timezone.utc), index=True)
 
+class ConversationSummary(SQLModel, table=True):
+    user_id: str = Field(primary_key=True)
+    video_id: str = Field(primary_key=True)
+    summary: str                    # Rolling summary of the turns folded so far
+    summarised_until: datetime      # created_at of the last ChatMessage folded into it
+    turns_folded: int = 0
+    updated_at: datetime = Field(default_factory= lambda: datetime.now(timezone.utc))
+
 class Transcript(SQLModel, table=True):
     video_id: str = Field(primary_key=True)
     title: str
     transcript: str
     doc_metadata: dict | None = Field(sa_column=Column(JSON))
+    token_estimate: int | None = None # Raw local token estimate of the transcript (app.services.tokens)
 
 class Summary(SQLModel, table=True):
     video_id: str = Field(primary_key=True)
     title: str    
     summary: str 
-    doc_metadata: dict = Field(sa_column=Column(JSON))
\ No newline at end of file
+    doc_metadata: dict = Field(sa_column=Column(JSON))
+
+class SummaryPartial(SQLModel, table=True):
+    video_id: str = Field(primary_key=True)
+    text_hash: str = Field(primary_key=True)  # sha256 of the transcript part (or group of part summaries) summarised
+    summary: str
+    created_at: datetime = Field(default_factory= lambda: datetime.now(timezone.utc))
+
+class IngestionJob(SQLModel, table=True):
+    video_id: str = Field(primary_key=True)
+    video_url: str
+    status: str = Field(default="queued", index=True) # queued | running | done | failed
+    stage: str | None = None                           # transcript | chunking | embedding
+    error: str | None = None
+    attempts: int = 0
+    created_at: datetime = Field(default_factory= lambda: datetime.now(timezone.utc), index=True)
+    updated_at: datetime = Field(default_factory= lambda: datetime.now(timezone.utc))
+
+class VideoMetadata(SQLModel, table=True):
+    video_id: str = Field(primary_key=True)
+    title: str | None = None
+    uploader: str | None = None
+    upload_date: str | None = None
+    fetched_at: datetime = Field(default_factory= lambda: datetime.now(timezone.utc))
+
+class TranscriptFailure(SQLModel, table=True):
+    video_id: str = Field(primary_key=True)
+    reason: str
+    failure_count: int = 1
+    last_failed_at: datetime = Field(default_factory= lambda: datetime.now(timezone.utc))
+    retry_after: datetime  # Don't ask YouTube again before this time
+
+class IngestionManifest(SQLModel, table=True):
+    video_id: str = Field(primary_key=True)
+    status: str = Field(default="embedding", index=True) # embedding | complete | evicted
+    chunk_count: int                                     # Chunks the transcript was split into
+    chunk_size: int
+    chunk_overlap: int
+    embedding_model: str
+    updated_at: datetime = Field(default_factory= lambda: datetime.now(timezone.utc))
+    last_accessed_at: datetime | None = Field(default=None, index=True) # Last chat about the video
+
+class StoredChunk(SQLModel, table=True):
+    chunk_id: str = Field(primary_key=True) # <video_id>-<hash of chunk position and text>
+    video_id: str = Field(index=True)
+    stored_at: datetime = Field(default_factory= lambda: datetime.now(timezone.utc))
@@ -1,9 +1,25 @@
-from sqlmodel import Session, create_engine
+from sqlalchemy import Engine, inspect, text
+from sqlmodel import Session, SQLModel, create_engine
 
+import db.models  # noqa: F401 # Registers the tables on SQLModel.metadata
 from app.core.config import DATABASE_URL
 
 engine = create_engine(url= DATABASE_URL, echo=False)
 
+# Columns added to tables that existing databases already have; create_all only creates missing tables
+_ADDED_COLUMNS = [
+    ("transcript", "token_estimate", "INTEGER"),
+]
+
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+def create_db_and_tables(engine: Engine) -> None:
+    """Creates missing tables, then adds any of `_ADDED_COLUMNS` an existing table lacks. Safe to run on every start."""
+    SQLModel.metadata.create_all(engine)
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table, column, column_type in _ADDED_COLUMNS:
+            if column not in {existing["name"] for existing in inspector.get_columns(table)}:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
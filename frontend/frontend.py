@@ -1,4 +1,6 @@
+import json
 import logging
+from typing import Any, Iterator, cast
 
 import requests
 import streamlit as st
@@ -29,6 +31,8 @@ if "url_input_value" not in st.session_state:
     st.session_state.url_input_value = ""
 if "input_chat_message" not in st.session_state:
     st.session_state.input_chat_message = ""
+if "pending_question" not in st.session_state:   # Sent, answer not streamed yet
+    st.session_state.pending_question = None
 
 # Initialise key session state variables
 if "video_url" not in st.session_state:
@@ -113,18 +117,58 @@ def fetch_summary(video_url: str) -> SummaryResponse:
         raise # Re-raise the original requests exception to be caught by the caller
     return validated_data
 
-def fetch_chat(video_url: str, question: str) -> ChatResponse:
+def fetch_chat_stream(video_url: str, question: str) -> requests.Response:
+    """Opens the streaming chat endpoint; read the answer with `iter_answer_tokens`."""
     payload = {
         "video_url": video_url,
         "question": question
     }
 
-    response = api.post(f"{API_BASE}/chat/", json=payload)
+    response: requests.Response = api.post(f"{API_BASE}/chat/stream", json=payload, stream=True)
     response.raise_for_status()
-    data = response.json()
-    # Validate the response
-    validated_response = ChatResponse.model_validate(data)
-    return validated_response
+    response.encoding = "utf-8"
+    return response
+
+def iter_answer_tokens(response: requests.Response) -> Iterator[str]:
+    """Yields the answer's text from the server-sent events of /chat/stream as they arrive."""
+    event = None
+    for raw in response.iter_lines(decode_unicode=True):
+        line = raw.decode() if isinstance(raw, bytes) else raw
+        if not line:
+            event = None # Blank line ends an event
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data = cast(dict[str, Any], json.loads(line[len("data:"):]))
+            if event == "error":
+                raise RuntimeError(data["detail"])
+            if event is None:
+                yield str(data["token"])
+
+def stream_answer(question: str) -> None:
+    """Renders the answer to `question` token by token, then adds the exchange to the history."""
+    video_url = f"https://www.youtube.com/watch?v={st.session_state.video_id}"
+    st.markdown(f"**You:** {question}")
+    try:
+        response = fetch_chat_stream(video_url=video_url, question=question)
+        if response.headers.get("content-type", "").startswith("application/json"):
+            chat_response = ChatResponse.model_validate(response.json())
+            if chat_response.status == "ingesting":
+                # Video still being indexed- keep the question in the box so it can be re-sent
+                st.info(chat_response.answer)
+                st.session_state.input_chat_message = question
+                return
+            answer = chat_response.answer
+            st.markdown(f"**Bot:** {answer}")
+        else:
+            st.markdown("**Bot:**")
+            answer = st.write_stream(iter_answer_tokens(response))
+    except Exception as e:
+        logger.error(f"Streaming chat failed for video {st.session_state.video_id}. Error: {e}", exc_info=True)
+        st.error("Something went wrong while answering. Please try again.")
+        st.session_state.input_chat_message = question
+        return
+    st.session_state.chat_history.append((question, answer))
 
 # ------ Callback functions --------
 def handle_get_summary_click() -> None:
@@ -160,13 +204,8 @@ def handle_send_message_click() -> None:
     # Retrieve question widget input from state
     question = st.session_state.get("input_chat_message", "") 
     if question and st.session_state.video_id:
-        video_url = f"https://www.youtube.com/watch?v={st.session_state.video_id}"
-        chat_response: ChatResponse = fetch_chat(
-            video_url= video_url,
-            question=question
-            )
-        answer: str = chat_response.answer
-        st.session_state.chat_history.append((question, answer))
+        # Answered below the conversation while the page renders, so tokens can be shown as they arrive
+        st.session_state.pending_question = question
         # Clear question widget input
         st.session_state.input_chat_message = "" 
     elif not st.session_state.video_url:
@@ -184,6 +223,7 @@ def handle_new_video_click() -> None:
     st.session_state.video_id = None
     st.session_state.summary = None
     st.session_state.chat_history = []
+    st.session_state.pending_question = None
 
 def handle_previous_conversation_click(user_id: str, video_id: str):
     try:
@@ -230,6 +270,10 @@ else:
     for user_q, bot_a in st.session_state.chat_history:
         st.markdown(f"**You:** {user_q}")
         st.markdown(f"**Bot:** {bot_a}")
+    if st.session_state.pending_question:
+        pending_question = st.session_state.pending_question
+        st.session_state.pending_question = None
+        stream_answer(pending_question)
     
     # Chat input
     st.subheader(body="Ask a question about the video")
@@ -9,4 +9,5 @@ class SummaryResponse(BaseModel):
 
 class ChatResponse(BaseModel):
     answer: str
+    status: str = "answered" # "ingesting" while the video is still being indexed
 
@@ -27,3 +27,11 @@ def in_memory_db():
     SQLModel.metadata.create_all(engine)
     with Session(engine) as session:
         yield session
+
+@pytest.fixture(autouse=True)
+def local_token_counter(monkeypatch):
+    """Token counts in tests use the plain estimate: no calibration file is read or written and the LLM's tokenizer is never called."""
+    import app.services.tokens as tokens
+    counter = tokens.TokenCounter(model_name="test", calibration_file=None, memo_size=16)
+    counter.calibrated = True
+    monkeypatch.setattr(tokens, "_token_counter", counter)
@@ -0,0 +1,96 @@
+import asyncio
+
+import app.services.answer_cache as answer_cache
+from app.embedding_providers import HashingEmbeddings
+from app.services.answer_cache import SemanticAnswerCache, history_fingerprint
+from app.services.rag import ChatSession
+
+
+def test_similar_question_about_same_video_hits():
+    cache = SemanticAnswerCache(max_entries=10, ttl_seconds=60, threshold=0.9)
+    cache.put("vid", [1.0, 0.0], "Three takeaways")
+
+    assert cache.get("vid", [0.99, 0.05]) == "Three takeaways"
+    assert cache.get("vid", [0.0, 1.0]) is None
+    assert cache.get("other", [1.0, 0.0]) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_history_is_part_of_the_key():
+    cache = SemanticAnswerCache(max_entries=10, ttl_seconds=60, threshold=0.9)
+    history = [("Who is speaking?", "Ada")]
+    cache.put("vid", [1.0, 0.0], "Her main point", history=history_fingerprint(history))
+
+    assert cache.get("vid", [1.0, 0.0]) is None
+    assert cache.get("vid", [1.0, 0.0], history=history_fingerprint(history)) == "Her main point"
+    assert history_fingerprint([]) == ""
+
+
+def test_expiry_eviction_and_invalidation():
+    cache = SemanticAnswerCache(max_entries=2, ttl_seconds=0, threshold=0.9)
+    cache.put("vid", [1.0, 0.0], "stale")
+    assert cache.get("vid", [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+    cache = SemanticAnswerCache(max_entries=2, ttl_seconds=60, threshold=0.9)
+    cache.put("cold", [1.0, 0.0], "a")
+    cache.put("hot", [1.0, 0.0], "b")
+    cache.put("hot", [0.0, 1.0], "c")
+    assert cache.get("cold", [1.0, 0.0]) is None # Least recently used video loses its answer first
+    assert cache.stats()["evictions"] == 1
+
+    cache.invalidate("hot")
+    assert cache.get("hot", [0.0, 1.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_video_does_not_break_eviction(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(answer_cache.time, "monotonic", lambda: now)
+    cache = SemanticAnswerCache(max_entries=1, ttl_seconds=10, threshold=0.9)
+    cache.put("old", [1.0, 0.0], "a")
+    now += 20
+    assert cache.get("old", [1.0, 0.0]) is None # Expires the video's only answer
+    cache.put("new", [1.0, 0.0], "b")
+    cache.put("newer", [1.0, 0.0], "c") # Evicts "new"
+    assert cache.get("newer", [1.0, 0.0]) == "c"
+    assert cache.stats()["entries"] == 1 and cache.stats()["videos"] == 1
+
+
+class FakeResult:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        return FakeResult(f"answer {self.calls}")
+
+
+class FakeRetriever:
+    async def aget_context(self, query, video_id):
+        return "context"
+
+
+class FakeVectorStore:
+    embeddings = HashingEmbeddings()
+
+
+def test_chat_session_reuses_answers_for_repeated_questions():
+    llm = FakeLLM()
+    cache = SemanticAnswerCache(max_entries=10, ttl_seconds=60, threshold=0.95)
+    session = ChatSession(llm=llm, vectordb=FakeVectorStore(), retriever=FakeRetriever(), memory=None, prompt_template="", answer_cache=cache)
+
+    async def ask(question, history=()):
+        return await session.aask(question, history=list(history), video_id="vid")
+
+    assert asyncio.run(ask("What are the key takeaways?")) == "answer 1"
+    assert asyncio.run(ask("What are the key takeaways?")) == "answer 1"
+    assert asyncio.run(ask("Who is the guest?")) == "answer 2"
+    assert asyncio.run(ask("What are the key takeaways?", history=[("Hi", "Hello")])) == "answer 3"
+    assert llm.calls == 3
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+from langchain.schema import Document
+from sqlmodel import Session, SQLModel, create_engine
+
+import app.services.batch_ingest as batch_ingest
+from app.services.batch_ingest import BatchIngestor, new_batch
+from db.crud import load_transcript, save_summary
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'batch.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def stub_pipeline(monkeypatch):
+    """Replaces the network-bound stages with fast stubs that track concurrency."""
+    state = {"embedded": set(), "summarised": [], "active_embeds": 0, "max_embeds": 0}
+    lock = threading.Lock()
+
+    def fake_embed(db, video_id, chunks, vector_store):
+        with lock:
+            state["active_embeds"] += 1
+            state["max_embeds"] = max(state["max_embeds"], state["active_embeds"])
+        time.sleep(0.05)
+        with lock:
+            state["active_embeds"] -= 1
+            state["embedded"].add(chunks[0].metadata["video_id"])
+
+    def fake_summarise(video_url, db):
+        state["summarised"].append(video_url)
+
+    monkeypatch.setattr(batch_ingest, "fetch_transcript_documents", lambda video_id: [Document(page_content=f"words from {video_id} " * 50)])
+    monkeypatch.setattr(batch_ingest, "get_video_metadata", lambda video_id, db: {"title": f"Title {video_id}", "video_id": video_id})
+    monkeypatch.setattr(batch_ingest, "get_embedding_function", lambda: None)
+    monkeypatch.setattr(batch_ingest, "get_vector_store", lambda embedding_function: None)
+    monkeypatch.setattr(batch_ingest, "is_ingested", lambda video_id, db: video_id in state["embedded"])
+    monkeypatch.setattr(batch_ingest, "save_chunk_vectors", fake_embed)
+    monkeypatch.setattr(batch_ingest, "summarise_ingest", fake_summarise)
+    return state
+
+
+def test_batch_ingest_respects_stage_limits(engine, stub_pipeline):
+    urls = [f"https://www.youtube.com/watch?v=vid{i}" for i in range(6)]
+    limits = {"transcript": 3, "metadata": 3, "chunking": 2, "embedding": 1, "summary": 2}
+    progress = []
+    ingestor = BatchIngestor(engine=engine, stage_limits=limits, max_in_flight=6, on_progress=lambda item: progress.append(item.stage))
+
+    batch = ingestor.run(new_batch(urls))
+
+    assert batch.finished
+    assert [item.status for item in batch.items] == ["done"] * 6
+    assert stub_pipeline["max_embeds"] == 1
+    assert stub_pipeline["embedded"] == {f"vid{i}" for i in range(6)}
+    assert len(stub_pipeline["summarised"]) == 6
+    assert {"transcript", "metadata", "chunking", "embedding", "summary"} <= set(progress)
+    with Session(engine) as db:
+        assert load_transcript(db, "vid0").title == "Title vid0"
+
+
+def test_batch_ingest_skips_cached_videos(engine, stub_pipeline):
+    with Session(engine) as db:
+        save_summary(db=db, video_id="cached", title="Cached", summary="Already done", metadata={})
+    stub_pipeline["embedded"].add("cached")
+
+    batch = BatchIngestor(engine=engine).run(new_batch(["https://youtu.be/cached", "not-a-url"]))
+
+    assert batch.items[0].status == "skipped"
+    assert batch.items[1].status == "failed"
+    assert stub_pipeline["summarised"] == []
+
+
+def test_only_recent_finished_batches_are_kept(monkeypatch):
+    monkeypatch.setattr(batch_ingest, "_batches", {})
+    monkeypatch.setattr(batch_ingest.settings, "BATCH_HISTORY_SIZE", 1)
+    running = new_batch(["https://youtu.be/a"])
+    old = new_batch(["https://youtu.be/b"])
+    old.finished = True
+    recent = new_batch(["https://youtu.be/c"])
+    recent.finished = True
+    new_batch(["https://youtu.be/d"])
+
+    assert batch_ingest.get_batch(old.batch_id) is None
+    assert batch_ingest.get_batch(recent.batch_id) is recent
+    assert batch_ingest.get_batch(running.batch_id) is running # Still in progress
@@ -0,0 +1,35 @@
+import json
+
+from app.services.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+CHUNKS = [
+    "Today we talk about training neural networks on small datasets.",
+    "The learning rate was set to 3e-4 with the AdamW optimizer.",
+    "Networks trained this way generalise better, in our experience.",
+    "Thanks for watching, and remember to subscribe.",
+]
+
+
+def test_exact_terms_rank_their_chunk_first():
+    index = BM25Index.build(CHUNKS)
+
+    assert index.top_k("which optimizer and learning rate?", k=2)[0] == 1
+    assert index.top_k("AdamW", k=4) == [1] # Chunks without the term are left out
+    assert index.top_k("the and of", k=4) == [] # Stop words only
+
+
+def test_index_round_trips_through_json():
+    index = BM25Index.build(CHUNKS)
+    restored = BM25Index.from_dict(json.loads(json.dumps(index.to_dict())))
+
+    for query in ["neural networks", "subscribe", "learning rate"]:
+        assert restored.top_k(query, k=3) == index.top_k(query, k=3)
+
+
+def test_rrf_prefers_items_ranked_well_by_both():
+    dense = [0, 2, 4]
+    lexical = [3, 2, 5]
+    fused = reciprocal_rank_fusion([dense, lexical])
+    assert fused[0] == 2
+    assert set(fused) == {0, 2, 3, 4, 5}
+    assert tokenize("The AdamW optimizer") == ["adamw", "optimizer"]
@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+import app.api.routers.chat as chat
+from app.core.components import Components, get_components
+from app.services.ingestion_queue import IngestionPendingError
+from app.services.rag import ChatSession
+from db.crud import load_history
+from db.models import IngestionJob
+from db.session import get_session
+
+VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+class FakeChunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    async def astream(self, prompt):
+        for piece in ["Never ", "gonna ", "", "give you up"]:
+            yield FakeChunk(piece)
+
+
+class FakeRetriever:
+    async def aget_context(self, query, video_id):
+        return "context"
+
+
+def test_chat_session_streams_llm_tokens():
+    session = ChatSession(llm=FakeLLM(), vectordb=None, retriever=FakeRetriever(), memory=None, prompt_template="")
+
+    async def collect():
+        return [token async for token in session.astream("What?", history=[], video_id="vid")]
+
+    assert asyncio.run(collect()) == ["Never ", "gonna ", "give you up"]
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def client(engine):
+    def session():
+        with Session(engine) as db:
+            yield db
+
+    api = FastAPI()
+    api.include_router(chat.router, prefix="/api")
+    api.dependency_overrides[get_session] = session
+    api.dependency_overrides[get_components] = lambda: Components(
+        llm=None, embedding_function=None, chroma_client=None, vector_store=None, engine=engine
+    )
+    return TestClient(api)
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event"), json.loads(fields["data"])))
+    return events
+
+
+def test_stream_endpoint_sends_tokens_then_saves_answer(client, engine, monkeypatch):
+    async def arag_chat_stream(**kwargs):
+        async def tokens():
+            yield "Never "
+            yield "gonna"
+        return tokens()
+
+    monkeypatch.setattr(chat, "arag_chat_stream", arag_chat_stream)
+
+    response = client.post("/api/chat/stream", json={"video_url": VIDEO_URL, "question": "Lyrics?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert parse_events(response.text) == [
+        (None, {"token": "Never "}),
+        (None, {"token": "gonna"}),
+        ("done", {"answer": "Never gonna"}),
+    ]
+    user_id = response.cookies["user_id"]
+    with Session(engine) as db:
+        assert [m.answer for m in load_history(db, user_id, "dQw4w9WgXcQ")] == ["Never gonna"]
+
+
+def test_stream_endpoint_reports_pending_ingest_as_json(client, monkeypatch):
+    async def arag_chat_stream(**kwargs):
+        raise IngestionPendingError(IngestionJob(video_id="dQw4w9WgXcQ", video_url=VIDEO_URL))
+
+    monkeypatch.setattr(chat, "arag_chat_stream", arag_chat_stream)
+
+    response = client.post("/api/chat/stream", json={"video_url": VIDEO_URL, "question": "Lyrics?"})
+
+    assert response.status_code == 202
+    assert response.json()["status"] == "ingesting"
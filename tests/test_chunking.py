@@ -35,4 +35,13 @@ def test_chunking_splits_cleanly(one_long_doc, size, overlap, expected_min_chunk
 
     
 
-    
\ No newline at end of file
+    
+
+def test_chunks_record_position(one_long_doc):
+    chunks = chunk_documents(one_long_doc, chunk_size=500, chunk_overlap=50)
+    text = one_long_doc[0].page_content
+
+    assert [c.metadata["chunk_index"] for c in chunks] == list(range(len(chunks)))
+    for c in chunks:
+        start = c.metadata["start_index"]
+        assert text[start:start + len(c.page_content)] == c.page_content
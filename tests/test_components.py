@@ -0,0 +1,64 @@
+import pytest
+from sqlmodel import create_engine
+
+import app.core.components as components
+from app.core.components import Components, check_ready, get_components
+from app.embedding_providers import HashingEmbeddings
+
+
+class FakeChromaClient:
+    def __init__(self, up=True):
+        self.up = up
+
+    def heartbeat(self):
+        if not self.up:
+            raise ConnectionError("Could not connect to Chroma")
+        return 1
+
+
+class FakeCollection:
+    def count(self):
+        return 0
+
+
+class FakeVectorStore:
+    _collection = FakeCollection()
+
+
+@pytest.fixture
+def chroma():
+    return FakeChromaClient()
+
+
+@pytest.fixture(autouse=True)
+def fake_components(monkeypatch, chroma):
+    builds = []
+
+    def build_components(engine):
+        builds.append(engine)
+        return Components(llm=None, embedding_function=HashingEmbeddings(), chroma_client=chroma, vector_store=FakeVectorStore(), engine=engine)
+
+    monkeypatch.setattr(components, "build_components", build_components)
+    monkeypatch.setattr(components, "engine", create_engine("sqlite:///:memory:"))
+    monkeypatch.setattr(components, "_components", None)
+    return builds
+
+
+def test_components_are_built_once_and_warmed(fake_components):
+    built = components.init_components()
+
+    assert built.warm
+    assert get_components() is built
+    assert check_ready() == (True, None)
+    assert len(fake_components) == 1
+
+
+def test_not_ready_until_warm_up_succeeds(chroma):
+    chroma.up = False
+    components.init_components()
+    ready, error = check_ready()
+    assert not ready
+    assert "Chroma" in error
+
+    chroma.up = True
+    assert check_ready() == (True, None)
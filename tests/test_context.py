@@ -0,0 +1,145 @@
+import asyncio
+
+import numpy as np
+from langchain.schema import Document
+
+from app.services.chunking import chunk_documents
+from app.services.context import (assemble_context, drop_near_duplicates,
+                                  expand_with_neighbours, merge_contiguous, mmr_select,
+                                  trim_to_budget)
+from app.services.tokens import count_tokens
+
+
+def naive_mmr(query, vectors, k, lambda_mult):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    query = query / np.linalg.norm(query)
+    selected = []
+    while len(selected) < k:
+        best, best_score = None, -np.inf
+        for i in range(len(vectors)):
+            if i in selected:
+                continue
+            redundancy = max((vectors[i] @ vectors[j] for j in selected), default=0.0)
+            score = lambda_mult * (vectors[i] @ query) - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+    return selected
+
+
+def test_mmr_matches_reference_and_skips_duplicates():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(30, 16))
+    query = rng.normal(size=16)
+    assert mmr_select(query, vectors, k=6, lambda_mult=0.5) == naive_mmr(query, vectors, 6, 0.5)
+
+    # Two copies of the best match: diversity picks something else second
+    duplicated = np.vstack([query, query, rng.normal(size=16)])
+    assert mmr_select(query, duplicated, k=2, lambda_mult=0.5) == [0, 2]
+
+
+def test_adjacent_chunks_merge_without_repeating_overlap():
+    text = " ".join(f"word{i}" for i in range(400))
+    chunks = chunk_documents([Document(page_content=text, metadata={"title": "t"})], chunk_size=300, chunk_overlap=50)
+
+    positions = expand_with_neighbours([1, 6], n_chunks=len(chunks), window=1)
+    assert positions == [0, 1, 2, 5, 6, 7]
+
+    passages = merge_contiguous([(p, chunks[p]) for p in positions])
+    assert [p for p, _ in passages] == [[0, 1, 2], [5, 6, 7]]
+    first = passages[0][1]
+    assert text.startswith(first.page_content)
+    assert first.page_content == text[:first.metadata["end_index"]]
+
+    # Without character offsets the shared text is found by matching
+    plain = [(p, Document(page_content=chunks[p].page_content)) for p in (0, 1)]
+    assert merge_contiguous(plain)[0][1].page_content == text[:chunks[1].metadata["start_index"] + len(chunks[1].page_content)]
+
+
+def test_trim_to_budget():
+    passages = [Document(page_content="word " * 60), Document(page_content="word " * 30), Document(page_content="word " * 30)]
+    assert [count_tokens(p.page_content) for p in trim_to_budget(passages, max_tokens=100)] == [60, 30]
+    assert [count_tokens(p.page_content) for p in trim_to_budget(passages, max_tokens=40)] == [40]
+
+
+def test_near_duplicates_are_dropped_keeping_the_first():
+    repeated = "so that is why we always cache the embeddings before we search"
+    passages = [
+        Document(page_content=repeated),
+        Document(page_content="Okay. " + repeated + "!"), # Same speech, different punctuation
+        Document(page_content="intro music and then " + repeated + " which brings us to the next part of the talk"),
+        Document(page_content="a completely different point about latency budgets"),
+    ]
+    kept = drop_near_duplicates(passages, threshold=0.8)
+    assert [p.page_content for p in kept] == [passages[0].page_content, passages[3].page_content]
+    assert len(drop_near_duplicates(passages, threshold=1.01)) == 4
+
+
+def test_assemble_context_orders_by_position_and_keeps_best_hits_in_budget():
+    text = " ".join(f"word{i}" for i in range(400))
+    chunks = chunk_documents([Document(page_content=text, metadata={"title": "t"})], chunk_size=300, chunk_overlap=50)
+    hits = [6, 1, 2, 9]
+    retrieved = [(p, chunks[p]) for p in hits]
+
+    passages = assemble_context(retrieved, hits=hits, max_tokens=10_000, dedupe_threshold=0.8)
+    assert [p.metadata["chunk_index"] for p in passages] == [1, 6, 9] # Transcript order; 1 and 2 merged
+    assert passages[0].page_content == text[chunks[1].metadata["start_index"]:passages[0].metadata["end_index"]]
+
+    budget = count_tokens(chunks[6].page_content) + count_tokens(chunks[9].page_content)
+    passages = assemble_context(retrieved, hits=hits, max_tokens=budget, dedupe_threshold=0.8)
+    assert [p.metadata["chunk_index"] for p in passages] == [6] # The best hit; the next passage (1 and 2 merged) does not fit
+
+
+def test_async_chroma_fallback_reranks_with_mmr(monkeypatch):
+    import app.services.rag as rag
+    from app.embedding_providers import HashingEmbeddings
+
+    class FakeVectorStore:
+        embeddings = HashingEmbeddings()
+
+    query_vector = FakeVectorStore.embeddings.embed_query("caching")
+    duplicate = Document(page_content="caching caching", metadata={"chunk_index": 0})
+    chunks = [duplicate, Document(page_content="caching again", metadata={"chunk_index": 2}), Document(page_content="latency", metadata={"chunk_index": 5})]
+    vectors = [query_vector, query_vector, FakeVectorStore.embeddings.embed_query("latency")]
+    requested = []
+
+    async def asimilarity_search_with_vectors(video_id, embedding, k):
+        requested.append(k)
+        return chunks, vectors
+
+    monkeypatch.setattr(rag, "asimilarity_search_with_vectors", asimilarity_search_with_vectors)
+    monkeypatch.setattr(rag.settings, "LOCAL_INDEX_ENABLED", False)
+    monkeypatch.setattr(rag.settings, "RETRIEVAL_MODE", "vector")
+    monkeypatch.setattr(rag.settings, "RETRIEVAL_MMR", True)
+    monkeypatch.setattr(rag.settings, "MMR_LAMBDA", 0.3)
+    monkeypatch.setattr(rag.settings, "RETRIEVAL_CANDIDATES", 20)
+
+    retriever = rag.TranscriptRetriever(vector_store=FakeVectorStore(), k=2)
+    results = asyncio.run(retriever._asearch("caching", "vid"))
+
+    assert requested == [20]
+    assert [doc.page_content for doc in results] == ["caching caching", "latency"] # Not both copies of the best match
+
+
+def test_local_index_without_positions_skips_neighbours(monkeypatch):
+    import app.services.rag as rag
+    from app.embedding_providers import HashingEmbeddings
+    from app.services.local_index import VideoIndex
+
+    class FakeVectorStore:
+        embeddings = HashingEmbeddings()
+
+    texts = ["intro", "caching explained", "unrelated outro"]
+    vectors = np.asarray(FakeVectorStore.embeddings.embed_documents(texts), dtype=np.float32)
+    monkeypatch.setattr(rag.settings, "RETRIEVAL_MODE", "vector")
+    monkeypatch.setattr(rag.settings, "RETRIEVAL_MMR", False)
+    monkeypatch.setattr(rag.settings, "CONTEXT_NEIGHBOURS", 1)
+    retriever = rag.TranscriptRetriever(vector_store=FakeVectorStore(), k=1)
+    query_vector = FakeVectorStore.embeddings.embed_query("caching explained")
+
+    legacy = VideoIndex(ids=["a", "b", "c"], vectors=vectors, texts=texts, metadatas=[{"video_id": "vid"}] * 3)
+    assert [doc.page_content for doc in retriever._rank(legacy, "caching explained", query_vector)] == ["caching explained"]
+
+    positioned = VideoIndex(ids=["a", "b", "c"], vectors=vectors, texts=texts, metadatas=[{"video_id": "vid", "chunk_index": i} for i in range(3)])
+    merged = retriever._rank(positioned, "caching explained", query_vector)
+    assert [doc.page_content for doc in merged] == ["intro caching explained unrelated outro"] # Neighbours stitched in order
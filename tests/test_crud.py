@@ -1,11 +1,16 @@
 
 from uuid import uuid4
 
-from sqlmodel import select
-
-from db.crud import (load_history, load_summary, load_transcript, save_message,
-                     save_summary, save_transcript)
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, create_engine, select
+
+from db.crud import (claim_next_ingestion_job, enqueue_ingestion_job, load_history,
+                     load_ingestion_job, load_summary, load_transcript,
+                     requeue_running_ingestion_jobs, save_message, save_summary,
+                     save_transcript, update_ingestion_job)
 from db.models import ChatMessage
+from db.session import create_db_and_tables
 
 
 # Test for save_message and load_history
@@ -86,4 +91,60 @@ def test_save_and_load_transcript(in_memory_db):
 
     # Test loading a non-existent summary
     non_existent_transcript = load_transcript(db=in_memory_db, video_id="non_existent_transcript_video_id")
-    assert non_existent_transcript is None
\ No newline at end of file
+    assert non_existent_transcript is None
+
+
+# Test for the ingestion job queue
+def test_ingestion_job_lifecycle(in_memory_db):
+    url = "https://www.youtube.com/watch?v=job_video"
+    job = enqueue_ingestion_job(db=in_memory_db, video_id="job_video", video_url=url)
+    assert job.status == "queued"
+
+    # Enqueueing again while queued doesn't create a second job
+    again = enqueue_ingestion_job(db=in_memory_db, video_id="job_video", video_url=url)
+    assert again.created_at == job.created_at
+
+    claimed = claim_next_ingestion_job(db=in_memory_db)
+    assert claimed is not None
+    assert claimed.video_id == "job_video"
+    assert claimed.status == "running"
+    assert claimed.attempts == 1
+
+    # Nothing left to claim
+    assert claim_next_ingestion_job(db=in_memory_db) is None
+
+    update_ingestion_job(db=in_memory_db, video_id="job_video", stage="embedding")
+    assert load_ingestion_job(db=in_memory_db, video_id="job_video").stage == "embedding"
+
+    update_ingestion_job(db=in_memory_db, video_id="job_video", status="failed", error="boom")
+    failed = load_ingestion_job(db=in_memory_db, video_id="job_video")
+    assert failed.status == "failed"
+    assert failed.error == "boom"
+
+    # A failed job can be queued again
+    retried = enqueue_ingestion_job(db=in_memory_db, video_id="job_video", video_url=url)
+    assert retried.status == "queued"
+    assert retried.error is None
+
+
+def test_requeue_running_ingestion_jobs(in_memory_db):
+    enqueue_ingestion_job(db=in_memory_db, video_id="crashed", video_url="https://youtu.be/crashed")
+    claim_next_ingestion_job(db=in_memory_db)
+
+    assert requeue_running_ingestion_jobs(db=in_memory_db) == 1
+    assert load_ingestion_job(db=in_memory_db, video_id="crashed").status == "queued"
+
+
+def test_create_db_and_tables_upgrades_an_existing_transcript_table():
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+    with engine.begin() as connection: # The transcript table as first deployed
+        connection.execute(text("CREATE TABLE transcript (video_id VARCHAR PRIMARY KEY, title VARCHAR, transcript VARCHAR, doc_metadata JSON)"))
+        connection.execute(text("INSERT INTO transcript VALUES ('old', 'Old talk', 'words', '{}')"))
+
+    create_db_and_tables(engine)
+    create_db_and_tables(engine) # Idempotent
+
+    with Session(engine) as db:
+        assert load_transcript(db, "old").token_estimate is None
+        save_transcript(db, video_id="new", title="New talk", transcript="more words", metadata={}, token_estimate=3)
+        assert load_transcript(db, "new").token_estimate == 3
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from app.services import embedding
+from app.services.embedding import (AdaptiveConcurrencyLimiter, chunk_id,
+                                    embed_and_save, make_batches)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.upserts: list[list[str]] = []
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        assert len(ids) == len(embeddings) == len(metadatas) == len(documents)
+        self.upserts.append(ids)
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self._collection = FakeCollection()
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """Fails the first request with a 429, then succeeds."""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def make_chunks(n, size=100):
+    return [Document(page_content="x" * size, metadata={"video_id": "vid"}) for _ in range(n)]
+
+
+def test_make_batches_respects_char_and_count_budgets():
+    docs = make_chunks(10, size=100)
+    assert [len(b) for b in make_batches(docs, max_chars=350, max_docs=50)] == [3, 3, 3, 1]
+    assert [len(b) for b in make_batches(docs, max_chars=10_000, max_docs=4)] == [4, 4, 2]
+    # A single oversized chunk still gets its own batch
+    assert make_batches(make_chunks(1, size=1000), max_chars=100, max_docs=4) == [[0]]
+
+
+def test_embed_and_save_upserts_every_batch_after_rate_limit(monkeypatch):
+    monkeypatch.setattr(embedding.settings, "EMBED_BATCH_MAX_CHARS", 300)
+    monkeypatch.setattr(embedding.settings, "EMBED_RETRY_BASE_SECONDS", 0)
+    store = FakeVectorStore()
+    model = RateLimitedEmbeddings()
+
+    embed_and_save(make_chunks(9), embedding_function=model, vector_store=store)
+
+    upserted = sorted(id_ for batch in store._collection.upserts for id_ in batch)
+    assert upserted == sorted(chunk_id(doc, i) for i, doc in enumerate(make_chunks(9)))
+    assert len(store._collection.upserts) == 3
+    assert model.calls == 4 # One retried batch
+
+
+def test_chunk_ids_depend_on_position_and_text():
+    doc = Document(page_content="same words", metadata={"video_id": "vid", "chunk_index": 3})
+    moved = Document(page_content="same words", metadata={"video_id": "vid", "chunk_index": 4})
+    edited = Document(page_content="other words", metadata={"video_id": "vid", "chunk_index": 3})
+
+    assert chunk_id(doc, 0) == chunk_id(doc, 7)
+    assert chunk_id(doc, 0).startswith("vid-")
+    assert len({chunk_id(doc, 0), chunk_id(moved, 0), chunk_id(edited, 0)}) == 3
+
+
+def test_embed_and_save_raises_non_rate_limit_errors():
+    class BrokenEmbeddings(RateLimitedEmbeddings):
+        def embed_documents(self, texts):
+            raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        embed_and_save(make_chunks(2), embedding_function=BrokenEmbeddings(), vector_store=FakeVectorStore())
+
+
+def test_limiter_halves_on_rate_limit_and_recovers():
+    limiter = AdaptiveConcurrencyLimiter(max_limit=8, increase_after=2)
+    limiter.record_rate_limited()
+    limiter.record_rate_limited()
+    assert limiter.limit == 2
+    for _ in range(4):
+        limiter.record_success()
+    assert limiter.limit == 4
@@ -0,0 +1,83 @@
+from langchain_core.embeddings import Embeddings
+
+from app.core.cache import TTLCache
+from app.services.embedding_cache import (CachedEmbeddings, EmbeddingDiskStore,
+                                          QueryCachedEmbeddings)
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.embedded: list[str] = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 0.5, -1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 0.5, -1.0]
+
+
+class CountingQueries(CountingEmbeddings):
+    def __init__(self):
+        super().__init__()
+        self.queries: list[str] = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return super().embed_query(text)
+
+
+def test_repeated_chunks_are_served_from_disk(tmp_path):
+    model = CountingEmbeddings()
+    store = EmbeddingDiskStore(root=tmp_path, max_bytes=1024 * 1024)
+    cached = CachedEmbeddings(underlying=model, model_name="models/test-embedding", store=store)
+
+    first = cached.embed_documents(["alpha", "beta"])
+    second = cached.embed_documents(["beta", "alpha", "gamma"])
+
+    assert model.embedded == ["alpha", "beta", "gamma"]
+    assert second[:2] == [first[1], first[0]]
+    stats = cached.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 3)
+
+    # A new process reads the same vectors back from disk
+    reopened = CachedEmbeddings(underlying=model, model_name="models/test-embedding", store=EmbeddingDiskStore(root=tmp_path, max_bytes=1024 * 1024))
+    assert reopened.embed_documents(["alpha"]) == [first[0]]
+    assert len(model.embedded) == 3
+
+
+def test_cache_is_keyed_by_model(tmp_path):
+    model = CountingEmbeddings()
+    store = EmbeddingDiskStore(root=tmp_path, max_bytes=1024 * 1024)
+    CachedEmbeddings(underlying=model, model_name="model-a", store=store).embed_documents(["alpha"])
+    CachedEmbeddings(underlying=model, model_name="model-b", store=store).embed_documents(["alpha"])
+
+    assert model.embedded == ["alpha", "alpha"]
+
+
+def test_store_evicts_least_recently_used(tmp_path):
+    vector_bytes = 3 * 4
+    store = EmbeddingDiskStore(root=tmp_path, max_bytes=2 * vector_bytes)
+    store.put("m", "a" * 64, [1.0, 2.0, 3.0])
+    store.put("m", "b" * 64, [4.0, 5.0, 6.0])
+    assert store.get("m", "a" * 64) == [1.0, 2.0, 3.0] # "a" is now most recently used
+    store.put("m", "c" * 64, [7.0, 8.0, 9.0])
+
+    assert store.get("m", "b" * 64) is None
+    assert store.get("m", "a" * 64) is not None
+    assert store.stats()["bytes"] == 2 * vector_bytes
+
+
+def test_rephrased_query_reuses_its_embedding():
+    model = CountingQueries()
+    cached = QueryCachedEmbeddings(underlying=model, model_name="model-a", cache=TTLCache(max_entries=16, ttl_seconds=60))
+
+    first = cached.embed_query("Summarise the main points?")
+    second = cached.embed_query("  summarise the MAIN points ")
+
+    assert first == second
+    assert model.queries == ["Summarise the main points?"]
+    assert cached.stats()["hits"] == 1
+    # Another model never shares the entry
+    QueryCachedEmbeddings(underlying=model, model_name="model-b", cache=cached.cache).embed_query("summarise the main points")
+    assert len(model.queries) == 2
@@ -0,0 +1,55 @@
+import pytest
+
+from app.embedding_providers import (available_embedding_providers,
+                                     create_embedding_provider)
+from app.vector_database import check_collection_embedding_model
+
+
+class FakeCollection:
+    def __init__(self, metadata):
+        self.name = "youtube_videos"
+        self.metadata = metadata
+
+    def modify(self, metadata):
+        # As chromadb 1.0: distance settings can't be sent, and the sent metadata replaces the old
+        if "hnsw:space" in metadata:
+            raise ValueError("Changing the distance function of a collection once it is created is not supported currently.")
+        self.metadata = metadata
+
+
+def test_hashing_provider_is_deterministic_and_normalised():
+    provider = create_embedding_provider("hashing", "hashing-64")
+    first, second = provider.embeddings.embed_documents(["the quick brown fox", "the quick brown fox"])
+
+    assert provider.dimension == len(first) == 64
+    assert first == second
+    assert sum(x * x for x in first) == pytest.approx(1.0, rel=1e-5)
+    assert provider.embeddings.embed_query("the quick brown fox") == first
+
+
+def test_unknown_provider_raises():
+    assert {"gemini", "onnx", "hashing"} <= set(available_embedding_providers())
+    with pytest.raises(ValueError):
+        create_embedding_provider("does-not-exist")
+
+
+def test_collection_built_with_another_model_is_rejected():
+    provider = create_embedding_provider("hashing", "hashing-64")
+    check_collection_embedding_model(FakeCollection(provider.collection_metadata()), provider)
+
+    other = create_embedding_provider("hashing", "hashing-128")
+    with pytest.raises(ValueError):
+        check_collection_embedding_model(FakeCollection(other.collection_metadata()), provider)
+    # Collections without metadata predate providers and were built with Gemini
+    with pytest.raises(ValueError):
+        check_collection_embedding_model(FakeCollection(None), provider)
+
+
+def test_legacy_collection_is_stamped_for_gemini(monkeypatch):
+    monkeypatch.setattr("config.settings.GEMINI_API_KEY", "fake")
+    provider = create_embedding_provider("gemini")
+    collection = FakeCollection({"hnsw:space": "l2", "owner": "ingest"})
+
+    check_collection_embedding_model(collection, provider)
+
+    assert collection.metadata == {"owner": "ingest", **provider.collection_metadata()}
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app.services.eviction as eviction
+import app.services.ingestion_manifest as ingestion_manifest
+from app.embedding_providers import create_embedding_provider
+from app.services.eviction import evict_cold_videos, select_cold_videos
+from app.services.ingestion_manifest import (is_ingested, mark_ingested,
+                                             reconcile_manifest)
+from db.crud import load_ingestion_manifest, load_stored_chunk_ids, save_stored_chunks
+from db.models import IngestionManifest
+
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+def manifest(video_id, idle_days, chunk_count=10, status="complete"):
+    return IngestionManifest(
+        video_id=video_id, status=status, chunk_count=chunk_count, chunk_size=800, chunk_overlap=50,
+        embedding_model="m", updated_at=NOW - timedelta(days=30), last_accessed_at=NOW - timedelta(days=idle_days)
+    )
+
+
+def test_select_cold_videos_by_idle_time():
+    manifests = [manifest("fresh", 1), manifest("stale", 10), manifest("old-embedding", 20, status="embedding")]
+    assert select_cold_videos(manifests, NOW, max_idle_seconds=7 * 86400, max_videos=0, max_chunks=0) == ["stale"]
+
+
+def test_select_cold_videos_least_recently_used_over_cap():
+    manifests = [manifest("a", 3), manifest("b", 1), manifest("c", 2), manifest("now", 0)]
+    assert select_cold_videos(manifests, NOW, max_idle_seconds=0, max_videos=2, max_chunks=0) == ["a", "c"]
+    assert select_cold_videos(manifests, NOW, max_idle_seconds=0, max_videos=0, max_chunks=25) == ["a", "c"]
+    # A video in use right now stays even if the cap can't be met
+    assert select_cold_videos(manifests, NOW, max_idle_seconds=0, max_videos=0, max_chunks=5) == ["a", "c", "b"]
+
+
+class FakeCollection:
+    def __init__(self, ids):
+        self.ids = ids # video_id -> chunk ids
+
+    def get(self, where=None, include=None, limit=None, offset=0):
+        rows = [(i, {"video_id": v}) for v, ids in self.ids.items() for i in ids]
+        if where is not None:
+            rows = [row for row in rows if row[1]["video_id"] == where["video_id"]]
+        rows = rows[offset:offset + limit if limit else None]
+        return {"ids": [row[0] for row in rows], "metadatas": [row[1] for row in rows]}
+
+    def delete(self, ids):
+        for video_id in self.ids:
+            self.ids[video_id] = [i for i in self.ids[video_id] if i not in ids]
+
+
+class FakeVectorStore:
+    def __init__(self, ids):
+        self._collection = FakeCollection(ids)
+
+
+class FakeLocalIndex:
+    def __init__(self):
+        self.removed = []
+
+    def remove(self, video_id):
+        self.removed.append(video_id)
+
+
+@pytest.fixture(autouse=True)
+def hashing_provider(monkeypatch):
+    provider = create_embedding_provider("hashing")
+    monkeypatch.setattr(ingestion_manifest, "get_embedding_provider", lambda: provider)
+    monkeypatch.setattr(ingestion_manifest, "_complete", set())
+
+
+def test_evict_cold_videos_drops_vectors_and_reingests_on_demand(in_memory_db, monkeypatch):
+    local_index = FakeLocalIndex()
+    monkeypatch.setattr(eviction, "get_local_index", lambda: local_index)
+    store = FakeVectorStore({"cold": ["cold-1", "cold-2"], "hot": ["hot-1"]})
+    mark_ingested(in_memory_db, "cold", chunk_count=2, chunk_size=800, chunk_overlap=50)
+    mark_ingested(in_memory_db, "hot", chunk_count=1, chunk_size=800, chunk_overlap=50)
+    save_stored_chunks(in_memory_db, "cold", ["cold-1", "cold-2"])
+    cold = load_ingestion_manifest(in_memory_db, "cold")
+    cold.last_accessed_at = datetime.now(timezone.utc) - timedelta(days=30)
+    in_memory_db.add(cold)
+    in_memory_db.commit()
+
+    evicted = evict_cold_videos(in_memory_db, store, max_idle_seconds=7 * 86400, max_videos=0, max_chunks=0)
+
+    assert evicted == ["cold"]
+    assert store._collection.ids == {"cold": [], "hot": ["hot-1"]}
+    assert load_stored_chunk_ids(in_memory_db, "cold") == set()
+    assert local_index.removed == ["cold"]
+    assert load_ingestion_manifest(in_memory_db, "cold").status == "evicted"
+    # The next chat re-ingests it; reconciling doesn't report it as missing
+    assert not is_ingested("cold", in_memory_db)
+    assert is_ingested("hot", in_memory_db)
+    assert reconcile_manifest(in_memory_db, store, chunk_size=800, chunk_overlap=50)["missing"] == 0
@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+import app.services.history as history_module
+from app.core.cache import TTLCache
+from app.services.history import (Turn, acompact_conversation, get_conversation_history,
+                                  record_turn, split_recent)
+from config import settings
+from db.crud import load_conversation_summary, save_message
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def turn(i, length=60):
+    return Turn(question=f"q{i} " + "x" * length, answer=f"a{i} " + "y" * length, created_at=START + timedelta(minutes=i))
+
+
+def test_split_recent_keeps_latest_turns_within_budget():
+    turns = [turn(i) for i in range(10)] # About 22 tokens each
+
+    older, recent = split_recent(turns, token_budget=100, max_turns=6)
+    assert [t.question[:2] for t in recent] == ["q6", "q7", "q8", "q9"]
+    assert len(older) == 6
+
+    older, recent = split_recent(turns, token_budget=1000, max_turns=3)
+    assert len(recent) == 3
+
+
+class FakeResult:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        return FakeResult(f"summary {len(self.prompts)}")
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(history_module, "_histories", TTLCache(max_entries=10, ttl_seconds=60))
+    monkeypatch.setattr(settings, "HISTORY_TOKEN_BUDGET", 60)
+    monkeypatch.setattr(settings, "HISTORY_MAX_TURNS", 6)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def test_older_turns_fold_into_persisted_summary(engine):
+    llm = FakeLLM()
+    with Session(engine) as db:
+        for i in range(5):
+            history = get_conversation_history(db, "user", "vid")
+            assert len(history.turns) <= 2 # Prompt size doesn't grow with the conversation
+            message = save_message(db, f"question {i} " + "x" * 60, f"answer {i} " + "y" * 60, "vid", "user")
+            record_turn("user", "vid", message)
+            asyncio.run(acompact_conversation(engine, llm, "user", "vid"))
+
+        history = get_conversation_history(db, "user", "vid")
+        assert [q[:10] for q, _ in history.turns] == ["question 3", "question 4"]
+        assert history.summary == "summary 3"
+        assert "question 2" in llm.prompts[-1] and "summary 2" in llm.prompts[-1]
+
+        # Rebuilt from the table (another process, or after the cache expired)
+        history_module._histories.clear()
+        rebuilt = get_conversation_history(db, "user", "vid")
+        assert rebuilt.summary == "summary 3"
+        assert rebuilt.turns == history.turns
+        assert rebuilt.pending == []
+        assert load_conversation_summary(db, "user", "vid").turns_folded == 3
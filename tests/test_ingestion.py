@@ -0,0 +1,116 @@
+import pytest
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+import app.services.embedding as embedding
+import app.services.ingestion as ingestion
+import app.services.ingestion_manifest as ingestion_manifest
+from app.embedding_providers import create_embedding_provider
+from app.services.ingestion import save_chunk_vectors
+from app.services.ingestion_manifest import is_ingested
+from db.crud import load_stored_chunk_ids
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows: dict[str, dict] = {} # id -> metadata
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        self.rows.update(zip(ids, metadatas))
+
+    def get(self, where, include):
+        return {"ids": [id_ for id_, m in self.rows.items() if m["video_id"] == where["video_id"]]}
+
+    def delete(self, ids):
+        for id_ in ids:
+            self.rows.pop(id_, None)
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self._collection = FakeCollection()
+
+
+class FlakyEmbeddings(Embeddings):
+    """Fails any batch containing a chunk listed in `fail_on`."""
+
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.embedded: list[str] = []
+
+    def embed_documents(self, texts):
+        if self.fail_on & set(texts):
+            raise ValueError("embedding service error")
+        self.embedded.extend(texts)
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def make_chunks(texts, video_id="vid"):
+    return [Document(page_content=text, metadata={"video_id": video_id, "chunk_index": i}) for i, text in enumerate(texts)]
+
+
+@pytest.fixture(autouse=True)
+def pipeline(monkeypatch):
+    provider = create_embedding_provider("hashing")
+    monkeypatch.setattr(ingestion_manifest, "get_embedding_provider", lambda: provider)
+    monkeypatch.setattr(ingestion_manifest, "_complete", set())
+    monkeypatch.setattr(ingestion.settings, "LOCAL_INDEX_ENABLED", False)
+    monkeypatch.setattr(embedding.settings, "EMBED_BATCH_MAX_DOCS", 2)
+    monkeypatch.setattr(embedding.settings, "EMBED_MAX_CONCURRENCY", 1)
+
+
+def test_failed_ingest_resumes_with_only_the_missing_chunks(in_memory_db, monkeypatch):
+    texts = [f"chunk {i}" for i in range(6)]
+    store = FakeVectorStore()
+    flaky = FlakyEmbeddings(fail_on={"chunk 4"})
+    monkeypatch.setattr(embedding, "get_embedding_function", lambda: flaky)
+
+    with pytest.raises(ValueError):
+        save_chunk_vectors(in_memory_db, "vid", make_chunks(texts), store)
+    assert not is_ingested("vid", in_memory_db)
+    assert len(load_stored_chunk_ids(in_memory_db, "vid")) == 4
+
+    working = FlakyEmbeddings()
+    monkeypatch.setattr(embedding, "get_embedding_function", lambda: working)
+    save_chunk_vectors(in_memory_db, "vid", make_chunks(texts), store)
+
+    assert working.embedded == ["chunk 4", "chunk 5"]
+    assert is_ingested("vid", in_memory_db)
+    assert len(store._collection.rows) == 6
+
+
+def test_stale_chunks_are_removed(in_memory_db, monkeypatch):
+    monkeypatch.setattr(embedding, "get_embedding_function", lambda: FlakyEmbeddings())
+    store = FakeVectorStore()
+    store._collection.rows = {"vid-0": {"video_id": "vid"}, "other-0": {"video_id": "other"}} # Position-only id from before
+
+    save_chunk_vectors(in_memory_db, "vid", make_chunks(["a", "b"]), store)
+
+    assert "vid-0" not in store._collection.rows
+    assert "other-0" in store._collection.rows
+    assert load_stored_chunk_ids(in_memory_db, "vid") == set(store._collection.rows) - {"other-0"}
+
+
+def test_new_collection_or_model_re_embeds_every_chunk(in_memory_db, monkeypatch):
+    texts = ["chunk 0", "chunk 1", "chunk 2"]
+    monkeypatch.setattr(embedding, "get_embedding_function", lambda: FlakyEmbeddings())
+    save_chunk_vectors(in_memory_db, "vid", make_chunks(texts), FakeVectorStore())
+
+    # CHROMA_COLLECTION switched (or the volume wiped): the checkpoints are there, the vectors aren't
+    new_collection = FakeVectorStore()
+    embeddings = FlakyEmbeddings()
+    monkeypatch.setattr(embedding, "get_embedding_function", lambda: embeddings)
+    save_chunk_vectors(in_memory_db, "vid", make_chunks(texts), new_collection)
+    assert embeddings.embedded == texts
+    assert len(new_collection._collection.rows) == 3
+
+    # Embedding model switched: vectors in the collection are the old model's
+    provider = create_embedding_provider("hashing", model_name="hashing-128")
+    monkeypatch.setattr(ingestion_manifest, "get_embedding_provider", lambda: provider)
+    embeddings = FlakyEmbeddings()
+    save_chunk_vectors(in_memory_db, "vid", make_chunks(texts), new_collection)
+    assert embeddings.embedded == texts
+    assert is_ingested("vid", in_memory_db)
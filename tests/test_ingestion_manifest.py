@@ -0,0 +1,74 @@
+import pytest
+
+import app.services.ingestion_manifest as ingestion_manifest
+from app.embedding_providers import create_embedding_provider
+from app.services.ingestion_manifest import (is_ingested, mark_embedding, mark_ingested,
+                                             reconcile_manifest, warm_manifest_cache)
+from db.crud import load_ingestion_manifest, save_transcript
+
+
+class FakeCollection:
+    def __init__(self, chunk_counts, unpositioned=()):
+        self.chunk_counts = chunk_counts # video_id -> chunks stored
+        self.unpositioned = set(unpositioned) # Videos whose chunks predate chunk_index metadata
+
+    def get(self, where=None, include=None, limit=None, offset=0):
+        rows = [
+            (f"{v}-{i}", {"video_id": v} if v in self.unpositioned else {"video_id": v, "chunk_index": i})
+            for v, n in self.chunk_counts.items() for i in range(n)
+        ]
+        if where is not None:
+            rows = [row for row in rows if row[1]["video_id"] == where["video_id"]]
+        rows = rows[offset:offset + limit if limit else None]
+        return {"ids": [row[0] for row in rows], "metadatas": [row[1] for row in rows]}
+
+
+class FakeVectorStore:
+    def __init__(self, chunk_counts, unpositioned=()):
+        self._collection = FakeCollection(chunk_counts, unpositioned)
+
+
+@pytest.fixture(autouse=True)
+def hashing_provider(monkeypatch):
+    provider = create_embedding_provider("hashing")
+    monkeypatch.setattr(ingestion_manifest, "get_embedding_provider", lambda: provider)
+    monkeypatch.setattr(ingestion_manifest, "_complete", set())
+
+
+def test_video_counts_as_ingested_only_when_complete(in_memory_db):
+    mark_embedding(in_memory_db, "vid", chunk_count=10, chunk_size=800, chunk_overlap=50)
+    assert not is_ingested("vid", in_memory_db)
+
+    mark_ingested(in_memory_db, "vid", chunk_count=10, chunk_size=800, chunk_overlap=50)
+    assert is_ingested("vid", in_memory_db)
+
+    # A fresh process sees it through the table
+    ingestion_manifest._complete.clear()
+    assert warm_manifest_cache(in_memory_db) == 1
+    assert "vid" in ingestion_manifest._complete
+
+
+def test_reconcile_repairs_manifest_from_vector_store(in_memory_db):
+    mark_ingested(in_memory_db, "partial", chunk_count=10, chunk_size=800, chunk_overlap=50)
+    mark_embedding(in_memory_db, "finished", chunk_count=3, chunk_size=800, chunk_overlap=50)
+    save_transcript(db=in_memory_db, video_id="legacy", title="Legacy", transcript="word " * 400, metadata={"title": "Legacy"})
+    store = FakeVectorStore({"partial": 4, "finished": 3, "legacy": 1})
+
+    counts = reconcile_manifest(in_memory_db, store, chunk_size=800, chunk_overlap=50)
+
+    assert counts == {"complete": 1, "partial": 2, "missing": 0, "added": 1}
+    assert not is_ingested("partial", in_memory_db)
+    assert is_ingested("finished", in_memory_db)
+    # The legacy transcript splits into 3 chunks but only 1 is stored
+    legacy = load_ingestion_manifest(in_memory_db, "legacy")
+    assert (legacy.status, legacy.chunk_count) == ("embedding", 3)
+
+
+def test_reconcile_re_chunks_videos_stored_without_positions(in_memory_db):
+    mark_ingested(in_memory_db, "old", chunk_count=3, chunk_size=800, chunk_overlap=50)
+    store = FakeVectorStore({"old": 3}, unpositioned={"old"})
+
+    counts = reconcile_manifest(in_memory_db, store, chunk_size=800, chunk_overlap=50)
+
+    assert counts == {"complete": 0, "partial": 1, "missing": 0, "added": 0}
+    assert not is_ingested("old", in_memory_db)
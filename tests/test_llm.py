@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.llm import LLMGateway
+
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeModel:
+    """Records what reached the provider: single calls and batches."""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def answer(self, prompt):
+        if prompt == "bad":
+            raise ValueError("provider error")
+        return FakeMessage(f"answer to {prompt}")
+
+    def invoke(self, prompt):
+        with self.lock:
+            self.calls.append([prompt])
+        time.sleep(self.delay)
+        return self.answer(prompt)
+
+    def batch(self, prompts, config=None, return_exceptions=False):
+        with self.lock:
+            self.calls.append(list(prompts))
+        time.sleep(self.delay)
+        results = []
+        for prompt in prompts:
+            try:
+                results.append(self.answer(prompt))
+            except ValueError as e:
+                results.append(e)
+        return results
+
+    async def ainvoke(self, prompt):
+        self.calls.append([prompt])
+        await asyncio.sleep(self.delay)
+        return self.answer(prompt)
+
+    async def abatch(self, prompts, config=None, return_exceptions=False):
+        self.calls.append(list(prompts))
+        await asyncio.sleep(self.delay)
+        results = []
+        for prompt in prompts:
+            try:
+                results.append(self.answer(prompt))
+            except ValueError as e:
+                results.append(e)
+        return results
+
+
+def test_async_identical_prompts_coalesce_and_distinct_ones_batch():
+    model = FakeModel()
+    gateway = LLMGateway(model, batch_window_seconds=0.01, max_batch_size=8, max_concurrency=4)
+
+    async def ask_all():
+        return await asyncio.gather(*(gateway.ainvoke(p) for p in ["a", "a", "b", "a", "bad"]), return_exceptions=True)
+
+    results = asyncio.run(ask_all())
+
+    assert [r.content for r in results[:4]] == ["answer to a", "answer to a", "answer to b", "answer to a"]
+    assert isinstance(results[4], ValueError) # Only the failing request fails
+    assert model.calls == [["a", "b", "bad"]]
+    assert gateway.stats()["coalesced"] == 2
+
+    # Nothing in flight any more: the same prompt is sent again
+    assert asyncio.run(gateway.ainvoke("a")).content == "answer to a"
+    assert len(model.calls) == 2
+
+
+def test_batches_are_capped_and_window_zero_sends_each_prompt():
+    model = FakeModel()
+    gateway = LLMGateway(model, batch_window_seconds=0.01, max_batch_size=2, max_concurrency=4)
+
+    async def ask_all(prompts):
+        return await asyncio.gather(*(gateway.ainvoke(p) for p in prompts))
+
+    asyncio.run(ask_all(["a", "b", "c"]))
+    assert sorted(len(batch) for batch in model.calls) == [1, 2]
+
+    model.calls.clear()
+    gateway = LLMGateway(model, batch_window_seconds=0, max_batch_size=8, max_concurrency=4)
+    asyncio.run(ask_all(["a", "b", "a"]))
+    assert model.calls == [["a"], ["b"]]
+
+
+def test_blocking_callers_coalesce_and_batch():
+    model = FakeModel(delay=0.05)
+    gateway = LLMGateway(model, batch_window_seconds=0.05, max_batch_size=8, max_concurrency=4)
+    results = {}
+
+    def ask(i, prompt):
+        try:
+            results[i] = gateway.invoke(prompt).content
+        except ValueError as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=ask, args=(i, p)) for i, p in enumerate(["a", "a", "b", "bad"])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [results[i] for i in range(3)] == ["answer to a", "answer to a", "answer to b"]
+    assert isinstance(results[3], ValueError)
+    assert len(model.calls) == 1 and sorted(model.calls[0]) == ["a", "b", "bad"]
+
+    with pytest.raises(ValueError):
+        gateway.invoke("bad")
+
+
+def test_blocking_batch_is_sent_as_soon_as_it_is_full():
+    model = FakeModel(delay=0)
+    gateway = LLMGateway(model, batch_window_seconds=5, max_batch_size=2, max_concurrency=4)
+    results = {}
+
+    def ask(prompt):
+        results[prompt] = gateway.invoke(prompt).content
+
+    threads = [threading.Thread(target=ask, args=(p,)) for p in ["a", "b"]]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02) # "a" opens the batch, "b" fills it
+    for thread in threads:
+        thread.join(timeout=1)
+    assert results == {"a": "answer to a", "b": "answer to b"}
+    assert time.monotonic() - start < 1 # Not held back for the 5 second window
+    assert model.calls == [["a", "b"]]
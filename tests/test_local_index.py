@@ -0,0 +1,97 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import app.services.local_index as local_index
+from app.services.local_index import LocalVectorIndex
+
+
+class FakeCollection:
+    """Returns rows out of order, like Chroma's get()."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.gets = 0
+
+    def get(self, where, include):
+        self.gets += 1
+        rows = [row for row in reversed(self.rows) if row[3]["video_id"] == where["video_id"]]
+        return {
+            "ids": [row[0] for row in rows],
+            "embeddings": [row[1] for row in rows],
+            "documents": [row[2] for row in rows],
+            "metadatas": [row[3] for row in rows],
+        }
+
+
+class FakeVectorStore:
+    def __init__(self, rows):
+        self._collection = FakeCollection(rows)
+
+
+def make_rows(video_id, n, dimension=8, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        (f"{video_id}-{i}", rng.normal(size=dimension).tolist(), f"chunk {i}", {"video_id": video_id, "chunk_index": i})
+        for i in range(n)
+    ]
+
+
+def test_search_matches_brute_force_cosine(tmp_path):
+    rows = make_rows("vid", 50)
+    index = LocalVectorIndex(root=tmp_path, model_name="test-model", max_videos=4)
+    index.write("vid", ids=[r[0] for r in rows], embeddings=[r[1] for r in rows], texts=[r[2] for r in rows], metadatas=[r[3] for r in rows])
+
+    query = rows[7][1]
+    results = index.search("vid", query, k=5)
+
+    matrix = np.array([r[1] for r in rows])
+    cosine = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+    expected = [f"chunk {i}" for i in np.argsort(-cosine)[:5]]
+    assert [doc.page_content for doc, _ in results] == expected
+    assert results[0][1] == pytest.approx(1.0, rel=1e-5)
+
+
+def test_unknown_video_is_synced_from_chroma_once(tmp_path):
+    store = FakeVectorStore(make_rows("vid", 10) + make_rows("other", 3, seed=1))
+    index = LocalVectorIndex(root=tmp_path, model_name="test-model", max_videos=4)
+
+    assert index.search("vid", [1.0] * 8, k=3, vector_store=store) is not None
+    assert index.search("vid", [1.0] * 8, k=3, vector_store=store) is not None
+    assert store._collection.gets == 1
+    # Transcript order is restored from chunk_index
+    assert index.load("vid").ids == [f"vid-{i}" for i in range(10)]
+    assert index.search("missing", [1.0] * 8, k=3, vector_store=store) is None
+
+    # A fresh process reads the index back from disk without Chroma
+    reopened = LocalVectorIndex(root=tmp_path, model_name="test-model", max_videos=4)
+    assert len(reopened.search("vid", [1.0] * 8, k=3)) == 3
+
+
+def test_only_recent_videos_stay_loaded(tmp_path):
+    index = LocalVectorIndex(root=tmp_path, model_name="test-model", max_videos=2)
+    for video_id in ["a", "b", "c"]:
+        rows = make_rows(video_id, 3)
+        index.write(video_id, ids=[r[0] for r in rows], embeddings=[r[1] for r in rows], texts=[r[2] for r in rows], metadatas=[r[3] for r in rows])
+        index.load(video_id)
+
+    assert index.stats()["hot_videos"] == 2
+    assert index.has("a") # Still on disk
+
+
+def test_async_get_syncs_missing_video_through_async_client(tmp_path, monkeypatch):
+    store = FakeVectorStore(make_rows("vid", 5))
+    fetched = []
+
+    async def fake_aget_video_chunks(video_id):
+        fetched.append(video_id)
+        return store._collection.get(where={"video_id": video_id}, include=None)
+
+    monkeypatch.setattr(local_index, "aget_video_chunks", fake_aget_video_chunks)
+    index = LocalVectorIndex(root=tmp_path, model_name="test-model", max_videos=4)
+
+    video = asyncio.run(index.aget("vid"))
+    assert video.ids == [f"vid-{i}" for i in range(5)]
+    assert asyncio.run(index.aget("vid")) is video
+    assert fetched == ["vid"]
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+    barrier = threading.Barrier(8)
+    results = []
+
+    def slow_fetch():
+        nonlocal calls
+        calls += 1
+        time.sleep(0.2)
+        return "transcript"
+
+    def worker():
+        barrier.wait()
+        results.append(flight.do("transcript:abc", slow_fetch))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == 1
+    assert results == ["transcript"] * 8
+    assert not flight.in_flight("transcript:abc")
+
+
+def test_followers_receive_leader_exception():
+    flight = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def failing_fetch():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("no transcript")
+
+    def follower():
+        started.wait()
+        try:
+            flight.do("vectors:abc", lambda: "should not run")
+        except ValueError as e:
+            errors.append(e)
+
+    t = threading.Thread(target=follower)
+    t.start()
+    with pytest.raises(ValueError):
+        flight.do("vectors:abc", failing_fetch)
+    t.join()
+
+    assert len(errors) == 1
+
+
+def test_sequential_calls_run_again():
+    flight = SingleFlight()
+    assert flight.do("summary:abc", lambda: 1) == 1
+    assert flight.do("summary:abc", lambda: 2) == 2
+
+
+def test_async_calls_share_one_execution():
+    flight = AsyncSingleFlight()
+    calls = 0
+
+    async def summarise():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "summary"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("summary:abc", summarise) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["summary"] * 5
+    assert calls == 1
+    assert not flight.in_flight("summary:abc")
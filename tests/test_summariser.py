@@ -0,0 +1,176 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.documents import Document
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+import app.services.summariser as summariser
+from config import settings
+from db.crud import (delete_summary_partials, load_summary, load_summary_partials,
+                     save_summary, save_summary_partial)
+
+
+def test_async_summary_generated_once_and_saved(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    calls = []
+
+    async def asummarise_documents(documents, db=None, video_id=None):
+        calls.append(documents)
+        await asyncio.sleep(0.05)
+        return "A short summary"
+
+    monkeypatch.setattr(summariser, "asummarise_documents", asummarise_documents)
+    monkeypatch.setattr(summariser, "get_transcript", lambda video_url, db: [Document(page_content="words", metadata={"title": "Talk"})])
+
+    async def summarise():
+        with Session(engine) as db: # One session per request, as in the endpoint
+            return await summariser.asummarise_ingest("https://www.youtube.com/watch?v=dQw4w9WgXcQ", db)
+
+    async def summarise_concurrently():
+        return await asyncio.gather(*(summarise() for _ in range(3)))
+
+    results = asyncio.run(summarise_concurrently())
+
+    assert [r.summary for r in results] == ["A short summary"] * 3
+    assert len(calls) == 1
+    with Session(engine) as db:
+        assert load_summary(db, "dQw4w9WgXcQ").title == "Talk"
+
+
+
+def test_sync_and_async_callers_share_one_summary(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    calls = []
+
+    def summarise_documents(documents, db=None, video_id=None):
+        calls.append("sync")
+        time.sleep(0.2)
+        return "Batch summary"
+
+    async def asummarise_documents(documents, db=None, video_id=None):
+        calls.append("async")
+        return "Endpoint summary"
+
+    monkeypatch.setattr(summariser, "summarise_documents", summarise_documents)
+    monkeypatch.setattr(summariser, "asummarise_documents", asummarise_documents)
+    monkeypatch.setattr(summariser, "get_transcript", lambda video_url, db: [Document(page_content="words", metadata={"title": "Talk"})])
+    url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+    def batch_ingest():
+        with Session(engine) as db:
+            summariser.summarise_ingest(url, db)
+
+    batch = threading.Thread(target=batch_ingest)
+    batch.start()
+    time.sleep(0.05) # The batch ingest leads
+
+    async def endpoint():
+        with Session(engine) as db:
+            return await summariser.asummarise_ingest(url, db)
+
+    assert asyncio.run(endpoint()).summary == "Batch summary"
+    batch.join()
+    assert calls == ["sync"]
+
+
+def test_async_summaries_hold_no_worker_thread_while_they_wait(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+
+    async def asummarise_documents(documents, db=None, video_id=None):
+        await asyncio.sleep(0.05)
+        return f"Summary of {video_id}"
+
+    monkeypatch.setattr(summariser, "asummarise_documents", asummarise_documents)
+    monkeypatch.setattr(summariser, "get_transcript", lambda video_url, db: [Document(page_content="words", metadata={"title": "Talk"})])
+
+    async def summarise(video_id):
+        with Session(engine) as db:
+            return await summariser.asummarise_ingest(f"https://www.youtube.com/watch?v={video_id}", db)
+
+    async def summarise_all():
+        # Fewer worker threads than videos being summarised at once
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=2))
+        return await asyncio.wait_for(asyncio.gather(*(summarise(v) for v in ["aaa", "bbb", "ccc", "ddd"])), timeout=5)
+
+    results = asyncio.run(summarise_all())
+    assert [result.summary for result in results] == ["Summary of aaa", "Summary of bbb", "Summary of ccc", "Summary of ddd"]
+
+
+def test_save_summary_twice_keeps_one_row(in_memory_db):
+    save_summary(in_memory_db, video_id="vid", title="Talk", summary="first", metadata={})
+    save_summary(in_memory_db, video_id="vid", title="Talk", summary="second", metadata={})
+    assert load_summary(in_memory_db, "vid").summary == "second"
+
+@pytest.fixture
+def small_limits(monkeypatch):
+    monkeypatch.setattr(settings, "SUMMARY_STUFF_MAX_TOKENS", 100)
+    monkeypatch.setattr(settings, "SUMMARY_MAP_CHUNK_TOKENS", 50)
+    monkeypatch.setattr(summariser, "length_function", lambda documents: sum(len(d.page_content) // 4 for d in documents))
+
+
+def long_transcript():
+    return [Document(page_content=" ".join(f"word{i}" for i in range(600)), metadata={"title": "Long talk"})]
+
+
+def test_long_transcript_is_map_reduced_and_partials_survive_a_failed_reduce(small_limits, monkeypatch, in_memory_db):
+    calls = []
+    fail_final = True
+
+    def stuff(documents):
+        text = "\n\n".join(d.page_content for d in documents)
+        calls.append(text)
+        if len(documents) > 1 and fail_final:
+            raise TimeoutError("reduce failed")
+        return f"s{len(calls)}" * 10 # 20-30 characters per summary
+
+    monkeypatch.setattr(summariser, "_stuff", stuff)
+
+    with pytest.raises(TimeoutError):
+        summariser.summarise_documents(long_transcript(), db=in_memory_db, video_id="vid")
+    map_calls = len(calls) - 1
+    n_parts = len(summariser.split_for_map(long_transcript()))
+    assert map_calls > n_parts > 1 # Parts, then groups of their summaries
+    assert all(len(text) <= 50 * 4 for text in calls[:n_parts])
+    assert len(load_summary_partials(in_memory_db, "vid")) == map_calls
+
+    fail_final = False
+    calls.clear()
+    summary = summariser.summarise_documents(long_transcript(), db=in_memory_db, video_id="vid")
+    assert len(calls) == 1 # Only the reduce ran again
+    assert summary.startswith("s1")
+    assert load_summary_partials(in_memory_db, "vid") == {}
+
+
+def test_partials_of_the_same_text_are_kept_per_video(in_memory_db):
+    save_summary_partial(in_memory_db, text_hash="same", video_id="a", summary="first")
+    save_summary_partial(in_memory_db, text_hash="same", video_id="b", summary="second")
+    assert load_summary_partials(in_memory_db, "a") == {"same": "first"}
+    delete_summary_partials(in_memory_db, "a")
+    assert load_summary_partials(in_memory_db, "a") == {}
+    assert load_summary_partials(in_memory_db, "b") == {"same": "second"}
+
+
+def test_async_map_reduce_runs_parts_concurrently(small_limits, monkeypatch):
+    monkeypatch.setattr(settings, "SUMMARY_MAP_CONCURRENCY", 3)
+    running = 0
+    peak = 0
+
+    async def astuff(documents):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return "part summary"
+
+    monkeypatch.setattr(summariser, "_astuff", astuff)
+
+    assert asyncio.run(summariser.asummarise_documents(long_transcript())) == "part summary"
+    assert peak == 3
@@ -0,0 +1,52 @@
+from langchain_core.documents import Document
+
+from app.services.tokens import TokenCounter, calibration_samples, estimate_raw_tokens
+
+
+def test_raw_estimate_counts_word_pieces_and_symbols():
+    assert estimate_raw_tokens("Hello, world!") == 4
+    assert estimate_raw_tokens("internationalisation") == 4 # 20 characters, split into pieces of six
+    assert estimate_raw_tokens("") == 0
+
+
+def test_long_texts_are_memoized_and_can_be_seeded(monkeypatch):
+    import app.services.tokens as tokens
+    counter = TokenCounter(model_name="m", calibration_file=None, memo_size=8)
+    transcript = "so today we talk about cache " * 100
+    calls = []
+    real_estimate = tokens.estimate_raw_tokens
+    monkeypatch.setattr(tokens, "estimate_raw_tokens", lambda text: calls.append(text) or real_estimate(text))
+
+    assert counter.count_documents([Document(page_content=transcript)] * 3) == 3 * 600
+    assert len(calls) == 1
+
+    stored = "a transcript loaded from the database " * 100
+    counter.remember(stored, 123) # Estimate saved next to the transcript
+    assert counter.count(stored) == 123
+    assert len(calls) == 1
+
+
+def test_calibration_scales_counts_and_is_saved(tmp_path):
+    calibration_file = tmp_path / "calibration.json"
+    counter = TokenCounter(model_name="m", calibration_file=calibration_file, memo_size=8)
+    assert not counter.calibrated
+
+    text = "word " * 3000
+    samples = calibration_samples(text)
+    assert len(samples) == 3
+    counter.calibrate(samples, reference=lambda sample: 2 * estimate_raw_tokens(sample)) # Tokenizer splits finer
+    assert counter.count("one two three") == 6
+
+    reloaded = TokenCounter(model_name="m", calibration_file=calibration_file, memo_size=8)
+    assert reloaded.calibrated and reloaded.scale == 2.0
+    assert not TokenCounter(model_name="other", calibration_file=calibration_file, memo_size=8).calibrated
+
+
+def test_truncate_keeps_whole_words_within_budget():
+    counter = TokenCounter(model_name="m", calibration_file=None, memo_size=8)
+    text = "alpha beta gamma delta " * 20
+
+    cut = counter.truncate(text, 10)
+    assert counter.count(cut) <= 10
+    assert text.startswith(cut) and not cut.endswith(" ")
+    assert counter.truncate("short", 10) == "short"
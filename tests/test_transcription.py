@@ -0,0 +1,158 @@
+import time
+
+import pytest
+from langchain.schema import Document
+from youtube_transcript_api import TranscriptsDisabled
+
+import app.services.transcription as transcription
+from app.services.transcription import (TranscriptUnavailableError,
+                                        check_transcript_available, get_transcript,
+                                        get_video_metadata)
+from db.crud import load_video_metadata, record_transcript_failure
+
+FETCH_SECONDS = 0.3
+
+
+class StubLoader:
+    def __init__(self, video_url):
+        self.video_url = video_url
+
+    @classmethod
+    def from_youtube_url(cls, video_url):
+        return cls(video_url)
+
+    def load(self):
+        time.sleep(FETCH_SECONDS)
+        return [Document(page_content="never gonna give you up", metadata={"source": self.video_url})]
+
+
+class StubYoutubeDL:
+    calls = 0
+
+    def __init__(self, opts):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=False):
+        StubYoutubeDL.calls += 1
+        time.sleep(FETCH_SECONDS)
+        return {"title": "Never Gonna Give You Up", "uploader": "Rick Astley", "upload_date": "19871025"}
+
+
+class EmptyLoader(StubLoader):
+    calls = 0
+
+    def load(self):
+        EmptyLoader.calls += 1
+        return []
+
+
+class DisabledLoader(StubLoader):
+    def load(self):
+        raise TranscriptsDisabled(self.video_url)
+
+
+class FlakyLoader(StubLoader):
+    calls = 0
+
+    def load(self):
+        FlakyLoader.calls += 1
+        raise ConnectionError("connection reset by peer")
+
+
+@pytest.fixture(autouse=True)
+def stub_youtube(monkeypatch):
+    StubYoutubeDL.calls = 0
+    EmptyLoader.calls = 0
+    FlakyLoader.calls = 0
+    monkeypatch.setattr(transcription, "YoutubeLoader", StubLoader)
+    monkeypatch.setattr(transcription, "YoutubeDL", StubYoutubeDL)
+    # Fresh negative cache for every test
+    monkeypatch.setattr(transcription, "_negative_cache", {})
+    monkeypatch.setattr(transcription, "_negative_cache_loaded", False)
+
+
+def test_transcript_and_metadata_fetched_concurrently(in_memory_db):
+    start = time.perf_counter()
+    docs = get_transcript("https://www.youtube.com/watch?v=dQw4w9WgXcQ", in_memory_db)
+    elapsed = time.perf_counter() - start
+
+    # Close to max(transcript, metadata), well under their sum
+    assert elapsed < 1.5 * FETCH_SECONDS
+    assert docs[0].metadata["title"] == "Never Gonna Give You Up"
+    assert docs[0].metadata["video_id"] == "dQw4w9WgXcQ"
+    assert load_video_metadata(in_memory_db, "dQw4w9WgXcQ").uploader == "Rick Astley"
+
+
+def test_metadata_cache_avoids_yt_dlp(in_memory_db):
+    first = get_video_metadata("dQw4w9WgXcQ", in_memory_db)
+    second = get_video_metadata("dQw4w9WgXcQ", in_memory_db)
+
+    assert first == second
+    assert StubYoutubeDL.calls == 1
+
+
+def test_expired_metadata_is_refetched(in_memory_db, monkeypatch):
+    get_video_metadata("dQw4w9WgXcQ", in_memory_db)
+    monkeypatch.setattr(transcription.settings, "METADATA_CACHE_TTL_SECONDS", -1)
+    get_video_metadata("dQw4w9WgXcQ", in_memory_db)
+
+    assert StubYoutubeDL.calls == 2
+
+
+def test_missing_transcript_is_negatively_cached(in_memory_db, monkeypatch):
+    monkeypatch.setattr(transcription, "YoutubeLoader", EmptyLoader)
+    url = "https://www.youtube.com/watch?v=no_captions"
+
+    with pytest.raises(TranscriptUnavailableError):
+        get_transcript(url, in_memory_db)
+
+    # Retries fail fast from the negative cache without going back to YouTube
+    with pytest.raises(TranscriptUnavailableError) as excinfo:
+        get_transcript(url, in_memory_db)
+    assert excinfo.value.retry_at is not None
+    assert EmptyLoader.calls == 1
+
+    # A new process loads the failure from the DB
+    monkeypatch.setattr(transcription, "_negative_cache", {})
+    monkeypatch.setattr(transcription, "_negative_cache_loaded", False)
+    with pytest.raises(TranscriptUnavailableError):
+        check_transcript_available("no_captions", in_memory_db)
+
+
+def test_disabled_transcripts_are_negatively_cached(in_memory_db, monkeypatch):
+    monkeypatch.setattr(transcription, "YoutubeLoader", DisabledLoader)
+
+    with pytest.raises(TranscriptUnavailableError):
+        get_transcript("https://www.youtube.com/watch?v=disabled", in_memory_db)
+    with pytest.raises(TranscriptUnavailableError) as excinfo:
+        check_transcript_available("disabled", in_memory_db)
+    assert excinfo.value.retry_at is not None
+
+
+def test_transient_failures_are_not_negatively_cached(in_memory_db, monkeypatch):
+    monkeypatch.setattr(transcription, "YoutubeLoader", FlakyLoader)
+    url = "https://www.youtube.com/watch?v=flaky_network"
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            get_transcript(url, in_memory_db)
+    assert FlakyLoader.calls == 2 # Each retry goes back to YouTube
+    check_transcript_available("flaky_network", in_memory_db)
+
+
+def test_transcript_failure_backoff_doubles(in_memory_db):
+    first = record_transcript_failure(in_memory_db, "flaky", "no captions", base_ttl_seconds=60, max_ttl_seconds=200)
+    first_ttl = (first.retry_after - first.last_failed_at).total_seconds()
+    second = record_transcript_failure(in_memory_db, "flaky", "no captions", base_ttl_seconds=60, max_ttl_seconds=200)
+    second_ttl = (second.retry_after - second.last_failed_at).total_seconds()
+    third = record_transcript_failure(in_memory_db, "flaky", "no captions", base_ttl_seconds=60, max_ttl_seconds=200)
+    third_ttl = (third.retry_after - third.last_failed_at).total_seconds()
+
+    assert (first_ttl, second_ttl, third_ttl) == (60, 120, 200)
+    assert third.failure_count == 3